@@ -3,18 +3,26 @@ LifeOS v2 - CrewAI Edition
 '''
 import logging
 import asyncio
+import importlib
+import inspect
 import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from telegram import Update
 from telegram.ext import ApplicationBuilder, ContextTypes, CommandHandler, MessageHandler, filters
 from src.config import load_credentials
-# Importamos el orquestador
-from src.crew_orchestrator import CrewOrchestrator
 from src.utils.session_manager import SessionManager
 
 # --- NUEVOS IMPORTS PARA IDENTIDAD ---
-from src.identity_manager import IdentityManager, UserRole
-from src.tools import TOOL_MAPPING
+from src.identity_manager import IdentityManager, UserRole, UserContext
+from src.utils.telegram_stream import TelegramStreamEditor
+from src.utils.chat_serializer import ChatSerializer
+from src.utils.request_context import current_user as current_user_var
+from src.utils.backend_clients import BackendClients
+from src.utils.webhook_server import Readiness, run_webhook
+from src.utils.stage_timer import StageTimer
 
 # Configurar logging
 logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
@@ -25,10 +33,37 @@ TELEGRAM_TOKEN = load_credentials()
 RUN_MODE = os.getenv('RUN_MODE', 'polling')
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')
 WEBHOOK_PORT = int(os.getenv('PORT', '8080'))
+# Streaming: la respuesta se va editando en Telegram según la genera el LLM
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'False').lower() == 'true'
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))
+# Concurrencia: crews en paralelo (chats distintos) y tamaño del pool de hilos
+CREW_MAX_CONCURRENCY = int(os.getenv('CREW_MAX_CONCURRENCY', '4'))
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', str(CREW_MAX_CONCURRENCY * 2)))
+# Cambios de rol en Firestore empujados a la caché de identidades (sin esperar al TTL)
+IDENTITY_WATCH = os.getenv('IDENTITY_WATCH', 'False').lower() == 'true'
+USE_FIRESTORE = os.getenv('USE_FIRESTORE', 'False').lower() == 'true'
 
 # --- SERVICE INITIALIZATION ---
 session_manager = SessionManager()
-orchestrator = CrewOrchestrator(session_manager=session_manager)
+# CrewAI (y con él qdrant_client y todas las tools) tarda segundos en importarse:
+# el orquestador se construye en el warm-up, con el bot ya arrancado, no al cargar main
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+def get_orchestrator():
+    """Carga perezosa de CrewAI + agentes (warm-up o, como red de seguridad, primer uso)."""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                from src.crew_orchestrator import CrewOrchestrator
+                _orchestrator = CrewOrchestrator(session_manager=session_manager)
+    return _orchestrator
+
+chat_serializer = ChatSerializer(max_concurrency=CREW_MAX_CONCURRENCY)
+readiness = Readiness()
+# Trabajo posterior a la respuesta (persistencia, resumen): se espera en el apagado
+_background_tasks: set[asyncio.Task] = set()
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -49,73 +84,143 @@ async def chat_logic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     if not update.message or not update.message.text:
         return
 
+    timer = StageTimer()
+
     # --- 🛡️ CAPA DE IDENTIDAD (MIDDLEWARE) ---
     # 1. Resolvemos quién es el usuario consultando users.json
-    current_user = await asyncio.to_thread(IdentityManager.get_user, user_id)
+    current_user = await timer.run("identity", asyncio.to_thread(IdentityManager.get_user, user_id))
     logging.info("👤 User: %s (%s)", current_user.name, current_user.role)
 
-    # 2. Inyección de Contexto de usuario en las Tools (Global State)
-    # CUIDADO, naive: esto es un state global, no por instancia
-    if 'save_memory' in TOOL_MAPPING:
-        TOOL_MAPPING['save_memory'].set_context(current_user)
-
-    # 3. Bloqueo de seguridad para desconocidos
+    # 2. Bloqueo de seguridad para desconocidos
     if current_user.role == UserRole.GUEST:
         await context.bot.send_message(chat_id=chat_id, text="⛔ Acceso Denegado.")
         return
 
+    # 3. Contexto de usuario por petición: cada update corre en su propia Task,
+    # así que el contextvar no se mezcla entre chats concurrentes y llega a las tools
+    current_user_var.set(current_user)
+
+    # 4. Un turno a la vez por chat; chats distintos en paralelo (acotado)
+    async with chat_serializer.turn(chat_id):
+        await process_turn(update, context, current_user, timer)
+    logging.info("⏱️ Turno chat %s: %s", chat_id, timer.summary())
+
+def spawn(coro) -> asyncio.Task:
+    """Tarea en segundo plano con referencia fuerte (el loop solo guarda referencias débiles)."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def process_turn(update: Update, context: ContextTypes.DEFAULT_TYPE, current_user: UserContext, timer: StageTimer) -> None:
+    """
+    Router -> Agente Especialista -> Usuario, para un usuario ya autorizado.
+    Pipeline por dependencias: enrutado, guardado del mensaje, carga del historial y
+    búsqueda en memoria no dependen entre sí y corren a la vez; solo la ejecución
+    espera al router. La respuesta se guarda tras enviarla y el resumen rodante se
+    actualiza en segundo plano.
+    """
+    chat_id = update.effective_chat.id
     user_text = update.message.text
-    await context.bot.send_chat_action(chat_id=chat_id, action="typing")
+    spawn(context.bot.send_chat_action(chat_id=chat_id, action="typing"))
 
     try:
-        # FASE 1: ENRUTAMIENTO (Router Agent)
+        orchestrator = _orchestrator or await asyncio.to_thread(get_orchestrator)
+        # Los recuerdos relevantes se buscan mientras el router decide
+        memory_prefetch = orchestrator.prefetch_memories(user_text)
+        # Opt-in (SPECULATIVE_EXECUTION): el agente más probable empieza ya a trabajar
+        speculation = orchestrator.speculate(
+            user_text, chat_id, current_user, memory_prefetch, message_id=update.message.message_id
+        )
+
+        # FASE 1: ENRUTAMIENTO (Router Agent) + etapas independientes en paralelo
         # Averiguamos la intención inyectando la identidad (para matices de contexto)
         logging.info("Enrutando mensaje: %s", user_text)
-        target_agent = await asyncio.to_thread(
-            orchestrator.route_request,
-            user_text,
-            current_user
+        gathered = asyncio.gather(
+            timer.run("routing", asyncio.to_thread(
+                orchestrator.route_request,
+                user_text,
+                current_user,
+                chat_id
+            )),
+            timer.run("persist_user", asyncio.to_thread(
+                SessionManager.add_message,
+                chat_id,
+                {
+                    "role": current_user.role.value,
+                    "content": user_text,
+                    "user_id": current_user.telegram_id,
+                    "name": current_user.name,
+                    "message_id": update.message.message_id
+                }
+            )),
+            timer.run("history", asyncio.to_thread(orchestrator.load_chat_context, chat_id)),
+            # Una sola espera por turno: si hay especulación, comparte el resultado con ella
+            timer.run("memory", asyncio.to_thread(orchestrator.collect_memories, memory_prefetch)),
         )
+        try:
+            target_agent, _, chat_context, memories = await gathered
+        except Exception:
+            if speculation:
+                orchestrator.resolve_speculation(speculation, None)
+            raise
 
         logging.info("Destino decidido: %s", target_agent)
-        await context.bot.send_chat_action(chat_id=chat_id, action="typing")
-
-        await asyncio.to_thread(
-            SessionManager.add_message,
-            chat_id,
-            {
-                "role": current_user.role.value,
-                "content": user_text,
-                "user_id": current_user.telegram_id,
-                "name": current_user.name,
-                "message_id": update.message.message_id
-            }
-        )
+        spawn(context.bot.send_chat_action(chat_id=chat_id, action="typing"))
 
         # FASE 2: EJECUCIÓN (Specialist Agent)
         # Lanzamos el Crew específico inyectando Identidad + Memoria
-        respuesta = await asyncio.to_thread(
-            orchestrator.execute_request,
-            user_text,
-            target_agent,
-            chat_id,
-            current_user
-        )
+        header = f"🤖 [{target_agent}]\n\n"
+        streamer = None
+        if STREAM_RESPONSES:
+            # Los grupos tienen un rate limit de ediciones más estricto
+            interval = STREAM_EDIT_INTERVAL * (2 if chat_id < 0 else 1)
+            streamer = TelegramStreamEditor(context.bot, chat_id, header=header, min_interval=interval)
+
+        on_token = streamer.push if streamer else None
+        speculative_result = None
+        if speculation:
+            # Si el router coincide, la ejecución ya está en marcha (lo generado sale por el streamer)
+            speculative_result = orchestrator.resolve_speculation(speculation, target_agent, on_token)
+
+        try:
+            if speculative_result:
+                respuesta = await timer.run("execution", asyncio.wrap_future(speculative_result))
+            else:
+                respuesta = await timer.run("execution", asyncio.to_thread(
+                    orchestrator.execute_request,
+                    user_text,
+                    target_agent,
+                    chat_id,
+                    current_user,
+                    on_token,
+                    memories,
+                    chat_context,
+                    message_id=update.message.message_id
+                ))
+        except Exception:
+            if streamer:
+                await streamer.abort()
+            raise
 
-        # FASE 3: PERSISTENCIA (Chat History Local)
-        # Guardamos el turno para la "memoria de pez" (SessionManager)
-        # Esto permite mantener el hilo de la conversación inmediata
         respuesta_str = str(respuesta)
 
-        # 4. Respuesta al usuario
+        # FASE 3: Respuesta al usuario
         mensaje_final = f"🤖 *[{target_agent}]*\n\n{respuesta_str}"
-        sent_message = await context.bot.send_message(
-            chat_id=chat_id,
-            text=mensaje_final,
-            parse_mode='Markdown'
-        )
+        if streamer:
+            # El mensaje ya existe (parciales): última edición con el texto completo y formato
+            sent_message = await timer.run("reply", streamer.finish(mensaje_final, parse_mode='Markdown'))
+        else:
+            sent_message = await timer.run("reply", context.bot.send_message(
+                chat_id=chat_id,
+                text=mensaje_final,
+                parse_mode='Markdown'
+            ))
 
-        await asyncio.to_thread(
+        # FASE 4: PERSISTENCIA (Chat History Local), ya con la respuesta entregada
+        # Guardamos el turno para la "memoria de pez" (SessionManager) antes de soltar el
+        # turno del chat: el siguiente mensaje debe ver esta respuesta en su historial
+        await timer.run("persist_reply", asyncio.to_thread(
             SessionManager.add_message,
             chat_id,
             {
@@ -125,7 +230,9 @@ async def chat_logic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
                 "name": "LifeOS",
                 "message_id": sent_message.message_id # <--- CLAVE PARA CONTEXTO
             }
-        )
+        ))
+        # El resumen rodante sí va en segundo plano (lleva su propio guard por chat)
+        spawn(refresh_summary(orchestrator, chat_id))
 
     except Exception as e:
         logging.error("Error en el proceso: %s", e)
@@ -135,13 +242,93 @@ async def chat_logic(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
             parse_mode='Markdown'
         )
 
+async def refresh_summary(orchestrator, chat_id: int) -> None:
+    """Actualiza el resumen rodante del chat (fuera de la latencia visible)."""
+    try:
+        await asyncio.to_thread(orchestrator.update_summary, chat_id)
+    except Exception as e:
+        logging.warning("No se pudo actualizar el resumen del chat %s: %s", chat_id, e)
+
+async def _warm_step(name: str, fn) -> tuple[str, str]:
+    start = time.perf_counter()
+    try:
+        # Los clientes asíncronos se abren en el propio loop; el resto en un hilo
+        if inspect.iscoroutinefunction(fn):
+            await fn()
+        else:
+            await asyncio.to_thread(fn)
+        result = f"ok ({(time.perf_counter() - start) * 1000:.0f} ms)"
+    except Exception as e:
+        # Un backend caído no impide arrancar: se reintentará en el primer uso
+        logging.warning("⚠️ Warm-up '%s' fallido: %s", name, e)
+        result = f"error: {e}"
+    return name, result
+
+async def warm_up() -> dict[str, str]:
+    """
+    Abre en paralelo todas las conexiones (Firestore, Qdrant, LiteLLM) y deja
+    agentes y router listos, para que el primer usuario tras un cold start no pague nada.
+    """
+    from src.memory_manager import AsyncVectorMemoryManager, VectorMemoryManager
+
+    async def qdrant_async():
+        # Cliente del prefetch de memoria (AsyncQdrantClient, gRPC si QDRANT_PREFER_GRPC)
+        await AsyncVectorMemoryManager().warm_up()
+
+    steps = {
+        "sessions": SessionManager.connect,
+        "qdrant": VectorMemoryManager,  # conecta y verifica la colección
+        "qdrant_async": qdrant_async,
+        "litellm": BackendClients.ping_litellm,
+        "agents": lambda: get_orchestrator().warm_up(),
+    }
+    if USE_FIRESTORE:
+        steps["firestore"] = lambda: BackendClients.firestore().collection('users').limit(1).get()
+    results = dict(await asyncio.gather(*(_warm_step(name, fn) for name, fn in steps.items())))
+    logging.info("🔥 Warm-up completado: %s", results)
+    return results
+
+async def post_init(app) -> None:
+    """Recursos ligados al event loop del bot (pool de hilos, pool HTTP de embeddings) y warm-up."""
+    # asyncio.to_thread usa el executor por defecto: lo acotamos explícitamente
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix="lifeos-worker")
+    )
+    # Import pesado fuera del event loop: /healthz sigue respondiendo mientras tanto
+    memory_manager = await asyncio.to_thread(importlib.import_module, "src.memory_manager")
+    memory_manager.VectorMemoryManager.attach_embedding_client()
+    if IDENTITY_WATCH:
+        await asyncio.to_thread(IdentityManager.watch_users)
+    readiness.checks = await warm_up()
+
+async def post_shutdown(app) -> None:
+    """Cierre ordenado de los recursos creados en post_init."""
+    from src.memory_manager import VectorMemoryManager, AsyncVectorMemoryManager
+
+    # Respuestas aún sin persistir antes de vaciar el buffer de sesiones
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    IdentityManager.stop_watching()
+    await AsyncVectorMemoryManager.close()
+    await VectorMemoryManager.detach_embedding_client()
+    # Vacía el buffer de mensajes de sesión (o lo deja en el spool)
+    await asyncio.to_thread(SessionManager.close)
+    BackendClients.close()
+
 def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Captura errores de red y otros fallos sin romper el loop."""
     # Si es un error de red transitorio, solo lo logueamos como warning y seguimos
 
 def main():
     """Loop principal de Telegram."""
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        # Sin esto PTB procesa los updates de uno en uno
+        .concurrent_updates(True)
+        .build()
+    )
     app.add_handler(CommandHandler('start', start))
     app.add_handler(MessageHandler(filters.TEXT & (~filters.COMMAND), chat_logic))
     app.add_error_handler(error_handler)
@@ -154,8 +341,10 @@ def main():
         logging.info(f"🚀 Iniciando en modo WEBHOOK. Escuchando en el puerto {WEBHOOK_PORT}")
         logging.info(f"   - URL Pública: {WEBHOOK_URL}")
         
-        # El método run_webhook se encarga de configurar el webhook automáticamente.
-        app.run_webhook(
+        # Igual que app.run_webhook, más /healthz y /ready (503 hasta acabar el warm-up)
+        run_webhook(
+            app,
+            readiness,
             listen="0.0.0.0",
             port=WEBHOOK_PORT,
             url_path="telegram",
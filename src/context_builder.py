@@ -0,0 +1,110 @@
+'''
+Historial de conversación compacto y acotado en tokens para el prompt del especialista.
+Los turnos antiguos no se pierden: se resumen de forma incremental (resumen rodante)
+y el resumen se guarda en la sesión del chat.
+'''
+import math
+import os
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación barata (~4 caracteres por token en español/inglés).
+    Suficiente para un presupuesto; evita cargar un tokenizer en el hot path.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def _message_order(message_id) -> int | None:
+    """Los message_id de Telegram crecen dentro de un chat: sirven de cursor."""
+    try:
+        return int(message_id)
+    except (TypeError, ValueError):
+        return None
+
+
+class ContextBuilder:
+    """
+    Renderiza el historial como líneas "Nombre: texto" (sin IDs ni sintaxis de dict),
+    de más reciente a más antiguo hasta agotar el presupuesto de tokens del agente.
+    Lo ya cubierto por el resumen rodante no se repite literalmente.
+    """
+
+    def __init__(
+        self,
+        default_budget: int | None = None,
+        max_message_tokens: int | None = None,
+        verbatim_messages: int | None = None,
+        summary_batch: int | None = None
+    ):
+        self.default_budget = default_budget or int(os.getenv('CONTEXT_TOKEN_BUDGET', 1200))
+        self.max_message_tokens = max_message_tokens or int(os.getenv('CONTEXT_MAX_MESSAGE_TOKENS', 300))
+        # Los últimos N mensajes nunca se resumen; el resumen avanza de SUMMARY_BATCH en SUMMARY_BATCH
+        self.verbatim_messages = verbatim_messages or int(os.getenv('SUMMARY_VERBATIM_MESSAGES', 8))
+        self.summary_batch = summary_batch or int(os.getenv('SUMMARY_BATCH', 6))
+
+    def format_line(self, message: dict) -> str:
+        name = message.get('name') or message.get('role') or '?'
+        content = " ".join(str(message.get('content') or '').split())
+        max_chars = self.max_message_tokens * 4
+        if len(content) > max_chars:
+            content = content[:max_chars - 1] + "…"
+        return f"{name}: {content}"
+
+    @staticmethod
+    def _unsummarized(history: list[dict], summary: dict | None) -> list[dict]:
+        upto = _message_order(summary.get('upto')) if summary else None
+        if upto is None:
+            return history
+        return [m for m in history if (_message_order(m.get('message_id')) or 0) > upto]
+
+    def render(
+        self,
+        history: list[dict],
+        summary: dict | None,
+        budget: int | None = None,
+        current_message_id: int | str | None = None
+    ) -> str:
+        """
+        `current_message_id`: message_id del mensaje que se está respondiendo. Puede
+        estar ya persistido (y no ser el último en un grupo); va aparte en CURRENT REQUEST.
+        Se identifica por ID: un mensaje anterior con el mismo texto sí es historial.
+        """
+        budget = budget or self.default_budget
+        messages = self._unsummarized(history, summary)
+
+        if current_message_id is not None:
+            messages = [m for m in messages if str(m.get('message_id')) != str(current_message_id)]
+
+        summary_text = (summary or {}).get('summary') or ""
+        summary_block = f"Resumen de la conversación anterior: {summary_text}" if summary_text else ""
+        remaining = budget - estimate_tokens(summary_block)
+
+        lines: list[str] = []
+        for message in reversed(messages):
+            line = self.format_line(message)
+            cost = estimate_tokens(line) + 1
+            if cost > remaining:
+                break
+            lines.append(line)
+            remaining -= cost
+        lines.reverse()
+
+        if summary_block and remaining < 0:
+            # Ni el resumen cabe: se recorta antes que perder los turnos recientes
+            summary_block = summary_block[:max(budget, 0) * 4]
+        return "\n".join(part for part in [summary_block, *lines] if part)
+
+    def pending_for_summary(self, history: list[dict], summary: dict | None) -> list[dict]:
+        """
+        Mensajes que ya salen de la ventana literal y aún no están en el resumen.
+        Devuelve [] hasta acumular un lote completo (una llamada al LLM por lote).
+        """
+        messages = self._unsummarized(history, summary)
+        older = messages[:-self.verbatim_messages] if len(messages) > self.verbatim_messages else []
+        if len(older) < self.summary_batch:
+            return []
+        # Sin un message_id ordenable no se puede avanzar el cursor
+        if _message_order(older[-1].get('message_id')) is None:
+            return []
+        return older
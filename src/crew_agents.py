@@ -3,27 +3,43 @@ Docstring for src.crew_agents
 '''
 # src/crew_agents.py
 
-import yaml
 import os
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from crewai import Agent
 from src.llm_config import llm
 # NUEVO: Importamos el mapeo de herramientas
-from src.tools import TOOL_MAPPING 
+from src.tools import TOOL_MAPPING
+from src.utils.yaml_config import ReloadableYamlConfig
+
+
+@dataclass
+class AgentRegistry:
+    """
+    Versión inmutable de agents.yaml ya procesada: herramientas resueltas y un
+    pool de instancias de Agent listas para usar. Una por generación del YAML.
+    """
+    config: dict
+    tools: dict[str, list]
+    pools: dict[str, list[Agent]] = field(default_factory=dict)
+
 
 class LifeOSAgents:
     def __init__(self):
-        self.config = self._load_config()
-
-    def _load_config(self):
         config_path = os.path.join(os.path.dirname(__file__), 'config', 'agents.yaml')
-        if not os.path.exists(config_path):
-            raise FileNotFoundError(f"No se encuentra la configuración en {config_path}")
-        
-        with open(config_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+        self._source = ReloadableYamlConfig(config_path, build=self._build_registry)
+
+    @property
+    def config(self) -> dict:
+        return self._source.get().config
+
+    @property
+    def generation(self) -> int:
+        """Cambia cada vez que agents.yaml se recarga (para invalidar derivados)."""
+        self._source.get()
+        return self._source.generation
 
     def get_agents_summary(self):
-        # ... (código existente igual) ...
         summary_lines = []
         for key, data in self.config.items():
             if key == 'dispatcher':
@@ -32,20 +48,22 @@ class LifeOSAgents:
             summary_lines.append(line)
         return "\n".join(summary_lines)
 
-    def create_agent(self, agent_key):
-        """Factoría: Crea el agente e inyecta herramientas dinámicamente."""
-        agent_key = agent_key.lower()
-        agent_data = self.config.get(agent_key)
-        
-        if not agent_data:
-            # Fallback de seguridad, aunque idealmente debería lanzar error
-            print(f"⚠️ Agente '{agent_key}' no encontrado en YAML.")
-            return None
+    def _build_registry(self, config: dict) -> AgentRegistry:
+        """Resuelve herramientas y pre-construye un agente por clave (fuera del hot path)."""
+        registry = AgentRegistry(
+            config=config,
+            tools={key: self._resolve_tools(key, data) for key, data in config.items()}
+        )
+        for key in config:
+            registry.pools[key] = [self._build_agent(registry, key)]
+        return registry
 
+    @staticmethod
+    def _resolve_tools(agent_key: str, agent_data: dict) -> list:
         # --- LÓGICA DE INYECCIÓN DE HERRAMIENTAS ---
         agent_tools = []
         requested_tools = agent_data.get('tools', [])
-        
+
         if requested_tools:
             print(f"   🛠️  Equipando a {agent_key.upper()} con: {requested_tools}")
             for tool_name in requested_tools:
@@ -58,13 +76,56 @@ class LifeOSAgents:
                         agent_tools.append(tool_instance)
                 else:
                     print(f"   ⚠️  WARN: Herramienta '{tool_name}' no existe en el catálogo.")
+        return agent_tools
 
+    @staticmethod
+    def _build_agent(registry: AgentRegistry, agent_key: str) -> Agent:
+        agent_data = registry.config[agent_key]
         return Agent(
             role=agent_data['role'],
             goal=agent_data['goal'],
             backstory=agent_data['backstory'],
             verbose=agent_data.get('verbose', True),
             allow_delegation=agent_data.get('allow_delegation', False),
-            tools=agent_tools,
+            tools=registry.tools[agent_key],
             llm=llm
-        )
\ No newline at end of file
+        )
+
+    @contextmanager
+    def checkout(self, agent_key):
+        """
+        Presta un agente pre-construido del registro y lo devuelve al pool al
+        terminar. Cada instancia la usa un único Crew a la vez; si hay más
+        peticiones concurrentes que instancias, se construye otra (y se conserva).
+        Cede None si el agente no existe.
+        """
+        agent_key = agent_key.lower()
+        registry = self._source.get()
+        pool = registry.pools.get(agent_key)
+        if pool is None:
+            print(f"⚠️ Agente '{agent_key}' no encontrado en YAML.")
+            yield None
+            return
+
+        try:
+            agent = pool.pop()
+        except IndexError:
+            agent = self._build_agent(registry, agent_key)
+        try:
+            yield agent
+        finally:
+            # Si el YAML se recargó mientras tanto, la instancia vieja se descarta
+            if registry is self._source.get():
+                pool.append(agent)
+
+    def create_agent(self, agent_key):
+        """Factoría: Crea un agente nuevo (no compartido) con las herramientas ya resueltas."""
+        agent_key = agent_key.lower()
+        registry = self._source.get()
+
+        if agent_key not in registry.config:
+            # Fallback de seguridad, aunque idealmente debería lanzar error
+            print(f"⚠️ Agente '{agent_key}' no encontrado en YAML.")
+            return None
+
+        return self._build_agent(registry, agent_key)
@@ -2,17 +2,126 @@
 Orquestador de Crews para LifeOS.
 Coordina la ejecución de agentes y tareas según la solicitud del usuario.
 '''
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from contextlib import nullcontext
+from typing import Callable
 from crewai import Crew
+from crewai.events import crewai_event_bus
+from crewai.events.types.llm_events import LLMCallCompletedEvent
+from crewai.hooks.dispatch import InterceptionPoint, scoped_hooks
+from crewai.types.streaming import StreamChunkType
 from src.crew_agents import LifeOSAgents
+from src.context_builder import ContextBuilder
+from src.fast_router import FastRouter, RoutingCache, parse_agent_key, tokenize
+from src.memory_manager import AsyncVectorMemoryManager, VectorMemoryManager
 from src.tasks import LifeOSTasks
+from src.llm_config import llm
 from src.utils.session_manager import SessionManager
 from src.identity_manager import UserContext 
+from src.utils.request_context import bind_user, current_speculation
+from src.speculation import SpeculationCancelled, SpeculativeRun
+from src.schemas.memory import EpisodicMemoryItem
+
+
+@dataclass
+class ChatContext:
+    """Historial + resumen rodante de un chat, cargados antes de conocer el agente."""
+    history: list[dict]
+    summary: dict | None
+
+
+@dataclass
+class MemoryPrefetch:
+    """
+    Búsqueda en memoria a largo plazo lanzada en paralelo al enrutamiento.
+    Se resuelve una sola vez por turno (collect_memories): la ejecución
+    especulativa y la definitiva comparten el resultado, las stats y la pausa.
+    """
+    future: Future
+    started_at: float
+    memories: list[EpisodicMemoryItem] | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
 
 class CrewOrchestrator:
     def __init__(self, session_manager: SessionManager):
         self.agents = LifeOSAgents()
         self.tasks = LifeOSTasks()
         self.session_manager = session_manager
+        self.fast_router = self._build_fast_router()
+        self._router_generation = self.agents.generation
+        # Cuántas veces decide cada etapa: 'keyword', 'sticky', 'cache', 'embedding', 'llm'
+        # o 'fallback' (el Dispatcher no nombró un agente válido)
+        self.routing_stats: Counter = Counter()
+
+        # Cache de decisiones y "pegajosidad" por chat (0 desactiva cada mecanismo)
+        cache_ttl = float(os.getenv('ROUTER_CACHE_TTL', 600))
+        self.route_cache = RoutingCache(cache_ttl) if cache_ttl > 0 else None
+        self.sticky_seconds = float(os.getenv('ROUTER_STICKY_SECONDS', 120))
+        self.sticky_max_words = int(os.getenv('ROUTER_STICKY_MAX_WORDS', 6))
+        self._last_agent: dict[int, tuple[str, float]] = {}
+        # route_request corre en hilos del pool: agente previo y prior se tocan bajo este lock
+        self._routing_lock = threading.Lock()
+
+        # Mensajes de hasta N palabras van en una sola pasada con execution_mode: auto
+        self.single_pass_max_words = int(os.getenv('SINGLE_PASS_MAX_WORDS', 25))
+
+        # Historial con presupuesto de tokens + resumen rodante de los turnos antiguos
+        self.context_builder = ContextBuilder()
+        self._summarizing: set[int] = set()
+        self._summarizing_lock = threading.Lock()
+
+        # Prefetch de memoria: top-k recuerdos al prompt sin que el agente llame a la tool.
+        # Con plazo: si Qdrant va lento se responde sin ellos (y se pausa un rato)
+        self.memory_prefetch_k = int(os.getenv('MEMORY_PREFETCH_K', 3))
+        self.memory_prefetch_deadline = float(os.getenv('MEMORY_PREFETCH_DEADLINE', 0.8))
+        self.memory_prefetch_min_score = float(os.getenv('MEMORY_PREFETCH_MIN_SCORE', 0.55))
+        self.memory_prefetch_backoff = float(os.getenv('MEMORY_PREFETCH_BACKOFF', 30))
+        self._prefetch_paused_until = 0.0
+        self._prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-prefetch")
+        # 'hit', 'empty', 'timeout', 'error', 'paused'
+        self.prefetch_stats: Counter = Counter()
+
+        # Ejecución especulativa (opt-in): el agente más probable arranca mientras enruta
+        # el router. Cuesta tokens cuando falla: vigilar speculation_stats frente al rate limit
+        self.speculative_enabled = os.getenv('SPECULATIVE_EXECUTION', 'False').lower() == 'true'
+        self.speculative_default_agent = os.getenv('SPECULATIVE_DEFAULT_AGENT', 'JANE').upper()
+        max_speculations = int(os.getenv('SPECULATIVE_MAX_CONCURRENCY', 2))
+        self._speculation_slots = threading.BoundedSemaphore(max_speculations)
+        self._speculation_pool = ThreadPoolExecutor(max_workers=max_speculations, thread_name_prefix="speculation")
+        # Decisiones del router por agente: prior para chats sin agente previo
+        self._agent_prior: Counter = Counter()
+        # 'hit', 'miss', 'skipped_local', 'skipped_busy', 'wasted_tokens'
+        self.speculation_stats: Counter = Counter()
+        # task_id -> especulación: el uso real de tokens llega por el bus de eventos de CrewAI
+        self._speculative_tasks: dict[str, SpeculativeRun] = {}
+        self._speculative_tasks_lock = threading.Lock()
+        if self.speculative_enabled:
+            crewai_event_bus.on(LLMCallCompletedEvent)(self._record_speculative_usage)
+
+    def _build_fast_router(self) -> FastRouter | None:
+        """Router local sin LLM. Se desactiva con FAST_ROUTER_ENABLED=false."""
+        if os.getenv('FAST_ROUTER_ENABLED', 'True').lower() != 'true':
+            return None
+        use_embeddings = os.getenv('FAST_ROUTER_EMBEDDINGS', 'True').lower() == 'true'
+        return FastRouter(
+            self.agents.config,
+            embed_fn=VectorMemoryManager.embed_texts if use_embeddings else None
+        )
+
+    def warm_up(self) -> int:
+        """Agentes pre-construidos y prototipos del router listos antes del primer mensaje."""
+        agents = len(self.agents.config)
+        if self.fast_router:
+            self.fast_router.warm_up()
+        return agents
 
     def _format_identity_context(self, user: UserContext | None) -> str:
         """Helper para formatear la cabecera de identidad."""
@@ -28,46 +137,327 @@ class CrewOrchestrator:
             f"--------------------------------------------------\n"
         )
 
-    def route_request(self, user_message: str, user: UserContext | None = None) -> str:
+    def route_request(self, user_message: str, user: UserContext | None = None, chat_id: int | None = None) -> str:
+        """
+        Decide qué agente atiende el mensaje, de la etapa más barata a la más cara:
+        keywords -> agente previo del chat (follow-ups cortos) -> cache -> embeddings -> Dispatcher LLM.
+        """
+        if self._router_generation != self.agents.generation:
+            # agents.yaml ha cambiado: keywords y prototipos del fast-path también
+            self.fast_router = self._build_fast_router()
+            self._router_generation = self.agents.generation
+
+        role = user.role.value if user else None
+        agent, stage = self._route_locally(user_message, role, chat_id)
+
+        if agent is None:
+            agent, stage = self._route_with_llm(user_message, user), 'llm'
+
+        if agent is None or agent.lower() not in self.agents.config:
+            # Respuesta del Dispatcher ilegible (o agente retirado de agents.yaml):
+            # se atiende con JANE pero no se cachea ni se fija como agente del chat
+            print(f"⚠️ Decisión de enrutamiento no válida ({stage}: {agent!r}). Fallback a JANE.")
+            with self._routing_lock:
+                self.routing_stats['fallback'] += 1
+            return 'JANE'
+
+        if self.route_cache and stage in ('embedding', 'llm'):
+            self.route_cache.put(user_message, role, agent)
+        with self._routing_lock:
+            if chat_id is not None:
+                self._remember_agent(chat_id, agent)
+            self.routing_stats[stage] += 1
+            self._agent_prior[agent] += 1
+        return agent
+
+    def _remember_agent(self, chat_id: int, agent: str):
+        """
+        Agente previo del chat, sin acumular chats inactivos más allá de la ventana
+        sticky. Se llama con _routing_lock tomado.
+        """
+        now = time.monotonic()
+        self._last_agent[chat_id] = (agent, now)
+        expired = [
+            chat for chat, (_, decided_at) in self._last_agent.items()
+            if now - decided_at > self.sticky_seconds
+        ]
+        for chat in expired:
+            del self._last_agent[chat]
+
+    def _route_locally(self, user_message: str, role: str | None, chat_id: int | None) -> tuple[str | None, str | None]:
+        """Etapas sin LLM. Devuelve (agente, etapa) o (None, None) si ninguna es concluyente."""
+        if self.fast_router:
+            decision = self.fast_router.classify_keywords(user_message)
+            if decision:
+                return decision.agent, decision.stage
+
+        sticky_agent = self._sticky_agent(user_message, chat_id)
+        if sticky_agent:
+            return sticky_agent, 'sticky'
+
+        if self.route_cache:
+            cached_agent = self.route_cache.get(user_message, role)
+            if cached_agent:
+                return cached_agent, 'cache'
+
+        if self.fast_router:
+            decision = self.fast_router.classify_embedding(user_message)
+            if decision:
+                return decision.agent, decision.stage
+
+        return None, None
+
+    def _sticky_agent(self, user_message: str, chat_id: int | None) -> str | None:
+        """Un follow-up corto ("¿y para mañana?") sigue con el agente que acaba de responder."""
+        if chat_id is None or self.sticky_seconds <= 0:
+            return None
+        with self._routing_lock:
+            previous = self._last_agent.get(chat_id)
+        if not previous:
+            return None
+        agent, decided_at = previous
+        if time.monotonic() - decided_at > self.sticky_seconds:
+            return None
+        if len(tokenize(user_message)) > self.sticky_max_words:
+            return None
+        return agent
+
+    def _predict_agent(self, chat_id: int | None) -> str:
+        """Agente previo del chat; si no hay, el que más decide el router; si no, el por defecto."""
+        with self._routing_lock:
+            previous = self._last_agent.get(chat_id) if chat_id is not None else None
+            if previous:
+                return previous[0]
+            if self._agent_prior:
+                return self._agent_prior.most_common(1)[0][0]
+        return self.speculative_default_agent
+
+    def speculate(
+        self,
+        user_message: str,
+        chat_id: int | None = None,
+        user: UserContext | None = None,
+        memory_prefetch: MemoryPrefetch | None = None,
+        message_id: int | None = None
+    ) -> SpeculativeRun | None:
+        """
+        Arranca en segundo plano al agente más probable (sin bloquear). Solo cuando
+        el router no puede decidir al instante (keywords o agente previo): en ese
+        caso especular no adelanta nada. Se resuelve con resolve_speculation.
+        """
+        if not self.speculative_enabled:
+            return None
+        if self.fast_router and self.fast_router.classify_keywords(user_message):
+            self.speculation_stats['skipped_local'] += 1
+            return None
+        if self._sticky_agent(user_message, chat_id):
+            self.speculation_stats['skipped_local'] += 1
+            return None
+        if not self._speculation_slots.acquire(blocking=False):
+            self.speculation_stats['skipped_busy'] += 1
+            return None
+
+        run = SpeculativeRun(agent=self._predict_agent(chat_id), started_at=time.monotonic())
+
+        def _execute():
+            current_speculation.set(run)
+            return self.execute_request(
+                user_message, run.agent, chat_id, user, on_token=run.push,
+                memories=self.collect_memories(memory_prefetch), message_id=message_id
+            )
+
+        # El contexto del turno (usuario, etc.) viaja al hilo igual que con asyncio.to_thread
+        context = contextvars.copy_context()
+        try:
+            run.future = self._speculation_pool.submit(context.run, _execute)
+        except Exception:
+            self._speculation_slots.release()
+            raise
+        run.future.add_done_callback(lambda _: self._speculation_slots.release())
+        run.future.add_done_callback(lambda _: self._untrack_speculation(run))
+        print(f"🔮 Especulando con '{run.agent}' mientras decide el router")
+        return run
+
+    def resolve_speculation(
+        self,
+        run: SpeculativeRun,
+        target_agent_key: str | None,
+        on_token: Callable[[str], None] | None = None
+    ) -> Future | None:
+        """
+        Confirma la especulación si el router eligió el mismo agente y devuelve el
+        Future con su resultado (los fragmentos ya generados salen por `on_token`).
+        Si no coincide (o `target_agent_key` es None, p. ej. el router falló) la
+        cancela y devuelve None: hay que ejecutar al agente correcto.
+        """
+        if target_agent_key is not None and target_agent_key.upper() == run.agent:
+            run.commit(on_token)
+            self.speculation_stats['hit'] += 1
+            print(f"🔮 Especulación acertada: '{run.agent}' llevaba {time.monotonic() - run.started_at:.1f}s trabajando")
+            return run.future
+
+        self.speculation_stats['wasted_tokens'] += run.cancel()
+        self.speculation_stats['miss'] += 1
+        print(f"🔮 Especulación fallida: '{run.agent}' != '{target_agent_key}' (se corta en la próxima llamada al LLM)")
+        run.future.add_done_callback(lambda future: self._count_wasted_tokens(run, future))
+        return None
+
+    def _track_speculation(self, run: SpeculativeRun, tasks: list):
+        with self._speculative_tasks_lock:
+            for task in tasks:
+                run.task_ids.add(str(task.id))
+                self._speculative_tasks[str(task.id)] = run
+
+    def _untrack_speculation(self, run: SpeculativeRun):
+        # Los eventos se despachan en otro hilo: que lleguen los últimos antes de soltar la run
+        crewai_event_bus.flush(timeout=5)
+        with self._speculative_tasks_lock:
+            for task_id in run.task_ids:
+                self._speculative_tasks.pop(task_id, None)
+
+    def _record_speculative_usage(self, source, event: LLMCallCompletedEvent):
+        """Uso real de cada llamada al LLM de una especulación (handler del bus de CrewAI)."""
+        with self._speculative_tasks_lock:
+            run = self._speculative_tasks.get(event.task_id) if event.task_id else None
+        tokens = (event.usage or {}).get('total_tokens') or 0
+        if run is not None and tokens and run.record_usage(tokens):
+            # Llamada terminada después del descarte: también es coste perdido
+            self.speculation_stats['wasted_tokens'] += tokens
+
+    def _count_wasted_tokens(self, run: SpeculativeRun, future: Future):
+        """Si el LLM nunca informó de uso, se cuentan los tokens de salida estimados."""
+        if not run.llm_tokens:
+            self.speculation_stats['wasted_tokens'] += run.streamed_tokens
+        error = None if future.cancelled() else future.exception()
+        if error is not None and not isinstance(error, SpeculationCancelled):
+            print(f"⚠️ Especulación descartada con error: {error}")
+
+    def speculation_hit_rate(self) -> float | None:
+        decided = self.speculation_stats['hit'] + self.speculation_stats['miss']
+        return self.speculation_stats['hit'] / decided if decided else None
+
+    def _route_with_llm(self, user_message: str, user: UserContext | None = None) -> str | None:
         """
         Ejecuta el Router con la lista de agentes dinámica e identidad del usuario.
+        Devuelve la clave del agente elegido o None si la respuesta no nombra uno válido.
         """
-        # 1. Crear el agente Router
-        dispatcher = self.agents.create_agent('dispatcher')
-        
-        # 2. OBTENER EL MENÚ DINÁMICO (Auto-Discovery)
+        # 1. OBTENER EL MENÚ DINÁMICO (Auto-Discovery)
         options_text = self.agents.get_agents_summary()
         
-        # 3. PREPARAR EL PROMPT CON IDENTIDAD
+        # 2. PREPARAR EL PROMPT CON IDENTIDAD
         # Inyectamos quién habla para que el router detecte matices (ej: si habla un niño vs un adulto)
         identity_header = self._format_identity_context(user)
         full_context_message = f"{identity_header}\nIncoming Message: {user_message}"
         
-        # 4. Crear la tarea inyectando el menú y el mensaje enriquecido
-        routing_task = self.tasks.router_task(dispatcher, full_context_message, options_text)
-        
-        routing_crew = Crew(
-            agents=[dispatcher],
-            tasks=[routing_task],
-            verbose=True
-        )
-        decision = routing_crew.kickoff()
-        return str(decision).strip().upper()
+        # 3. Tomar el agente Router pre-construido y crear la tarea con el menú
+        with self.agents.checkout('dispatcher') as dispatcher:
+            routing_task = self.tasks.router_task(dispatcher, full_context_message, options_text)
+            
+            routing_crew = Crew(
+                agents=[dispatcher],
+                tasks=[routing_task],
+                verbose=True
+            )
+            decision = routing_crew.kickoff()
+        agent_keys = {key.upper() for key in self.agents.config if key != 'dispatcher'}
+        return parse_agent_key(str(decision), agent_keys)
+
+    def _resolve_execution_mode(self, yaml_key: str, user_message: str) -> str:
+        """'single_pass' o 'two_pass' según agents.yaml; 'auto' decide por longitud del mensaje."""
+        mode = self.agents.config[yaml_key].get('execution_mode', 'two_pass')
+        if mode == 'auto':
+            short = len(user_message.split()) <= self.single_pass_max_words
+            return 'single_pass' if short else 'two_pass'
+        return mode
+
+    def prefetch_memories(self, user_message: str) -> MemoryPrefetch | None:
+        """
+        Lanza la búsqueda de recuerdos sin bloquear (se recoge con collect_memories).
+        Desde el event loop del bot la búsqueda es asíncrona (AsyncVectorMemoryManager)
+        y no ocupa un hilo mientras espera a Qdrant; fuera de él va al pool de prefetch.
+        """
+        if self.memory_prefetch_k <= 0:
+            return None
+        if time.monotonic() < self._prefetch_paused_until:
+            self.prefetch_stats['paused'] += 1
+            return None
+        search = dict(limit=self.memory_prefetch_k, score_threshold=self.memory_prefetch_min_score, raise_errors=True)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            future = asyncio.run_coroutine_threadsafe(
+                AsyncVectorMemoryManager().search_memory(user_message, **search), loop
+            )
+        else:
+            future = self._prefetch_pool.submit(
+                lambda: VectorMemoryManager().search_memory(user_message, **search)
+            )
+        return MemoryPrefetch(future=future, started_at=time.monotonic())
+
+    def collect_memories(self, prefetch: MemoryPrefetch | None) -> list[EpisodicMemoryItem]:
+        """Espera al prefetch dentro de su plazo; las llamadas siguientes del turno reutilizan el resultado."""
+        if prefetch is None:
+            return []
+        with prefetch.lock:
+            if prefetch.memories is None:
+                prefetch.memories = self._await_prefetch(prefetch)
+            return prefetch.memories
 
-    def execute_request(self, user_message: str, target_agent_key: str, chat_id: int | None = None, user: UserContext | None = None):
+    def _await_prefetch(self, prefetch: MemoryPrefetch) -> list[EpisodicMemoryItem]:
+        remaining = self.memory_prefetch_deadline - (time.monotonic() - prefetch.started_at)
+        try:
+            memories = prefetch.future.result(timeout=max(remaining, 0))
+        except FutureTimeout:
+            self.prefetch_stats['timeout'] += 1
+            self._prefetch_paused_until = time.monotonic() + self.memory_prefetch_backoff
+            print(f"⏱️ Prefetch de memoria fuera de plazo ({self.memory_prefetch_deadline}s): se omite")
+            return []
+        except Exception as e:
+            # Qdrant o LiteLLM caídos: misma pausa que con la lentitud
+            self.prefetch_stats['error'] += 1
+            self._prefetch_paused_until = time.monotonic() + self.memory_prefetch_backoff
+            print(f"⚠️ Prefetch de memoria fallido: {e}")
+            return []
+        self.prefetch_stats['hit' if memories else 'empty'] += 1
+        return memories
+
+    @staticmethod
+    def _format_memories(memories: list[EpisodicMemoryItem]) -> str:
+        lines = [
+            f"- [{item.created_at[:10]}] ({item.metadata.domain.value}/{item.metadata.type.value}): {item.content}"
+            for item in memories
+        ]
+        return "🗂️ RELEVANT MEMORIES (memoria a largo plazo; úsala solo si aplica):\n" + "\n".join(lines) + "\n"
+
+    def execute_request(
+        self,
+        user_message: str,
+        target_agent_key: str,
+        chat_id: int | None = None,
+        user: UserContext | None = None,
+        on_token: Callable[[str], None] | None = None,
+        memories: list[EpisodicMemoryItem] | None = None,
+        chat_context: ChatContext | None = None,
+        message_id: int | None = None
+    ):
         """
         Ejecuta al agente seleccionado inyectando MEMORIA e IDENTIDAD.
+        Si se pasa `on_token`, el Crew se ejecuta en modo streaming y recibe los
+        fragmentos de texto de la tarea final (la que ve el usuario) según llegan.
+        `memories` (de collect_memories) aporta los recuerdos ya buscados,
+        `chat_context` (de load_chat_context) el historial ya cargado y `message_id`
+        identifica el mensaje actual para no repetirlo como historial.
         """
         # target_agent_key viene en MAYÚSCULAS desde el Router (ej: "PADRINO")
         yaml_key = target_agent_key.lower()
         
         print(f"🚀 Orquestador: Activando agente '{yaml_key}' para usuario '{user.name if user else 'Unknown'}'...")
 
-        try:
-            agent = self.agents.create_agent(yaml_key)
-        except ValueError:
+        if yaml_key not in self.agents.config:
             print(f"⚠️ Agente '{yaml_key}' no encontrado. Fallback a JANE.")
-            agent = self.agents.create_agent('jane')
+            yaml_key = 'jane'
 
         # --- CONSTRUCCIÓN DEL PROMPT MAESTRO ---
         prompt_parts = []
@@ -76,26 +466,110 @@ class CrewOrchestrator:
         if user:
             prompt_parts.append(self._format_identity_context(user))
 
-        # 2. MEMORIA DE SESIÓN (¿Qué dijimos antes?)
+        # 2. MEMORIA DE SESIÓN (¿Qué dijimos antes?) — compacta y con presupuesto por agente
         if chat_id:
-            context_history = self.session_manager.get_context(chat_id)
-            if context_history:
+            chat_context = chat_context or self.load_chat_context(chat_id)
+            history_block = self.context_builder.render(
+                chat_context.history,
+                chat_context.summary,
+                budget=self.agents.config[yaml_key].get('context_budget'),
+                current_message_id=message_id
+            )
+            if history_block:
                 print(f"🧠 Inyectando memoria contextual para Chat ID {chat_id}")
-                prompt_parts.append(f"📜 CHAT HISTORY:\n{context_history}\n")
+                prompt_parts.append(f"📜 CHAT HISTORY:\n{history_block}\n")
+
+        # 3. MEMORIA A LARGO PLAZO (buscada mientras se enrutaba)
+        if memories:
+            print(f"🗂️ Inyectando {len(memories)} recuerdos pre-cargados")
+            prompt_parts.append(self._format_memories(memories))
 
-        # 3. MENSAJE ACTUAL (¿Qué quieres?)
+        # 4. MENSAJE ACTUAL (¿Qué quieres?)
         prompt_parts.append(f"👇 CURRENT REQUEST:\n{user_message}")
 
         # Unimos todo
         full_message = "\n".join(prompt_parts)
 
         # --- EJECUCIÓN ---
-        task1 = self.tasks.analysis_task(agent, full_message)
-        task2 = self.tasks.response_task(agent)
-        
-        execution_crew = Crew(
-            agents=[agent],
-            tasks=[task1, task2],
-            verbose=True
+        mode = self._resolve_execution_mode(yaml_key, user_message)
+        print(f"⚙️ Modo de ejecución: {mode}")
+
+        # El agente sale del registro pre-construido y vuelve a él al terminar.
+        # El usuario viaja en un contextvar hasta las tools (no hay estado global)
+        with bind_user(user), self.agents.checkout(yaml_key) as agent:
+            if mode == 'single_pass':
+                tasks = [self.tasks.single_pass_task(agent, full_message)]
+            else:
+                tasks = [
+                    self.tasks.analysis_task(agent, full_message),
+                    self.tasks.response_task(agent)
+                ]
+            
+            execution_crew = Crew(
+                agents=[agent],
+                tasks=tasks,
+                verbose=True,
+                stream=on_token is not None
+            )
+
+            # Especulación: si el router la descarta, el Crew se corta antes de la siguiente
+            # llamada al LLM (no al terminar) y libera su hueco cuanto antes
+            speculation = current_speculation.get()
+            guard = nullcontext()
+            if speculation is not None:
+                self._track_speculation(speculation, tasks)
+                guard = scoped_hooks({InterceptionPoint.PRE_MODEL_CALL: [speculation.check]})
+
+            with guard:
+                if on_token is None:
+                    return execution_crew.kickoff()
+                return self._kickoff_streaming(execution_crew, final_task_index=len(tasks) - 1, on_token=on_token)
+
+    def load_chat_context(self, chat_id: int) -> ChatContext:
+        """Historial y resumen del chat (no depende del agente: se carga mientras se enruta)."""
+        return ChatContext(
+            history=self.session_manager.get_context(chat_id),
+            summary=self.session_manager.get_summary(chat_id)
         )
-        return execution_crew.kickoff()
\ No newline at end of file
+
+    def update_summary(self, chat_id: int) -> bool:
+        """
+        Incorpora al resumen rodante los mensajes que ya salen de la ventana literal.
+        Solo llama al LLM cuando hay un lote completo; se ejecuta fuera del camino
+        crítico (después de responder al usuario), una sola vez a la vez por chat.
+        """
+        with self._summarizing_lock:
+            if chat_id in self._summarizing:
+                return False
+            self._summarizing.add(chat_id)
+        try:
+            return self._update_summary(chat_id)
+        finally:
+            with self._summarizing_lock:
+                self._summarizing.discard(chat_id)
+
+    def _update_summary(self, chat_id: int) -> bool:
+        summary = self.session_manager.get_summary(chat_id)
+        to_fold = self.context_builder.pending_for_summary(self.session_manager.get_context(chat_id), summary)
+        if not to_fold:
+            return False
+
+        prompt = self.tasks.summary_prompt(
+            (summary or {}).get('summary', ""),
+            "\n".join(self.context_builder.format_line(message) for message in to_fold)
+        )
+        new_summary = str(llm.call(prompt)).strip()
+        if not new_summary:
+            return False
+        self.session_manager.set_summary(chat_id, new_summary, upto=to_fold[-1]['message_id'])
+        print(f"📝 Resumen de Chat ID {chat_id} actualizado (+{len(to_fold)} mensajes)")
+        return True
+
+    @staticmethod
+    def _kickoff_streaming(crew: Crew, final_task_index: int, on_token: Callable[[str], None]):
+        """Consume el stream del Crew reenviando solo el texto de la tarea final."""
+        streaming = crew.kickoff()
+        for chunk in streaming:
+            if chunk.chunk_type == StreamChunkType.TEXT and chunk.task_index == final_task_index:
+                on_token(chunk.content)
+        return streaming.result
@@ -0,0 +1,362 @@
+'''
+Importador de documentos a la memoria episódica (MemorySource.DOCUMENT_IMPORT).
+Lee ficheros grandes de texto, Markdown o JSONL en streaming, los trocea,
+calcula los embeddings por lotes con concurrencia acotada y hace upserts
+encadenados (varios lotes en vuelo). El progreso queda en un checkpoint:
+una importación interrumpida continúa donde se quedó.
+
+Uso: python -m src.document_import FICHERO [FICHERO ...] [--domain meta] [--type fact]
+     [--tags "a, b"] [--author nombre] [--text-field content] [--restart]
+'''
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+
+from src.memory_manager import AsyncVectorMemoryManager, VectorMemoryManager
+from src.schemas.memory import EpisodicMemoryItem, EpisodicMemoryMetadata, MemoryDomain, MemorySource, MemoryType
+from src.utils.embedding_client import AsyncEmbeddingClient
+
+logger = logging.getLogger(__name__)
+
+_HEADING_RE = re.compile(r"^#{1,6}\s+\S")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…])\s+")
+# Espacio de nombres de los IDs (fichero + contenido del trozo): reimportar un documento
+# editado sobrescribe los trozos que no cambian, aunque se hayan desplazado
+_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "lifeos/document_import")
+
+
+# --- CHUNKING (streaming) ---
+
+def _split_long(text: str, max_chars: int) -> Iterator[str]:
+    """Trozos de hasta max_chars cortando por frases (y, si no hay más remedio, por espacios)."""
+    if len(text) <= max_chars:
+        yield text
+        return
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                yield current
+                current = ""
+            yield sentence[:cut].strip()
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            yield current
+            current = ""
+        current = f"{current} {sentence}".strip()
+    if current:
+        yield current
+
+
+def chunk_text(lines: Iterable[str], max_chars: int) -> Iterator[str]:
+    """
+    Texto plano o Markdown: agrupa párrafos hasta max_chars. Un encabezado cierra
+    el trozo en curso y se antepone a los siguientes como contexto de sección.
+    """
+    heading = ""
+    paragraph: list[str] = []
+    chunk = ""
+
+    def with_heading(body: str) -> str:
+        return f"{heading}\n{body}" if heading else body
+
+    def pack(text: str) -> Iterator[str]:
+        nonlocal chunk
+        budget = max_chars - (len(heading) + 1 if heading else 0)
+        for piece in _split_long(text, max(budget, 1)):
+            if chunk and len(chunk) + 2 + len(piece) > budget:
+                yield with_heading(chunk)
+                chunk = ""
+            chunk = f"{chunk}\n\n{piece}" if chunk else piece
+
+    for line in lines:
+        stripped = line.strip()
+        if _HEADING_RE.match(stripped):
+            yield from pack(" ".join(paragraph))
+            paragraph = []
+            if chunk:
+                yield with_heading(chunk)
+                chunk = ""
+            heading = stripped.lstrip("#").strip()
+        elif stripped:
+            paragraph.append(stripped)
+        elif paragraph:
+            yield from pack(" ".join(paragraph))
+            paragraph = []
+
+    if paragraph:
+        yield from pack(" ".join(paragraph))
+    if chunk:
+        yield with_heading(chunk)
+
+
+def chunk_jsonl(lines: Iterable[str], max_chars: int, text_field: str = "content") -> Iterator[str]:
+    """JSONL: un registro por línea; se usa `text_field` (o 'text'). Las líneas inválidas se saltan."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            logger.warning(f"Línea {number}: JSON inválido, se salta")
+            continue
+        text = (record.get(text_field) or record.get("text")) if isinstance(record, dict) else None
+        if not text or not str(text).strip():
+            continue
+        yield from _split_long(" ".join(str(text).split()), max_chars)
+
+
+def iter_chunks(path: str, max_chars: int, text_field: str = "content") -> Iterator[str]:
+    """Trozos de un fichero sin cargarlo entero en memoria. Mismo fichero -> mismos trozos."""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith(".jsonl"):
+            yield from chunk_jsonl(f, max_chars, text_field)
+        else:
+            yield from chunk_text(f, max_chars)
+
+
+# --- CHECKPOINT ---
+
+class ImportCheckpoint:
+    """
+    Trozos ya confirmados por Qdrant, por fichero. Si el fichero cambia
+    (tamaño o fecha) se empieza de cero. Se escribe de forma atómica.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._state: dict[str, dict] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._state = json.load(f)
+
+    @staticmethod
+    def _fingerprint(source: str) -> str:
+        stat = os.stat(source)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def resume_from(self, source: str) -> int:
+        entry = self._state.get(os.path.abspath(source))
+        if not entry or entry.get("fingerprint") != self._fingerprint(source):
+            return 0
+        return entry.get("chunks_done", 0)
+
+    def save(self, source: str, chunks_done: int, finished: bool = False):
+        self._state[os.path.abspath(source)] = {
+            "fingerprint": self._fingerprint(source),
+            "chunks_done": chunks_done,
+            "finished": finished,
+        }
+        self._write()
+
+    def forget(self, source: str):
+        if self._state.pop(os.path.abspath(source), None) is not None:
+            self._write()
+
+    def _write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+# --- PIPELINE ---
+
+@dataclass
+class ImportStats:
+    source: str
+    chunks: int = 0
+    skipped: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+
+class DocumentImporter:
+    """
+    Trocea -> embeddings (lotes, concurrencia acotada) -> upsert sin esperar.
+    Hasta `concurrency` lotes en vuelo; el checkpoint solo avanza sobre lotes
+    contiguos ya aceptados por Qdrant, y los IDs son deterministas, así que
+    repetir un lote al reanudar no duplica nada. Al terminar un fichero se borran
+    sus trozos de versiones anteriores (los que ya no están en el documento).
+    """
+
+    def __init__(
+        self,
+        memory: AsyncVectorMemoryManager,
+        embedder: AsyncEmbeddingClient,
+        checkpoint: ImportCheckpoint,
+        metadata: EpisodicMemoryMetadata,
+        author: str | None = None,
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+        max_chars: int | None = None,
+        text_field: str = "content"
+    ):
+        self.memory = memory
+        self.embedder = embedder
+        self.checkpoint = checkpoint
+        self.metadata = metadata
+        self.author = author
+        self.batch_size = batch_size or int(os.getenv("MEMORY_IMPORT_BATCH", 64))
+        self.concurrency = concurrency or int(os.getenv("MEMORY_IMPORT_CONCURRENCY", 4))
+        self.max_chars = max_chars or int(os.getenv("MEMORY_IMPORT_CHUNK_CHARS", 1000))
+        self.text_field = text_field
+
+    @staticmethod
+    def _chunk_id(source: str, text: str) -> str:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return str(uuid.uuid5(_ID_NAMESPACE, f"{os.path.abspath(source)}:{digest}"))
+
+    def _item(self, source: str, text: str) -> EpisodicMemoryItem:
+        tags = ", ".join(filter(None, [self.metadata.context_tags, os.path.basename(source)]))
+        return EpisodicMemoryItem(
+            id=self._chunk_id(source, text),
+            content=text,
+            metadata=self.metadata.model_copy(update={"context_tags": tags}),
+            created_by=self.author
+        )
+
+    async def _store(self, source: str, items: list[EpisodicMemoryItem]):
+        vectors = await self.embedder.embed_many([item.content for item in items])
+        await self.memory.add_embedded(items, vectors, wait=False, import_source=os.path.abspath(source))
+
+    async def import_file(self, source: str) -> ImportStats:
+        start = time.perf_counter()
+        skip = self.checkpoint.resume_from(source)
+        stats = ImportStats(source=source, skipped=skip)
+        if skip:
+            logger.info(f"⏩ {source}: reanudando tras {skip} trozos ya importados")
+
+        chunks = iter_chunks(source, self.max_chars, self.text_field)
+        # IDs de la versión actual del fichero, incluidos los trozos ya importados
+        current_ids = {self._chunk_id(source, text) for text in itertools.islice(chunks, skip)}
+        in_flight: dict[asyncio.Task, tuple[int, int]] = {}
+        finished: dict[int, int] = {}
+        next_batch = 0
+        committed = skip
+
+        def settle(done: set[asyncio.Task]):
+            nonlocal next_batch, committed
+            for task in done:
+                batch_index, size = in_flight.pop(task)
+                task.result()  # Propaga el error del lote
+                finished[batch_index] = size
+            while next_batch in finished:
+                committed += finished.pop(next_batch)
+                next_batch += 1
+            self.checkpoint.save(source, committed)
+
+        try:
+            batch_index = 0
+            while True:
+                batch = list(itertools.islice(chunks, self.batch_size))
+                if not batch:
+                    break
+                items = [self._item(source, text) for text in batch]
+                current_ids.update(item.id for item in items)
+                while len(in_flight) >= self.concurrency:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    settle(done)
+                in_flight[asyncio.create_task(self._store(source, items))] = (batch_index, len(items))
+                batch_index += 1
+                stats.chunks += len(items)
+                if batch_index % 10 == 0:
+                    elapsed = time.perf_counter() - start
+                    logger.info(f"📥 {source}: {committed} trozos confirmados ({stats.chunks / elapsed:.1f} trozos/s)")
+
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                settle(done)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+
+        self.checkpoint.save(source, committed, finished=True)
+        stats.removed = await self.memory.prune_import(os.path.abspath(source), current_ids)
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+
+async def run_import(args: argparse.Namespace) -> list[ImportStats]:
+    checkpoint = ImportCheckpoint(args.checkpoint)
+    # Sin cache de embeddings: los trozos de un documento no se repiten en chat
+    embedder = AsyncEmbeddingClient.from_env(VectorMemoryManager._embedding_model)
+    embedder.bind()
+    memory = AsyncVectorMemoryManager(collection_name=args.collection)
+    importer = DocumentImporter(
+        memory=memory,
+        embedder=embedder,
+        checkpoint=checkpoint,
+        metadata=EpisodicMemoryMetadata(
+            domain=args.domain,
+            type=args.type,
+            source=MemorySource.DOCUMENT_IMPORT,
+            context_tags=args.tags
+        ),
+        author=args.author,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        max_chars=args.chunk_chars,
+        text_field=args.text_field
+    )
+    results = []
+    try:
+        for source in args.files:
+            if args.restart:
+                checkpoint.forget(source)
+            stats = await importer.import_file(source)
+            results.append(stats)
+            print(
+                f"✅ {source}: {stats.chunks} trozos en {stats.seconds:.1f}s "
+                f"({stats.chunks_per_second:.1f} trozos/s"
+                + (f", {stats.skipped} ya importados" if stats.skipped else "")
+                + (f", {stats.removed} obsoletos borrados)" if stats.removed else ")")
+            )
+    finally:
+        await embedder.aclose()
+        await AsyncVectorMemoryManager.close()
+    return results
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Importa documentos a la memoria episódica de LifeOS.")
+    parser.add_argument("files", nargs="+", help="Ficheros .txt, .md o .jsonl")
+    parser.add_argument("--domain", type=MemoryDomain, default=MemoryDomain.META)
+    parser.add_argument("--type", type=MemoryType, default=MemoryType.FACT)
+    parser.add_argument("--tags", default=None, help="Etiquetas comunes, separadas por comas")
+    parser.add_argument("--author", default=None, help="created_by de los recuerdos importados")
+    parser.add_argument("--text-field", default="content", help="Campo de texto en JSONL")
+    parser.add_argument("--collection", default="episodic_memory_v1")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--chunk-chars", type=int, default=None)
+    parser.add_argument(
+        "--checkpoint",
+        default=os.getenv("MEMORY_IMPORT_CHECKPOINT", os.path.join("data", "import_checkpoint.json"))
+    )
+    parser.add_argument("--restart", action="store_true", help="Ignora el checkpoint y empieza de cero")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_import(_parse_args()))
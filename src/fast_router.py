@@ -0,0 +1,198 @@
+'''
+Router local (sin LLM) que se ejecuta antes del Dispatcher de CrewAI.
+Decide los mensajes claramente clasificables con reglas de keywords y, si hay
+duda, por similitud de embeddings contra vectores prototipo de cada agente.
+Por debajo del umbral de confianza devuelve None y decide el LLM.
+'''
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+")
+# Una keyword corta solo cuenta como palabra entera (o su plural): 'menu' no casa con 'menudo'
+_SHORT_KEYWORD = 4
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin tildes, para comparar keywords sin depender de la ortografía."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def _matches(token: str, keyword: str) -> bool:
+    if len(keyword) <= _SHORT_KEYWORD:
+        return token in (keyword, f"{keyword}s", f"{keyword}es")
+    return token.startswith(keyword)
+
+
+def parse_agent_key(text: str, agent_keys: set[str]) -> str | None:
+    """
+    Extrae la clave de agente de la respuesta del Dispatcher ("PADRINO", "**Padrino**.",
+    "El agente es KITCHEN"...). None si no nombra exactamente un agente conocido.
+    """
+    named = {token.upper() for token in tokenize(text)} & agent_keys
+    return named.pop() if len(named) == 1 else None
+
+
+@dataclass
+class RouteDecision:
+    agent: str          # Clave del agente en MAYÚSCULAS (como la devuelve el Dispatcher)
+    confidence: float
+    stage: str          # 'keyword' | 'embedding'
+
+
+class FastRouter:
+    """
+    Clasificador de dos etapas construido a partir de agents.yaml:
+    1. Keywords: prefijos declarados en `routing.keywords`. Solo decide si los
+       aciertos pesan en el mensaje (mínimo de aciertos o proporción de palabras),
+       no por una coincidencia suelta en una frase larga.
+    2. Embeddings: coseno contra el centroide de `routing.examples` + `goal`.
+    """
+
+    def __init__(
+        self,
+        agents_config: dict,
+        embed_fn: Callable[[list[str]], list[list[float]]] | None = None,
+        threshold: float | None = None,
+    ):
+        self.threshold = threshold if threshold is not None else float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", 0.75))
+        self.min_hits = int(os.getenv("ROUTER_KEYWORD_MIN_HITS", 2))
+        self.min_hit_ratio = float(os.getenv("ROUTER_KEYWORD_MIN_RATIO", 0.25))
+        self.embed_fn = embed_fn
+        self.keywords = self._build_keywords(agents_config)
+        self._prototype_texts = {
+            key.upper(): [data["goal"], *data.get("routing", {}).get("examples", [])]
+            for key, data in agents_config.items()
+            if key != "dispatcher"
+        }
+        self._prototypes: dict[str, list[float]] | None = None
+
+    @staticmethod
+    def _build_keywords(agents_config: dict) -> dict[str, set[str]]:
+        # Solo las keywords declaradas: los términos de un goal en prosa son demasiado genéricos
+        return {
+            key.upper(): {normalize(kw) for kw in data.get("routing", {}).get("keywords", [])}
+            for key, data in agents_config.items()
+            if key != "dispatcher"
+        }
+
+    def classify(self, message: str) -> RouteDecision | None:
+        return self.classify_keywords(message) or self.classify_embedding(message)
+
+    def classify_keywords(self, message: str) -> RouteDecision | None:
+        tokens = tokenize(message)
+        hits = Counter({
+            agent: sum(1 for token in tokens if any(_matches(token, kw) for kw in kws))
+            for agent, kws in self.keywords.items()
+        })
+        total = sum(hits.values())
+        if not total:
+            return None
+
+        agent, top = hits.most_common(1)[0]
+        confidence = top / total
+        if confidence < self.threshold:
+            return None
+        # Un solo acierto en un mensaje largo es casualidad: que decida la etapa siguiente
+        content_words = sum(1 for token in tokens if len(token) > 3)
+        if top < self.min_hits and top / max(content_words, 1) < self.min_hit_ratio:
+            return None
+        return self._decide(agent, confidence, "keyword")
+
+    def classify_embedding(self, message: str) -> RouteDecision | None:
+        if self.embed_fn is None:
+            return None
+        try:
+            prototypes = self._get_prototypes()
+            vector = self.embed_fn([message])[0]
+        except Exception as e:
+            # Sin embeddings no hay fast-path: el Dispatcher LLM sigue disponible
+            logger.warning(f"Fast router embedding stage unavailable: {e}")
+            return None
+
+        sims = {agent: _cosine(vector, proto) for agent, proto in prototypes.items()}
+        # Softmax con temperatura baja: las similitudes de coseno están muy juntas
+        exps = {agent: math.exp(sim / 0.05) for agent, sim in sims.items()}
+        norm = sum(exps.values())
+        agent = max(exps, key=exps.get)
+        confidence = exps[agent] / norm
+        if confidence < self.threshold:
+            return None
+        return self._decide(agent, confidence, "embedding")
+
+    @staticmethod
+    def _decide(agent: str, confidence: float, stage: str) -> RouteDecision:
+        logger.info(f"⚡ Fast-path route: {agent} ({stage}, conf={confidence:.2f})")
+        return RouteDecision(agent=agent, confidence=confidence, stage=stage)
+
+    def warm_up(self):
+        """Calcula los prototipos de embedding por adelantado (arranque del bot)."""
+        if self.embed_fn:
+            self._get_prototypes()
+
+    def _get_prototypes(self) -> dict[str, list[float]]:
+        if self._prototypes is None:
+            prototypes = {}
+            for agent, texts in self._prototype_texts.items():
+                vectors = self.embed_fn(texts)
+                prototypes[agent] = [sum(values) / len(vectors) for values in zip(*vectors)]
+            self._prototypes = prototypes
+        return self._prototypes
+
+
+class RoutingCache:
+    """
+    Cache de decisiones de enrutamiento con TTL, acotado en tamaño (LRU).
+    Clave: mensaje normalizado + rol del usuario (el rol puede cambiar la decisión).
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str], tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(message: str, role: str | None) -> tuple[str, str]:
+        return " ".join(tokenize(message)), role or ""
+
+    def get(self, message: str, role: str | None) -> str | None:
+        key = self._key(message, role)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            agent, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return agent
+
+    def put(self, message: str, role: str | None, agent: str):
+        key = self._key(message, role)
+        with self._lock:
+            self._entries[key] = (agent, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
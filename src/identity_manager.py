@@ -1,10 +1,14 @@
 import json
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from enum import StrEnum, auto
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from src.utils.backend_clients import BackendClients
 
 load_dotenv()
 
@@ -42,22 +46,25 @@ class IdentityManager:
     _DB_NAME = os.getenv('FIRESTORE_DB_NAME')
     _CONFIG_PATH: Path = Path(__file__).parent / "config" / "users.json"
 
+    # Caché de identidades: positiva (TTL largo) y negativa para IDs desconocidos (TTL corto)
+    _CACHE_TTL: float = float(os.getenv('IDENTITY_CACHE_TTL', '300'))
+    _NEGATIVE_TTL: float = float(os.getenv('IDENTITY_NEGATIVE_TTL', '30'))
+    _CACHE_SIZE: int = int(os.getenv('IDENTITY_CACHE_SIZE', '1024'))
+    _cache: OrderedDict[str, tuple[float, UserContext]] = OrderedDict()
+    _cache_lock = threading.Lock()
+    _watch = None
+
     @classmethod
     def _get_firestore_client(cls):
         """Inicializa con logs de diagnóstico."""
         if cls._firestore_client is None and cls._USE_FIRESTORE:
             try:
-                from google.cloud import firestore
-                
                 logger.debug("🔧 DIAGNOSTICO FIRESTORE:")
                 logger.debug(f"   - Variable USE_FIRESTORE: {cls._USE_FIRESTORE}")
                 logger.debug(f"   - Variable FIRESTORE_DB_NAME: '{cls._DB_NAME}'")
                 
-                # Inicialización explícita
-                if cls._DB_NAME:
-                    cls._firestore_client = firestore.Client(database=cls._DB_NAME)
-                else:
-                    cls._firestore_client = firestore.Client()
+                # Cliente compartido del proceso (mismo que SessionManager)
+                cls._firestore_client = BackendClients.firestore()
                 
                 # Verificación post-conexión
                 logger.debug(f"   - Cliente creado. Proyecto: {cls._firestore_client.project}")
@@ -88,8 +95,59 @@ class IdentityManager:
 
     @classmethod
     def get_user(cls, telegram_id: int | str) -> UserContext:
+        """Resuelve la identidad; en el camino caliente es una consulta a un dict."""
         tid_str = str(telegram_id)
-        
+        now = time.monotonic()
+
+        with cls._cache_lock:
+            cached = cls._cache.get(tid_str)
+            if cached is not None:
+                expires_at, user = cached
+                if expires_at > now:
+                    cls._cache.move_to_end(tid_str)
+                    return user
+                del cls._cache[tid_str]
+
+        user, ttl = cls._resolve_user(tid_str)
+        if ttl:
+            cls._store(user, ttl, now)
+        return user
+
+    @classmethod
+    def _store(cls, user: UserContext, ttl: float, now: float | None = None) -> None:
+        with cls._cache_lock:
+            cls._cache[user.telegram_id] = ((now or time.monotonic()) + ttl, user)
+            cls._cache.move_to_end(user.telegram_id)
+            while len(cls._cache) > cls._CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def invalidate(cls, telegram_id: int | str | None = None) -> None:
+        """Olvida una identidad cacheada (o todas), p.ej. tras cambiar su rol."""
+        with cls._cache_lock:
+            if telegram_id is None:
+                cls._cache.clear()
+            else:
+                cls._cache.pop(str(telegram_id), None)
+
+    @staticmethod
+    def _from_firestore(tid_str: str, data: dict) -> UserContext:
+        return UserContext(
+            telegram_id=tid_str,
+            name=data.get("name", "Usuario"),
+            role=UserRole(data.get("role", "guest").lower()),
+            description=data.get("description")
+        )
+
+    @classmethod
+    def _resolve_user(cls, tid_str: str) -> tuple[UserContext, float | None]:
+        """
+        Consulta Firestore / JSON local. Devuelve (usuario, TTL de caché).
+        Los desconocidos caducan antes (un alta nueva se ve en segundos) y si
+        Firestore ha fallado el resultado no se cachea (TTL None).
+        """
+        ttl = cls._CACHE_TTL
+
         # 1. INTENTO FIRESTORE
         if cls._USE_FIRESTORE:
             db = cls._get_firestore_client()
@@ -104,17 +162,13 @@ class IdentityManager:
                     if doc.exists:
                         data = doc.to_dict()
                         logger.info(f"✅ ENCONTRADO en Firestore: {data.get('name')}")
-                        return UserContext(
-                            telegram_id=tid_str,
-                            name=data.get("name", "Usuario"),
-                            role=UserRole(data.get("role", "guest").lower()),
-                            description=data.get("description")
-                        )
+                        return cls._from_firestore(tid_str, data), ttl
                     else:
                         logger.warning(f"🚫 NO EXISTE en Firestore el ID: {tid_str}")
                 except Exception as e:
                     # Aquí está la clave: Ver el error real
                     logger.error(f"❌ EXCEPCION LEYENDO USUARIO: {e}", exc_info=True)
+                    ttl = None
 
         # 2. FALLBACK LOCAL
         cls._load_local_users()
@@ -126,7 +180,7 @@ class IdentityManager:
                 name=data.get("name"),
                 role=UserRole(data.get("role", "guest").lower()),
                 description=data.get("description")
-            )
+            ), ttl
 
         # 3. STRANGER
         logger.warning(f"⛔ Acceso denegado final para: {tid_str}")
@@ -135,10 +189,45 @@ class IdentityManager:
             name="Stranger",
             role=UserRole.GUEST,
             description="Unauthorized"
-        )
+        ), ttl and cls._NEGATIVE_TTL
+
+    @classmethod
+    def watch_users(cls) -> bool:
+        """
+        Escucha cambios en la colección 'users' y actualiza la caché al instante
+        (altas, cambios de rol, bajas) en lugar de esperar al TTL.
+        """
+        if cls._watch is not None:
+            return True
+        db = cls._get_firestore_client()
+        if not db:
+            return False
+
+        def on_snapshot(_docs, changes, _read_time):
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    cls.invalidate(doc.id)
+                else:
+                    cls._store(cls._from_firestore(doc.id, doc.to_dict()), cls._CACHE_TTL)
+
+        try:
+            cls._watch = db.collection('users').on_snapshot(on_snapshot)
+            logger.info("👂 Escuchando cambios de usuarios en Firestore")
+            return True
+        except Exception as e:
+            logger.error(f"❌ No se pudo iniciar el listener de usuarios: {e}")
+            return False
+
+    @classmethod
+    def stop_watching(cls) -> None:
+        if cls._watch is not None:
+            cls._watch.unsubscribe()
+            cls._watch = None
 
     @classmethod
     def reload(cls):
         logger.info("Reloading local user database...")
         cls._loaded_local = False
-        cls._load_local_users()
\ No newline at end of file
+        cls._load_local_users()
+        cls.invalidate()
@@ -1,8 +1,56 @@
+import asyncio
 import os
+import re
 import requests
 import logging
-from qdrant_client import QdrantClient, models
+from collections import Counter
+from datetime import datetime
+from qdrant_client import AsyncQdrantClient, QdrantClient, models
 from src.schemas.memory import EpisodicMemoryItem, EpisodicMemoryMetadata
+from src.utils.embedding_cache import EmbeddingCache
+from src.utils.embedding_client import AsyncEmbeddingClient
+from src.utils.backend_clients import BackendClients
+from src.utils.collection_profile import CollectionProfile
+from src.utils import sparse_encoder
+
+# Payload fields filtered at query time. Without an index Qdrant scans payloads.
+PAYLOAD_INDEXES: dict[str, models.PayloadSchemaType] = {
+    "domain": models.PayloadSchemaType.KEYWORD,
+    "type": models.PayloadSchemaType.KEYWORD,
+    "source": models.PayloadSchemaType.KEYWORD,
+    "created_by": models.PayloadSchemaType.KEYWORD,
+    "created_ts": models.PayloadSchemaType.FLOAT,
+    # Source file of DOCUMENT_IMPORT chunks: a re-import replaces that file's points
+    "import_source": models.PayloadSchemaType.KEYWORD,
+}
+# Payload keys that are storage details, not part of the memory schema
+_RESERVED_PAYLOAD_KEYS = (
+    "content", "created_at", "created_by", "created_ts", "merge_count", "last_merged_at", "import_source"
+)
+_BACKFILL_BATCH = 256
+# Named sparse (BM25) vector stored next to the unnamed dense one
+SPARSE_VECTOR = "lexical"
+# Near-duplicates fetched per write; the first one stating the same numbers is merged
+_DEDUP_CANDIDATES = 3
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)?")
+
+
+def _has_sparse_vector(info: models.CollectionInfo) -> bool:
+    return SPARSE_VECTOR in (info.config.params.sparse_vectors or {})
+
+
+def _numbers(text: str) -> list[str]:
+    return sorted(_NUMBER_RE.findall(text))
+
+
+def _to_timestamp(value: datetime | str | float | int) -> float:
+    """Epoch seconds for a datetime, an ISO string (as stored in created_at) or a number."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -14,175 +62,871 @@ class VectorMemoryManager:
     Decouples the application logic from the specific database implementation (Qdrant).
     """
     _client: QdrantClient = None
+    _ready_collections: set[str] = set()
+    _embedding_cache: EmbeddingCache = None
+    _embedding_client: AsyncEmbeddingClient | None = None
     _collection_name: str = "episodic_memory_v1"
+    _embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-004")
+    _embedding_batch_size: int = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))
+    # HNSW / quantization / on-disk layout (MEMORY_COLLECTION_PROFILE + overrides)
+    _profile: CollectionProfile = CollectionProfile.from_env()
+    _migrate_profile: bool = os.getenv("MEMORY_PROFILE_MIGRATE", "True").lower() == "true"
+    # Dense + BM25 sparse retrieval fused with RRF (only on collections created with the sparse vector)
+    _hybrid_search: bool = os.getenv("MEMORY_HYBRID_SEARCH", "True").lower() == "true"
+    _hybrid_collections: set[str] = set()
+    # Write-time dedup: a new memory this similar to one of the same domain/type replaces it (0 disables)
+    _dedup_threshold: float = float(os.getenv("MEMORY_DEDUP_THRESHOLD", 0.95))
+    _dedup_stats: Counter = Counter()
 
     def __init__(self, collection_name: str = "episodic_memory_v1"):
         self._collection_name = collection_name
         self._initialize_client()
+        self._initialize_embedding_cache()
         self._ensure_collection()
 
     def _initialize_client(self):
         """
-        Connects to Qdrant Service using a smart connection pattern.
-        - If QDRANT_API_KEY is present, it assumes Cloud/HTTPS connection.
-        - Otherwise, it falls back to local Docker/HTTP connection.
-        Uses Singleton pattern to avoid multiple connections.
+        Connects to Qdrant through the process-wide client registry
+        (shared with the startup warm-up, so the first tool call finds it open).
         """
         if VectorMemoryManager._client is None:
-            host = os.getenv("QDRANT_HOST", "qdrant")
-            port = int(os.getenv("QDRANT_PORT", 6333))
-            api_key = os.getenv("QDRANT_API_KEY")
-
-            logger.info("🔌 Connecting to Memory Store...")
-
             try:
-                if api_key:
-                    # Cloud Mode (assumes HTTPS)
-                    logger.info(f"   -> Mode: Cloud, URL: {host}")
-                    VectorMemoryManager._client = QdrantClient(url=host, api_key=api_key)
-                else:
-                    # Docker Mode (Plain HTTP)
-                    logger.info(f"   -> Mode: Docker, Host: {host}, Port: {port}")
-                    VectorMemoryManager._client = QdrantClient(host=host, port=port)
+                VectorMemoryManager._client = BackendClients.qdrant()
             except Exception as e:
                 logger.error(f"Failed to connect to Qdrant: {e}", exc_info=True)
                 raise ConnectionError(f"Failed to connect to Qdrant: {e}")
 
+    @classmethod
+    def _initialize_embedding_cache(cls):
+        """
+        Builds the process-wide embedding cache once (Singleton, like the client).
+        Disk entries produced by a previous embedding model are purged on start.
+        """
+        if cls._embedding_cache is None:
+            cls._embedding_cache = EmbeddingCache.from_env(cls._embedding_model)
+            purged = cls._embedding_cache.invalidate()
+            if purged:
+                logger.info(f"🧹 Purged {purged} cached embeddings from a previous model.")
+
+    @classmethod
+    def attach_embedding_client(cls) -> AsyncEmbeddingClient:
+        """
+        Creates the pooled async embedding client on the running event loop and
+        routes every embedding request (including those from tool threads) through it.
+        Must be called from inside the bot's event loop.
+        """
+        cls._initialize_embedding_cache()
+        client = AsyncEmbeddingClient.from_env(cls._embedding_model, cache=cls._embedding_cache)
+        client.bind()
+        cls._embedding_client = client
+        logger.info("🔗 Async embedding client attached to the event loop.")
+        return client
+
+    @classmethod
+    async def detach_embedding_client(cls):
+        if cls._embedding_client is not None:
+            await cls._embedding_client.aclose()
+            cls._embedding_client = None
+
+    @classmethod
+    def embedding_cache_stats(cls) -> dict:
+        """Hit/miss counters of the embedding cache (empty if not initialized)."""
+        if cls._embedding_cache is None:
+            return {}
+        return cls._embedding_cache.stats()
+
+    @classmethod
+    def dedup_stats(cls) -> dict:
+        """Write-time dedup counters: 'inserted' and 'merged'."""
+        return dict(cls._dedup_stats)
+
     def _ensure_collection(self):
         """
-        Checks if the collection exists and creates it if it doesn't.
-        This operation is idempotent.
+        Checks if the collection exists and creates it if it doesn't, together
+        with its payload indexes (missing ones are added to existing collections).
+        This operation is idempotent and runs once per collection and process.
         """
+        if self._collection_name in VectorMemoryManager._ready_collections:
+            return
         try:
-            self._client.get_collection(collection_name=self._collection_name)
+            info = self._client.get_collection(collection_name=self._collection_name)
         except Exception:
             logger.info(f"Collection '{self._collection_name}' not found. Creating a new one...")
             self._client.create_collection(
                 collection_name=self._collection_name,
-                vectors_config=models.VectorParams(
-                    size=768, 
-                    distance=models.Distance.COSINE
-                ),
+                **self._collection_config()
             )
             logger.info(f"✅ Collection '{self._collection_name}' created successfully.")
+            info = None
+
+        indexed = set(info.payload_schema or {}) if info else set()
+        if info:
+            self._apply_profile(info)
+        if info is None or _has_sparse_vector(info):
+            VectorMemoryManager._hybrid_collections.add(self._collection_name)
+        elif self._hybrid_search:
+            logger.warning(
+                f"Collection '{self._collection_name}' has no '{SPARSE_VECTOR}' sparse vector: dense-only search. "
+                f"Run 'python -m src.memory_manager migrate-hybrid' (bot stopped) to enable hybrid search."
+            )
+
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in indexed:
+                self._client.create_payload_index(
+                    collection_name=self._collection_name,
+                    field_name=field_name,
+                    field_schema=schema,
+                    wait=True
+                )
+                logger.info(f"📇 Payload index '{field_name}' ({schema.value}) created.")
+        if "created_ts" not in indexed:
+            # Collections written before the numeric timestamp existed
+            self._backfill_timestamps()
+        VectorMemoryManager._ready_collections.add(self._collection_name)
+
+    def _apply_profile(self, info: models.CollectionInfo):
+        """
+        Online migration of an existing collection to the configured profile.
+        Qdrant rebuilds the affected segments in the background while serving
+        queries; until it finishes, searches run against the old layout.
+        """
+        changes = self._profile.migration(info)
+        if not changes:
+            return
+        if not self._migrate_profile:
+            logger.warning(
+                f"Collection '{self._collection_name}' differs from profile '{self._profile.name}' "
+                f"({', '.join(changes)}); MEMORY_PROFILE_MIGRATE=false, leaving it as is."
+            )
+            return
+        self._client.update_collection(collection_name=self._collection_name, **changes)
+        logger.info(f"🔧 Collection '{self._collection_name}' migrating to profile '{self._profile.name}': {', '.join(changes)}")
+
+    def migrate_to_hybrid(self) -> int:
+        """
+        Rebuilds a dense-only collection with the sparse vector, which cannot be
+        added in place: every point is copied (with its BM25 vector) into
+        '<name>_hybrid', the original is dropped and an alias keeps the old name,
+        so callers are unaffected. Run it with the bot stopped: writes made
+        during the copy would be lost. Returns the number of copied points.
+        """
+        if self._is_hybrid():
+            return 0
+        source = self._collection_name
+        target = f"{source}_hybrid"
+        if self._client.collection_exists(target):
+            # Leftover from an interrupted run: the source is still intact
+            self._client.delete_collection(target)
+        self._client.create_collection(collection_name=target, **self._collection_config())
+
+        copied = 0
+        offset = None
+        while True:
+            points, offset = self._client.scroll(
+                collection_name=source,
+                limit=_BACKFILL_BATCH,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                self._client.upsert(
+                    collection_name=target,
+                    points=[
+                        models.PointStruct(
+                            id=point.id,
+                            vector={
+                                "": point.vector[""] if isinstance(point.vector, dict) else point.vector,
+                                SPARSE_VECTOR: sparse_encoder.encode_document(point.payload.get("content", "")),
+                            },
+                            payload=point.payload
+                        )
+                        for point in points
+                    ],
+                    wait=True
+                )
+                copied += len(points)
+            if offset is None:
+                break
+
+        self._client.delete_collection(source)
+        self._client.update_collection_aliases(change_aliases_operations=[
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=target, alias_name=source))
+        ])
+        logger.info(f"🔀 Collection '{source}' rebuilt as '{target}' with sparse vectors ({copied} points); alias '{source}' kept.")
+
+        # Payload indexes on the new collection (reached through the alias)
+        VectorMemoryManager._ready_collections.discard(source)
+        self._ensure_collection()
+        return copied
+
+    def _backfill_timestamps(self):
+        """
+        One-off migration: derives `created_ts` from the ISO `created_at` of
+        points stored without it, so time-range filters also match old memories.
+        """
+        missing = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key="created_ts"))])
+        migrated = 0
+        offset = None
+        while True:
+            # Pages are keyed by point ID, so updated points leaving the filter do not
+            # shift them, and points without a usable created_at are skipped, not re-read
+            points, offset = self._client.scroll(
+                collection_name=self._collection_name,
+                scroll_filter=missing,
+                limit=_BACKFILL_BATCH,
+                offset=offset,
+                with_payload=["created_at"],
+                with_vectors=False
+            )
+            operations = [
+                models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={"created_ts": _to_timestamp(point.payload["created_at"])},
+                    points=[point.id]
+                ))
+                for point in points
+                if point.payload.get("created_at")
+            ]
+            if operations:
+                self._client.batch_update_points(
+                    collection_name=self._collection_name,
+                    update_operations=operations,
+                    wait=True
+                )
+                migrated += len(operations)
+            if offset is None:
+                break
+        if migrated:
+            logger.info(f"🕒 Backfilled created_ts on {migrated} memories.")
+
+    @classmethod
+    def _collection_config(cls) -> dict:
+        """Creation parameters for the memory collection (shared by sync/async bootstraps)."""
+        config = cls._profile.collection_config(size=768, distance=models.Distance.COSINE)
+        # Always created, even with hybrid search off: it cannot be added to an existing collection
+        config["sparse_vectors_config"] = {
+            SPARSE_VECTOR: models.SparseVectorParams(
+                index=models.SparseIndexParams(on_disk=cls._profile.on_disk_vectors),
+                modifier=models.Modifier.IDF
+            )
+        }
+        return config
+
+    def _is_hybrid(self) -> bool:
+        return self._collection_name in VectorMemoryManager._hybrid_collections
 
 
     def _get_embedding(self, text: str) -> list[float]:
         """
-        Generates an embedding for the given text using the LiteLLM proxy.
+        Returns the embedding for the given text, served from the cache when possible.
         """
-        litellm_url = os.getenv("LITELLM_URL", "http://localhost:4000")
-        if not litellm_url.startswith("http"):
-            litellm_url = f"http://{litellm_url}"
-        
-        embedding_url = f"{litellm_url.rstrip('/')}/v1/embeddings"
+        return self._get_embeddings([text])[0]
+
+    @classmethod
+    def embed_texts(cls, texts: list[str]) -> list[list[float]]:
+        """
+        Public embedding entry point that does not require a Qdrant connection
+        (e.g. for the fast router's prototype vectors). Uses the same cache/client.
+        """
+        cls._initialize_embedding_cache()
+        return cls._get_embeddings(texts)
+
+    @classmethod
+    def _get_embeddings(cls, texts: list[str]) -> list[list[float]]:
+        """
+        Returns one embedding per text (same order). Cached texts are served
+        locally; the remaining ones are packed into batched proxy requests.
+        """
+        if cls._embedding_client is not None and cls._embedding_client.can_bridge():
+            # Pooled, coalesced path shared with every other caller in the process.
+            return cls._embedding_client.embed_blocking(texts)
+
+        vectors: list[list[float] | None] = [cls._embedding_cache.get(text) for text in texts]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        for start in range(0, len(missing), cls._embedding_batch_size):
+            chunk = missing[start:start + cls._embedding_batch_size]
+            fresh = cls._request_embeddings([texts[i] for i in chunk])
+            for i, vector in zip(chunk, fresh):
+                vectors[i] = vector
+                cls._embedding_cache.put(texts[i], vector)
+
+        return vectors
+
+    @classmethod
+    def _request_embeddings(cls, texts: list[str]) -> list[list[float]]:
+        """
+        Generates embeddings for a batch of texts with a single call to the LiteLLM proxy.
+        """
+        embedding_url = f"{BackendClients.litellm_url()}/v1/embeddings"
         
         headers = {"Content-Type": "application/json"}
         data = {
-            "model": "text-embedding-004",
-            "input": [text]
+            "model": cls._embedding_model,
+            "input": texts
         }
         
         try:
-            response = requests.post(embedding_url, headers=headers, json=data, timeout=30)
+            response = BackendClients.litellm_session().post(embedding_url, headers=headers, json=data, timeout=30)
             response.raise_for_status()
             embedding_data = response.json().get("data")
-            if embedding_data and len(embedding_data) > 0:
-                return embedding_data[0].get("embedding")
+            if embedding_data and len(embedding_data) == len(texts):
+                # The OpenAI format carries an explicit index; do not trust list order.
+                ordered = sorted(embedding_data, key=lambda entry: entry.get("index", 0))
+                return [entry.get("embedding") for entry in ordered]
             raise ValueError("Invalid embedding response format from LiteLLM")
         except requests.exceptions.RequestException as e:
             logger.error(f"Error getting embedding from LiteLLM proxy at {embedding_url}: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def _build_point(item: EpisodicMemoryItem, vector: list[float], sparse: bool = False) -> models.PointStruct:
+        """
+        Maps a memory item to the Qdrant point layout (metadata flattened in the payload).
+        With `sparse`, the BM25 vector of the content is computed locally and stored too.
+        """
+        if sparse:
+            vector = {"": vector, SPARSE_VECTOR: sparse_encoder.encode_document(item.content)}
+        return models.PointStruct(
+            id=item.id,
+            vector=vector,
+            payload={
+                **item.metadata.model_dump(),
+                "content": item.content,
+                "created_at": item.created_at,
+                # Numeric copy of created_at: ISO strings cannot be range-filtered
+                "created_ts": _to_timestamp(item.created_at),
+                "created_by": item.created_by
+            }
+        )
+
     def add_memory(self, item: EpisodicMemoryItem) -> str:
         """
         Persists a strictly typed memory item into the vector store.
+        A near-duplicate of an existing memory (same owner, domain and type) is
+        merged into it instead of inserted; the returned ID is then the existing one.
         """
         vector = self._get_embedding(item.content)
-        
+        duplicate = None
+        query = self._duplicate_query(item, vector)
+        if query:
+            try:
+                result = self._client.query_points(collection_name=self._collection_name, **query)
+                duplicate = self._pick_duplicate(item, result.points)
+            except Exception as e:
+                # The write matters more than the dedup
+                logger.warning(f"Dedup lookup failed for memory {item.id}: {e}")
+        if duplicate is not None:
+            item, merge_payload = self._merge(duplicate, item)
+
         try:
+            point = self._build_point(item, vector, sparse=self._is_hybrid())
+            if duplicate is not None:
+                point.payload.update(merge_payload)
             self._client.upsert(
                 collection_name=self._collection_name,
-                points=[
-                    models.PointStruct(
-                        id=item.id,
-                        vector=vector,
-                        payload={
-                            **item.metadata.model_dump(),
-                            "content": item.content,
-                            "created_at": item.created_at
-                        }
-                    )
-                ],
+                points=[point],
                 wait=True
             )
-            logger.info(f"Successfully added memory {item.id}")
+            self._count_write(item, duplicate)
             return item.id
         except Exception as e:
             logger.error(f"Error saving memory {item.id}: {e}", exc_info=True)
             raise e
 
+    @classmethod
+    def _duplicate_query(cls, item: EpisodicMemoryItem, vector: list[float]) -> dict | None:
+        """
+        query_points arguments for the closest memories of the same owner, domain
+        and type above the dedup threshold. Reuses the embedding already computed
+        for the write. Memories without an owner only match other ownerless ones.
+        """
+        if cls._dedup_threshold <= 0:
+            return None
+        qdrant_filter = cls._build_filter({
+            "domain": item.metadata.domain.value,
+            "type": item.metadata.type.value,
+            **({"created_by": item.created_by} if item.created_by else {})
+        })
+        if not item.created_by:
+            qdrant_filter.must.append(models.IsNullCondition(is_null=models.PayloadField(key="created_by")))
+        return {
+            "query": vector,
+            "query_filter": qdrant_filter,
+            "limit": _DEDUP_CANDIDATES,
+            "score_threshold": cls._dedup_threshold,
+            "search_params": cls._profile.search_params(),
+        }
+
+    @staticmethod
+    def _pick_duplicate(item: EpisodicMemoryItem, candidates: list):
+        """
+        Closest candidate stating the same quantities. Embeddings barely separate
+        "15 minutes" from "20 minutes", but those are different facts, not rewordings.
+        """
+        numbers = _numbers(item.content)
+        return next(
+            (point for point in candidates if _numbers(point.payload.get("content", "")) == numbers),
+            None
+        )
+
+    @staticmethod
+    def _merge(existing, item: EpisodicMemoryItem) -> tuple[EpisodicMemoryItem, dict]:
+        """
+        Update-in-place of a near-duplicate: the new wording wins (a restated
+        preference is the current one), the existing ID, owner and creation date
+        are kept and tags are merged. Returns the item to store plus merge payload.
+        """
+        old_tags = (existing.payload.get("context_tags") or "").split(",")
+        new_tags = (item.metadata.context_tags or "").split(",")
+        tags = list(dict.fromkeys(tag.strip() for tag in old_tags + new_tags if tag.strip()))
+        merged = item.model_copy(update={
+            "id": str(existing.id),
+            "created_at": existing.payload.get("created_at", item.created_at),
+            "created_by": existing.payload.get("created_by"),
+            "metadata": item.metadata.model_copy(update={"context_tags": ", ".join(tags) or None}),
+        })
+        return merged, {
+            "merge_count": existing.payload.get("merge_count", 0) + 1,
+            "last_merged_at": item.created_at,
+        }
+
+    @classmethod
+    def _count_write(cls, item: EpisodicMemoryItem, duplicate):
+        if duplicate is None:
+            cls._dedup_stats["inserted"] += 1
+            logger.info(f"Successfully added memory {item.id}")
+        else:
+            cls._dedup_stats["merged"] += 1
+            logger.info(f"🔁 Memory merged into {item.id} (similarity {duplicate.score:.3f})")
+
+    def add_memories(self, items: list[EpisodicMemoryItem], batch_size: int | None = None) -> list[str]:
+        """
+        Bulk ingest: embeds texts in batches and upserts one chunk per request.
+        No write-time dedup here (one extra query per item); it is meant for imports.
+        Intermediate chunks are sent without waiting (pipelined); only the last
+        upsert waits, and Qdrant applies updates in order, so on return every
+        point is persisted.
+        """
+        if not items:
+            return []
+
+        batch_size = batch_size or self._embedding_batch_size
+        vectors = self._get_embeddings([item.content for item in items])
+
+        chunks = range(0, len(items), batch_size)
+        last_start = chunks[-1]
+        for start in chunks:
+            chunk = items[start:start + batch_size]
+            try:
+                self._client.upsert(
+                    collection_name=self._collection_name,
+                    points=[
+                        self._build_point(item, vector, sparse=self._is_hybrid())
+                        for item, vector in zip(chunk, vectors[start:start + batch_size])
+                    ],
+                    wait=start == last_start
+                )
+            except Exception as e:
+                logger.error(f"Error saving memory batch at offset {start}: {e}", exc_info=True)
+                raise e
+
+        logger.info(f"Successfully added {len(items)} memories in {len(chunks)} batch(es)")
+        return [item.id for item in items]
+
     def search_memory(
         self, 
         query: str, 
         filters: dict | None = None, 
-        limit: int = 5
+        limit: int = 5,
+        score_threshold: float | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        raise_errors: bool = False
     ) -> list[EpisodicMemoryItem]:
         """
         Semantic search retrieving structured objects.
+        `score_threshold` drops weak matches server-side (cosine similarity).
+        `created_after` / `created_before` restrict the search to a time window
+        (e.g. the last 30 days), evaluated on the indexed `created_ts`.
+        Qdrant errors are logged and return [] unless `raise_errors` is set, so
+        callers that track outages can tell them apart from an empty result.
         """
         query_vector = self._get_embedding(query)
-        
+        qdrant_filter = self._build_filter(filters, created_after, created_before)
+
+        try:
+            result_obj = self._client.query_points(
+                collection_name=self._collection_name,
+                **self._query_kwargs(query, query_vector, qdrant_filter, limit, score_threshold, self._is_hybrid())
+            )
+            
+            # FIX ADR-007: Ahora devuelve un objeto wrapper, extraemos la lista de puntos
+            found_items = [self._point_to_item(point) for point in result_obj.points]
+            
+            logger.info(f"Found {len(found_items)} memories for query: '{query}'")
+            return found_items
+
+        except Exception as e:
+            logger.error(f"Error searching memory for query '{query}': {e}", exc_info=True)
+            if raise_errors:
+                raise
+            return []
+
+    @classmethod
+    def _query_kwargs(
+        cls,
+        query: str,
+        query_vector: list[float],
+        qdrant_filter: models.Filter | None,
+        limit: int,
+        score_threshold: float | None,
+        hybrid: bool
+    ) -> dict:
+        """
+        query_points arguments. Hybrid: the dense and BM25 branches are prefetched
+        in the same request and fused server-side with reciprocal-rank fusion, so
+        exact tokens (names, amounts, brands) surface without a second query.
+        `score_threshold` is a cosine similarity. BM25 scores and RRF ranks have no
+        comparable floor, so with a threshold the BM25 branch only re-ranks the dense
+        candidates that pass it: every fused result still clears the threshold.
+        """
+        sparse_query = sparse_encoder.encode_query(query) if hybrid and cls._hybrid_search else None
+        if sparse_query is None or sparse_encoder.is_empty(sparse_query):
+            return {
+                "query": query_vector,
+                "query_filter": qdrant_filter,
+                "limit": limit,
+                "score_threshold": score_threshold,
+                "search_params": cls._profile.search_params(),
+            }
+
+        candidates = max(limit * 4, 20)
+        dense = models.Prefetch(
+            query=query_vector,
+            filter=qdrant_filter,
+            limit=candidates,
+            score_threshold=score_threshold,
+            params=cls._profile.search_params()
+        )
+        sparse = models.Prefetch(
+            query=sparse_query,
+            using=SPARSE_VECTOR,
+            filter=qdrant_filter,
+            limit=candidates,
+            prefetch=dense if score_threshold is not None else None
+        )
+        return {
+            "prefetch": [dense, sparse],
+            "query": models.FusionQuery(fusion=models.Fusion.RRF),
+            "limit": limit,
+        }
+
+    @staticmethod
+    def _build_filter(
+        filters: dict | None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None
+    ) -> models.Filter | None:
+        """
+        Translates a flat {field: value} dict into an exact-match Qdrant filter,
+        plus an optional creation-time range.
+        """
         filter_conditions = []
         if filters:
             for key, value in filters.items():
                 filter_conditions.append(
                     models.FieldCondition(key=key, match=models.MatchValue(value=value))
                 )
+        if created_after is not None or created_before is not None:
+            filter_conditions.append(models.FieldCondition(
+                key="created_ts",
+                range=models.Range(
+                    gte=_to_timestamp(created_after) if created_after is not None else None,
+                    lte=_to_timestamp(created_before) if created_before is not None else None
+                )
+            ))
         
-        qdrant_filter = models.Filter(must=filter_conditions) if filter_conditions else None
+        return models.Filter(must=filter_conditions) if filter_conditions else None
+
+    @staticmethod
+    def _point_to_item(point) -> EpisodicMemoryItem:
+        """Rebuilds the typed memory item from a scored Qdrant point."""
+        metadata_payload = {k: v for k, v in point.payload.items() if k not in _RESERVED_PAYLOAD_KEYS}
+        return EpisodicMemoryItem(
+            id=point.id,
+            content=point.payload["content"],
+            created_at=point.payload["created_at"],
+            created_by=point.payload.get("created_by"),
+            metadata=EpisodicMemoryMetadata(**metadata_payload)
+        )
 
+    def delete_memory(self, memory_id: str):
+        """
+        Hard delete of a memory item by ID.
+        """
         try:
-            result_obj = self._client.query_points(
+            self._client.delete(
                 collection_name=self._collection_name,
-                query=query_vector,         # <-- CAMBIO 1: 'query_vector' ahora es 'query'
-                query_filter=qdrant_filter, # <-- Se mantiene 'query_filter'
-                limit=limit
+                points_selector=models.PointIdsList(points=[memory_id]),
             )
-            
-            # FIX ADR-007: Ahora devuelve un objeto wrapper, extraemos la lista de puntos
-            results = result_obj.points
-            
-            found_items = []
-            for point in results:
-                metadata_payload = {k: v for k, v in point.payload.items() if k not in ["content", "created_at"]}
-                metadata = EpisodicMemoryMetadata(**metadata_payload)
-                
-                item = EpisodicMemoryItem(
-                    id=point.id,
-                    content=point.payload["content"],
-                    created_at=point.payload["created_at"],
-                    metadata=metadata
+            logger.info(f"🗑️ Memory {memory_id} deleted.")
+        except Exception as e:
+            logger.error(f"Error deleting memory {memory_id}: {e}", exc_info=True)
+            raise e
+
+class AsyncVectorMemoryManager:
+    """
+    Asyncio-native twin of VectorMemoryManager for callers living on the bot's
+    event loop. Backed by AsyncQdrantClient (gRPC when QDRANT_PREFER_GRPC=true)
+    and the pooled AsyncEmbeddingClient, so memory operations can be fanned out
+    with asyncio.gather instead of occupying worker threads.
+    Shares payload layout, filters and collection config with the sync manager.
+    """
+    _client: AsyncQdrantClient = None
+    _ready_collections: set[str] = set()
+    _hybrid_collections: set[str] = set()
+    # One bootstrap per collection even with several batches racing on a fresh one
+    _collection_locks: dict[str, asyncio.Lock] = {}
+    # Embedding client resolved once (the bot's shared one, or our own outside the bot)
+    _embedder: AsyncEmbeddingClient | None = None
+    _owns_embedder: bool = False
+
+    def __init__(self, collection_name: str = "episodic_memory_v1"):
+        self._collection_name = collection_name
+        if AsyncVectorMemoryManager._client is None:
+            try:
+                AsyncVectorMemoryManager._client = BackendClients.async_qdrant()
+            except Exception as e:
+                logger.error(f"Failed to connect to Qdrant: {e}", exc_info=True)
+                raise ConnectionError(f"Failed to connect to Qdrant: {e}")
+
+    @classmethod
+    async def close(cls):
+        if cls._embedder is not None and cls._owns_embedder:
+            await cls._embedder.aclose()
+        cls._embedder = None
+        cls._owns_embedder = False
+        if cls._client is not None:
+            cls._client = None
+            cls._ready_collections.clear()
+            cls._hybrid_collections.clear()
+            cls._collection_locks.clear()
+        await BackendClients.aclose()
+
+    async def warm_up(self):
+        """Opens the connection and bootstraps the collection (bot startup)."""
+        await self._ensure_collection()
+
+    async def _ensure_collection(self):
+        """
+        Idempotent bootstrap (collection + payload indexes), checked once per
+        collection and process. Concurrent callers wait on a per-collection lock
+        and re-check, so only one of them creates the collection.
+        Backfilling old timestamps is left to the sync manager.
+        """
+        if self._collection_name in self._ready_collections:
+            return
+        lock = self._collection_locks.setdefault(self._collection_name, asyncio.Lock())
+        async with lock:
+            if self._collection_name in self._ready_collections:
+                return
+            await self._bootstrap_collection()
+            self._ready_collections.add(self._collection_name)
+
+    async def _bootstrap_collection(self):
+        if not await self._client.collection_exists(collection_name=self._collection_name):
+            logger.info(f"Collection '{self._collection_name}' not found. Creating a new one...")
+            await self._client.create_collection(
+                collection_name=self._collection_name,
+                **VectorMemoryManager._collection_config()
+            )
+            logger.info(f"✅ Collection '{self._collection_name}' created successfully.")
+        info = await self._client.get_collection(collection_name=self._collection_name)
+        if _has_sparse_vector(info):
+            self._hybrid_collections.add(self._collection_name)
+        for field_name, schema in PAYLOAD_INDEXES.items():
+            if field_name not in (info.payload_schema or {}):
+                await self._client.create_payload_index(
+                    collection_name=self._collection_name,
+                    field_name=field_name,
+                    field_schema=schema,
+                    wait=True
                 )
-                found_items.append(item)
-            
+
+    @classmethod
+    def _embedding_client(cls) -> AsyncEmbeddingClient:
+        """
+        Embedding client resolved once per process: the pooled one attached to the
+        bot's loop when there is one, otherwise a client of our own bound to the
+        running loop and released in close().
+        """
+        if cls._embedder is None:
+            shared = VectorMemoryManager._embedding_client
+            if shared is not None and shared.is_bound:
+                cls._embedder = shared
+            else:
+                VectorMemoryManager._initialize_embedding_cache()
+                cls._embedder = AsyncEmbeddingClient.from_env(
+                    VectorMemoryManager._embedding_model, cache=VectorMemoryManager._embedding_cache
+                )
+                cls._embedder.bind()
+                cls._owns_embedder = True
+        return cls._embedder
+
+    async def add_memory(self, item: EpisodicMemoryItem) -> str:
+        """
+        Persists a strictly typed memory item into the vector store
+        (near-duplicates are merged, as in VectorMemoryManager.add_memory).
+        """
+        await self._ensure_collection()
+        vector = await self._embedding_client().embed(item.content)
+        duplicate = None
+        query = VectorMemoryManager._duplicate_query(item, vector)
+        if query:
+            try:
+                result = await self._client.query_points(collection_name=self._collection_name, **query)
+                duplicate = VectorMemoryManager._pick_duplicate(item, result.points)
+            except Exception as e:
+                logger.warning(f"Dedup lookup failed for memory {item.id}: {e}")
+        if duplicate is not None:
+            item, merge_payload = VectorMemoryManager._merge(duplicate, item)
+
+        try:
+            point = VectorMemoryManager._build_point(
+                item, vector, sparse=self._collection_name in self._hybrid_collections
+            )
+            if duplicate is not None:
+                point.payload.update(merge_payload)
+            await self._client.upsert(
+                collection_name=self._collection_name,
+                points=[point],
+                wait=True
+            )
+            VectorMemoryManager._count_write(item, duplicate)
+            return item.id
+        except Exception as e:
+            logger.error(f"Error saving memory {item.id}: {e}", exc_info=True)
+            raise e
+
+    async def add_embedded(
+        self,
+        items: list[EpisodicMemoryItem],
+        vectors: list[list[float]],
+        wait: bool = True,
+        import_source: str | None = None
+    ) -> list[str]:
+        """
+        Upserts items whose embeddings the caller already computed (bulk importers).
+        With wait=False the call returns once Qdrant has accepted the batch, so
+        several batches can be in flight. No write-time dedup.
+        `import_source` tags the points with the file they came from (see prune_import).
+        """
+        await self._ensure_collection()
+        hybrid = self._collection_name in self._hybrid_collections
+        points = [
+            VectorMemoryManager._build_point(item, vector, sparse=hybrid)
+            for item, vector in zip(items, vectors)
+        ]
+        if import_source:
+            for point in points:
+                point.payload["import_source"] = import_source
+        await self._client.upsert(
+            collection_name=self._collection_name,
+            points=points,
+            wait=wait
+        )
+        return [item.id for item in items]
+
+    async def prune_import(self, import_source: str, keep_ids: set[str]) -> int:
+        """
+        Deletes the points of an imported file that are not in `keep_ids` (chunks
+        of a previous version of the file). Returns the number of points removed.
+        """
+        await self._ensure_collection()
+        source_filter = VectorMemoryManager._build_filter({"import_source": import_source})
+        stale: list[str] = []
+        offset = None
+        while True:
+            points, offset = await self._client.scroll(
+                collection_name=self._collection_name,
+                scroll_filter=source_filter,
+                limit=_BACKFILL_BATCH,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            stale.extend(str(point.id) for point in points if str(point.id) not in keep_ids)
+            if offset is None:
+                break
+        if stale:
+            await self._client.delete(
+                collection_name=self._collection_name,
+                points_selector=models.PointIdsList(points=stale),
+                wait=True
+            )
+            logger.info(f"🧹 Removed {len(stale)} stale chunks of {import_source}.")
+        return len(stale)
+
+    async def search_memory(
+        self,
+        query: str,
+        filters: dict | None = None,
+        limit: int = 5,
+        score_threshold: float | None = None,
+        created_after: datetime | None = None,
+        created_before: datetime | None = None,
+        raise_errors: bool = False
+    ) -> list[EpisodicMemoryItem]:
+        """
+        Semantic search retrieving structured objects. Same arguments and query
+        (threshold, time window, profile search params, hybrid fusion) as
+        VectorMemoryManager.search_memory.
+        """
+        try:
+            await self._ensure_collection()
+            query_vector = await self._embedding_client().embed(query)
+            result_obj = await self._client.query_points(
+                collection_name=self._collection_name,
+                **VectorMemoryManager._query_kwargs(
+                    query,
+                    query_vector,
+                    VectorMemoryManager._build_filter(filters, created_after, created_before),
+                    limit,
+                    score_threshold,
+                    self._collection_name in self._hybrid_collections
+                )
+            )
+            found_items = [VectorMemoryManager._point_to_item(point) for point in result_obj.points]
             logger.info(f"Found {len(found_items)} memories for query: '{query}'")
             return found_items
 
         except Exception as e:
             logger.error(f"Error searching memory for query '{query}': {e}", exc_info=True)
+            if raise_errors:
+                raise
             return []
 
-    def delete_memory(self, memory_id: str):
+    async def delete_memory(self, memory_id: str):
         """
         Hard delete of a memory item by ID.
         """
         try:
-            self._client.delete(
+            await self._client.delete(
                 collection_name=self._collection_name,
                 points_selector=models.PointIdsList(points=[memory_id]),
             )
             logger.info(f"🗑️ Memory {memory_id} deleted.")
         except Exception as e:
             logger.error(f"Error deleting memory {memory_id}: {e}", exc_info=True)
-            raise e
\ No newline at end of file
+            raise e
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["migrate-hybrid"]:
+        copied = VectorMemoryManager().migrate_to_hybrid()
+        print(f"✅ Hybrid migration done: {copied} memories copied.")
+    else:
+        print("Usage: python -m src.memory_manager migrate-hybrid")
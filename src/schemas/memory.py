@@ -47,4 +47,6 @@ class EpisodicMemoryItem(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     content: str
     metadata: EpisodicMemoryMetadata
+    # Nombre del usuario que originó el recuerdo (contexto de la petición)
+    created_by: str | None = None
     created_at: str = Field(default_factory=lambda: datetime.now().isoformat())
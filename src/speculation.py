@@ -0,0 +1,97 @@
+'''
+Ejecución especulativa del especialista mientras el router decide.
+El agente más probable empieza a trabajar en paralelo al enrutamiento; si el
+router coincide, su resultado se usa tal cual (commit) y si no, se descarta.
+Lo que no se puede deshacer (guardar/borrar recuerdos) espera a la decisión.
+Al descartarla, el Crew se corta antes de su siguiente llamada al LLM.
+'''
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+from crewai.hooks.dispatch import HookAborted
+
+from src.context_builder import estimate_tokens
+
+
+class SpeculationCancelled(HookAborted):
+    """
+    El router eligió otro agente: la ejecución especulativa se aborta.
+    Es un HookAborted para que CrewAI lo propague sin reintentar la tarea.
+    """
+
+
+class SpeculativeRun:
+    """
+    Estado de una ejecución especulativa. `push` es el on_token del Crew: guarda
+    los fragmentos hasta el commit (el usuario aún no debe verlos) y, una vez
+    confirmada, los reenvía al destino real. Tras un cancel aborta el stream.
+    """
+
+    def __init__(self, agent: str, started_at: float):
+        self.agent = agent
+        self.started_at = started_at
+        self.future: Future | None = None
+        self.committed = False
+        # Tokens de salida (aprox.) del texto final: coste de reserva si el LLM no informa de uso
+        self.streamed_tokens = 0
+        # Tokens reales (entrada + salida) de todas las llamadas al LLM de este Crew
+        self.llm_tokens = 0
+        self.task_ids: set[str] = set()
+        self._lock = threading.Lock()
+        self._decided = threading.Event()
+        self._buffer: list[str] = []
+        self._sink: Callable[[str], None] | None = None
+
+    @property
+    def decided(self) -> bool:
+        return self._decided.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._decided.is_set() and not self.committed
+
+    def check(self, *_):
+        """Hook previo a cada llamada al LLM: una especulación descartada no hace ni una más."""
+        if self.cancelled:
+            raise SpeculationCancelled(self.agent)
+
+    def record_usage(self, tokens: int) -> bool:
+        """Suma el uso real de una llamada. True si ya es coste perdido (especulación descartada)."""
+        with self._lock:
+            self.llm_tokens += tokens
+            return self.cancelled
+
+    def push(self, chunk: str):
+        with self._lock:
+            self.check()
+            self.streamed_tokens += estimate_tokens(chunk)
+            if self._sink:
+                self._sink(chunk)
+            elif not self._decided.is_set():
+                self._buffer.append(chunk)
+
+    def commit(self, sink: Callable[[str], None] | None = None):
+        """El router coincide: lo ya generado sale por `sink` y el resto en directo."""
+        with self._lock:
+            self.committed = True
+            self._sink = sink
+            buffered, self._buffer = self._buffer, []
+            # Dentro del lock: los fragmentos nuevos no adelantan a los pendientes
+            if sink:
+                for chunk in buffered:
+                    sink(chunk)
+            self._decided.set()
+
+    def cancel(self) -> int:
+        """Descarta la ejecución. Devuelve los tokens reales gastados hasta ahora."""
+        with self._lock:
+            self.committed = False
+            self._buffer = []
+            self._decided.set()
+            return self.llm_tokens
+
+    def allow_side_effects(self, timeout: float | None = None) -> bool:
+        """Bloquea hasta la decisión del router. True solo si la especulación se confirma."""
+        self._decided.wait(timeout)
+        return self.committed
@@ -2,32 +2,87 @@
 Define las tareas especializadas de LifeOS para los agentes.
 Cada tarea tiene una descripción clara y un output esperado.
 '''
-import yaml
 import os
+from string import Formatter
 from crewai import Task
+from src.utils.yaml_config import ReloadableYamlConfig
+
+
+class CompiledTemplate:
+    """
+    Plantilla de tasks.yaml parseada una sola vez: renderizar es concatenar
+    trozos literales y valores, sin volver a analizar el texto en cada mensaje.
+    Los renders que solo dependen de campos estables (ej: el rol) se memorizan.
+    """
+
+    def __init__(self, template: str):
+        self.parts: list[tuple[str, str | None]] = [
+            (literal, field_name) for literal, field_name, _, _ in Formatter().parse(template)
+        ]
+        self.fields = {name for _, name in self.parts if name}
+        self._memo: dict[tuple, str] = {}
+
+    def render(self, **values) -> str:
+        return "".join(literal + (str(values[name]) if name else "") for literal, name in self.parts)
+
+    def render_cached(self, **values) -> str:
+        key = tuple(sorted(values.items()))
+        rendered = self._memo.get(key)
+        if rendered is None:
+            rendered = self._memo[key] = self.render(**values)
+        return rendered
+
+
+def _compile_tasks(config: dict) -> dict:
+    """Compila las descripciones y valida placeholders al cargar, no al ejecutar."""
+    allowed = {
+        'analysis': {'role', 'user_message'},
+        'response': {'role'},
+        'single_pass': {'role', 'user_message'},
+        'router': {'user_message', 'agent_options'},
+        'summary': {'summary', 'messages'},
+    }
+    compiled = {}
+    for name, data in config.items():
+        template = CompiledTemplate(data['description'])
+        unknown = template.fields - allowed.get(name, template.fields)
+        if unknown:
+            raise ValueError(f"Placeholders desconocidos en la tarea '{name}': {unknown}")
+        compiled[name] = {'description': template, 'expected_output': data['expected_output']}
+    return compiled
+
 
 class LifeOSTasks:
     def __init__(self):
-        self.config = self._load_config()
-
-    def _load_config(self):
         config_path = os.path.join(os.path.dirname(__file__), 'config', 'tasks.yaml')
-        with open(config_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+        self._source = ReloadableYamlConfig(config_path, build=_compile_tasks)
+
+    @property
+    def config(self) -> dict:
+        return self._source.get()
 
     def analysis_task(self, agent, user_message):
-        template = self.config['analysis']['description']
+        task_config = self.config['analysis']
         return Task(
-            description=template.format(role=agent.role, user_message=user_message),
-            expected_output=self.config['analysis']['expected_output'],
+            description=task_config['description'].render(role=agent.role, user_message=user_message),
+            expected_output=task_config['expected_output'],
             agent=agent
         )
 
     def response_task(self, agent):
-        template = self.config['response']['description']
+        task_config = self.config['response']
+        return Task(
+            description=task_config['description'].render_cached(role=agent.role),
+            expected_output=task_config['expected_output'],
+            agent=agent
+        )
+
+    def single_pass_task(self, agent, user_message):
+        """Análisis y respuesta fusionados en una sola llamada al LLM."""
+        task_config = self.config['single_pass']
         return Task(
-            description=template.format(role=agent.role),
-            expected_output=self.config['response']['expected_output'],
+            description=task_config['description'].render(role=agent.role, user_message=user_message),
+            expected_output=task_config['expected_output'],
             agent=agent
         )
 
@@ -35,12 +90,19 @@ class LifeOSTasks:
         """
         Recibe 'agent_options_text' dinámico desde el orquestador.
         """
-        template = self.config['router']['description']
+        task_config = self.config['router']
         return Task(
-            description=template.format(
+            description=task_config['description'].render(
                 user_message=user_message,
                 agent_options=agent_options_text # <--- AQUÍ SE INYECTA EL MENÚ
             ),
-            expected_output=self.config['router']['expected_output'],
+            expected_output=task_config['expected_output'],
             agent=agent
-        )
\ No newline at end of file
+        )
+
+    def summary_prompt(self, previous_summary: str, messages_text: str) -> str:
+        """Prompt del resumen rodante (llamada directa al LLM, sin Crew)."""
+        return self.config['summary']['description'].render(
+            summary=previous_summary or "(vacío)",
+            messages=messages_text
+        )
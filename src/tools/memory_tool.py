@@ -1,3 +1,5 @@
+import logging
+from datetime import datetime, timedelta
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field
 
@@ -10,7 +12,9 @@ from src.schemas.memory import (
     MemorySource
 )
 from src.memory_manager import VectorMemoryManager
-from src.identity_manager import UserContext
+from src.utils.request_context import current_user, side_effects_allowed
+
+logger = logging.getLogger(__name__)
 
 # --- INPUT SCHEMAS ---
 
@@ -25,6 +29,7 @@ class RecallInput(BaseModel):
     """Input schema for searching memories."""
     query: str = Field(..., description="The semantic query to search for relevant memories.")
     domain: MemoryDomain | None = Field(None, description="Optional filter: restrict search to a specific domain.")
+    days: int | None = Field(None, description="Optional filter: only memories from the last N days (e.g. 30).")
 
 class ForgetInput(BaseModel):
     """Input schema for deleting a memory."""
@@ -40,16 +45,13 @@ class RememberTool(BaseTool):
         "Requires categorizing the memory by domain and type."
     )
     args_schema: type[BaseModel] = RememberInput
-    # Estado interno para guardar quién está llamando a la tool
-    _current_user: UserContext | None = None
-
-    def set_context(self, user: UserContext):
-        """Inyecta el usuario actual antes de ejecutar la tool."""
-        self._current_user = user
 
     def _run(self, content: str, domain: str, type: str, tags: str | None = None) -> str:
-        # Determinamos el autor
-        author_name = self._current_user.name if self._current_user else "unknown_system"
+        if not side_effects_allowed():
+            return "⏹️ Speculative run discarded: memory not saved."
+        # Determinamos el autor desde el contexto de la petición (no hay estado en la instancia)
+        user = current_user.get()
+        author_name = user.name if user else "unknown_system"
         try:
             manager = VectorMemoryManager()
             
@@ -67,6 +69,9 @@ class RememberTool(BaseTool):
             )
             
             mem_id = manager.add_memory(memory)
+            if mem_id != memory.id:
+                # Casi idéntico a un recuerdo existente: se ha actualizado en su sitio
+                return f"🔁 Memory already known: updated existing memory ID: {mem_id}"
             return f"✅ Memory saved successfully with ID: {mem_id}"
             
         except Exception as e:
@@ -80,15 +85,20 @@ class RecallTool(BaseTool):
     )
     args_schema: type[BaseModel] = RecallInput
 
-    def _run(self, query: str, domain: str | None = None) -> str:
+    def _run(self, query: str, domain: str | None = None, days: int | None = None) -> str:
         try:
             manager = VectorMemoryManager()
             
             filters = {}
             if domain:
                 filters["domain"] = domain
+            created_after = datetime.now() - timedelta(days=days) if days else None
 
-            results = manager.search_memory(query=query, filters=filters if filters else None)
+            results = manager.search_memory(
+                query=query,
+                filters=filters if filters else None,
+                created_after=created_after
+            )
             
             if not results:
                 return "No relevant memories found."
@@ -113,6 +123,8 @@ class ForgetTool(BaseTool):
     args_schema: type[BaseModel] = ForgetInput
 
     def _run(self, query: str) -> str:
+        if not side_effects_allowed():
+            return "⏹️ Speculative run discarded: nothing deleted."
         try:
             manager = VectorMemoryManager()
             
@@ -126,8 +138,9 @@ class ForgetTool(BaseTool):
             target_memory = results[0]
             
             # 2. Borramos usando el ID que hemos recuperado
-            # Necesitas añadir este método .delete() al Manager (ver abajo)
             manager.delete_memory(target_memory.id)
+            user = current_user.get()
+            logger.info(f"🗑️ Memory {target_memory.id} forgotten on behalf of {user.name if user else 'unknown_system'}")
             
             return (
                 f"🗑️ DELETED Memory ID {target_memory.id}\n"
@@ -1,5 +1,4 @@
 from crewai.tools import BaseTool
-from duckduckgo_search import DDGS
 from pydantic import BaseModel, Field
 
 class SearchInput(BaseModel):
@@ -15,6 +14,9 @@ class WebSearchTool(BaseTool):
 
     def _run(self, query: str) -> str:
         try:
+            # Import diferido: solo se paga si un agente busca en la web
+            from duckduckgo_search import DDGS
+
             with DDGS() as ddgs:
                 # Extraemos 4 resultados para no saturar el contexto
                 results = list(ddgs.text(query, max_results=4))
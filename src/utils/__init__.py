@@ -1,3 +1,18 @@
-# Exponemos las utilidades para facilitar imports
-from .session_manager import SessionManager
-from .radar import available_models
\ No newline at end of file
+# Exponemos las utilidades para facilitar imports.
+# Carga perezosa (PEP 562): importar un submódulo ligero como src.utils.session_manager
+# no arrastra httpx/requests de los demás (cold start en Cloud Run).
+_EXPORTS = {
+    'SessionManager': '.session_manager',
+    'available_models': '.radar',
+    'EmbeddingCache': '.embedding_cache',
+    'AsyncEmbeddingClient': '.embedding_client',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        from importlib import import_module
+        return getattr(import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
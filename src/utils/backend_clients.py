@@ -0,0 +1,126 @@
+import logging
+import os
+import threading
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class BackendClients:
+    """
+    Registro único de clientes de backend (Firestore, Qdrant, LiteLLM).
+    Cada cliente se crea una sola vez por proceso y lo comparten IdentityManager,
+    SessionManager y VectorMemoryManager (AsyncVectorMemoryManager usa el de Qdrant
+    asíncrono); el warm-up de arranque los abre todos antes de aceptar el primer mensaje.
+    """
+    _lock = threading.Lock()
+    _firestore = None
+    _qdrant = None
+    _async_qdrant = None
+    _litellm_session: requests.Session | None = None
+
+    @classmethod
+    def firestore(cls):
+        """Cliente Firestore compartido (soporta bases de datos nombradas vía FIRESTORE_DB_NAME)."""
+        if cls._firestore is None:
+            with cls._lock:
+                if cls._firestore is None:
+                    from google.cloud import firestore
+
+                    db_name = os.getenv('FIRESTORE_DB_NAME')
+                    cls._firestore = firestore.Client(database=db_name) if db_name else firestore.Client()
+                    logger.info(f"🔌 Firestore conectado (proyecto: {cls._firestore.project}, db: {db_name or '(default)'})")
+        return cls._firestore
+
+    @staticmethod
+    def qdrant_connection_kwargs() -> dict:
+        """
+        Parámetros de conexión a Qdrant desde el entorno, comunes al cliente
+        síncrono y al asíncrono. QDRANT_PREFER_GRPC=true usa gRPC (puerto 6334).
+        """
+        host = os.getenv("QDRANT_HOST", "qdrant")
+        port = int(os.getenv("QDRANT_PORT", 6333))
+        api_key = os.getenv("QDRANT_API_KEY")
+        prefer_grpc = os.getenv("QDRANT_PREFER_GRPC", "False").lower() == "true"
+
+        if api_key:
+            # Modo Cloud (HTTPS)
+            logger.info(f"   -> Mode: Cloud, URL: {host}, gRPC: {prefer_grpc}")
+            kwargs = {"url": host, "api_key": api_key}
+        else:
+            # Modo Docker (HTTP plano)
+            logger.info(f"   -> Mode: Docker, Host: {host}, Port: {port}, gRPC: {prefer_grpc}")
+            kwargs = {"host": host, "port": port}
+
+        if prefer_grpc:
+            kwargs["prefer_grpc"] = True
+            kwargs["grpc_port"] = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+        return kwargs
+
+    @classmethod
+    def qdrant(cls):
+        """Cliente Qdrant síncrono compartido."""
+        if cls._qdrant is None:
+            with cls._lock:
+                if cls._qdrant is None:
+                    from qdrant_client import QdrantClient
+
+                    logger.info("🔌 Connecting to Memory Store...")
+                    cls._qdrant = QdrantClient(**cls.qdrant_connection_kwargs())
+        return cls._qdrant
+
+    @classmethod
+    def async_qdrant(cls):
+        """Cliente Qdrant asíncrono compartido (se usa y se cierra en el event loop del bot)."""
+        if cls._async_qdrant is None:
+            with cls._lock:
+                if cls._async_qdrant is None:
+                    from qdrant_client import AsyncQdrantClient
+
+                    logger.info("🔌 Connecting to Memory Store (async)...")
+                    cls._async_qdrant = AsyncQdrantClient(**cls.qdrant_connection_kwargs())
+        return cls._async_qdrant
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """Cierra los clientes asíncronos (close() no puede esperarlos)."""
+        with cls._lock:
+            client, cls._async_qdrant = cls._async_qdrant, None
+        if client is not None:
+            await client.close()
+
+    @staticmethod
+    def litellm_url() -> str:
+        litellm_url = os.getenv("LITELLM_URL", "http://localhost:4000")
+        if not litellm_url.startswith("http"):
+            litellm_url = f"http://{litellm_url}"
+        return litellm_url.rstrip('/')
+
+    @classmethod
+    def litellm_session(cls) -> requests.Session:
+        """Sesión HTTP keep-alive hacia el proxy LiteLLM."""
+        if cls._litellm_session is None:
+            with cls._lock:
+                if cls._litellm_session is None:
+                    cls._litellm_session = requests.Session()
+        return cls._litellm_session
+
+    @classmethod
+    def ping_litellm(cls, timeout: float = 5) -> None:
+        """Abre la conexión con el proxy (endpoint de salud sin autenticación)."""
+        response = cls.litellm_session().get(f"{cls.litellm_url()}/health/liveliness", timeout=timeout)
+        response.raise_for_status()
+
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._qdrant is not None:
+                cls._qdrant.close()
+                cls._qdrant = None
+            if cls._firestore is not None:
+                cls._firestore.close()
+                cls._firestore = None
+            if cls._litellm_session is not None:
+                cls._litellm_session.close()
+                cls._litellm_session = None
@@ -0,0 +1,26 @@
+import asyncio
+import weakref
+from contextlib import asynccontextmanager
+
+
+class ChatSerializer:
+    """
+    Un asyncio.Lock por chat: los turnos de un mismo chat se procesan en orden
+    (el historial y el agente "pegajoso" dependen de ello), mientras que chats
+    distintos avanzan en paralelo, acotados por un semáforo global.
+    Los locks viven en un WeakValueDictionary: desaparecen cuando nadie espera.
+    """
+
+    def __init__(self, max_concurrency: int):
+        self._locks: weakref.WeakValueDictionary[int, asyncio.Lock] = weakref.WeakValueDictionary()
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def turn(self, chat_id: int):
+        lock = self._locks.get(chat_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[chat_id] = lock
+        async with lock:
+            async with self._slots:
+                yield
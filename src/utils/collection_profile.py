@@ -0,0 +1,132 @@
+'''
+Perfiles de almacenamiento e índice de la colección de memoria en Qdrant.
+Con los valores por defecto de Qdrant los vectores completos (float32) viven en RAM;
+en un contenedor pequeño conviene cuantizarlos y dejar los originales en disco.
+
+MEMORY_COLLECTION_PROFILE elige un preset y cada parámetro se puede sobrescribir:
+QDRANT_HNSW_M, QDRANT_HNSW_EF_CONSTRUCT, QDRANT_HNSW_EF (búsqueda),
+QDRANT_QUANTIZATION (none | scalar | binary), QDRANT_QUANTIZATION_RESCORE,
+QDRANT_QUANTIZATION_OVERSAMPLING, QDRANT_ON_DISK_VECTORS, QDRANT_ON_DISK_PAYLOAD.
+'''
+import os
+from dataclasses import dataclass, replace
+
+from qdrant_client import models
+
+QUANTIZATION_KINDS = ("none", "scalar", "binary")
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    # ef en búsqueda; None = el de Qdrant (ef_construct)
+    hnsw_ef: int | None = None
+    quantization: str = "none"
+    # Con cuantización: recalcular el top con los vectores originales
+    rescore: bool = True
+    oversampling: float = 2.0
+    on_disk_vectors: bool = False
+    on_disk_payload: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CollectionProfile":
+        name = os.getenv("MEMORY_COLLECTION_PROFILE", "default").lower()
+        if name not in PROFILES:
+            raise ValueError(f"MEMORY_COLLECTION_PROFILE desconocido: '{name}' (opciones: {', '.join(PROFILES)})")
+        profile = PROFILES[name]
+
+        overrides = {}
+        for field_name, env, cast in (
+            ("hnsw_m", "QDRANT_HNSW_M", int),
+            ("hnsw_ef_construct", "QDRANT_HNSW_EF_CONSTRUCT", int),
+            ("hnsw_ef", "QDRANT_HNSW_EF", int),
+            ("quantization", "QDRANT_QUANTIZATION", str.lower),
+            ("rescore", "QDRANT_QUANTIZATION_RESCORE", _as_bool),
+            ("oversampling", "QDRANT_QUANTIZATION_OVERSAMPLING", float),
+            ("on_disk_vectors", "QDRANT_ON_DISK_VECTORS", _as_bool),
+            ("on_disk_payload", "QDRANT_ON_DISK_PAYLOAD", _as_bool),
+        ):
+            value = os.getenv(env)
+            if value:
+                overrides[field_name] = cast(value)
+        profile = replace(profile, **overrides)
+
+        if profile.quantization not in QUANTIZATION_KINDS:
+            raise ValueError(f"QDRANT_QUANTIZATION desconocido: '{profile.quantization}' (opciones: {', '.join(QUANTIZATION_KINDS)})")
+        return profile
+
+    def quantization_config(self) -> models.ScalarQuantization | models.BinaryQuantization | None:
+        # always_ram: lo cuantizado (4x / 32x más pequeño) en RAM, los originales donde diga on_disk
+        if self.quantization == "scalar":
+            return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8, quantile=0.99, always_ram=True
+            ))
+        if self.quantization == "binary":
+            return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+        return None
+
+    def collection_config(self, size: int, distance: models.Distance) -> dict:
+        """Parámetros de create_collection."""
+        return {
+            "vectors_config": models.VectorParams(size=size, distance=distance, on_disk=self.on_disk_vectors),
+            "hnsw_config": models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct),
+            "quantization_config": self.quantization_config(),
+            "on_disk_payload": self.on_disk_payload,
+        }
+
+    def search_params(self) -> models.SearchParams | None:
+        """Parámetros de query_points (None si no hay nada que ajustar)."""
+        quantization = None
+        if self.quantization != "none":
+            quantization = models.QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if quantization is None and self.hnsw_ef is None:
+            return None
+        return models.SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+
+    def migration(self, info: models.CollectionInfo) -> dict:
+        """
+        Diferencias entre una colección existente y el perfil, como parámetros de
+        update_collection ({} si ya coincide). Qdrant las aplica en caliente:
+        reconstruye los segmentos en segundo plano y la colección sigue sirviendo.
+        """
+        config = info.config
+        changes = {}
+
+        hnsw = config.hnsw_config
+        if (hnsw.m, hnsw.ef_construct) != (self.hnsw_m, self.hnsw_ef_construct):
+            changes["hnsw_config"] = models.HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+        if _quantization_kind(config.quantization_config) != self.quantization:
+            changes["quantization_config"] = self.quantization_config() or models.Disabled.DISABLED
+
+        vectors = config.params.vectors
+        if isinstance(vectors, models.VectorParams) and bool(vectors.on_disk) != self.on_disk_vectors:
+            changes["vectors_config"] = {"": models.VectorParamsDiff(on_disk=self.on_disk_vectors)}
+
+        if bool(config.params.on_disk_payload) != self.on_disk_payload:
+            changes["collection_params"] = models.CollectionParamsDiff(on_disk_payload=self.on_disk_payload)
+        return changes
+
+
+def _as_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def _quantization_kind(config) -> str:
+    if isinstance(config, models.ScalarQuantization):
+        return "scalar"
+    if isinstance(config, models.BinaryQuantization):
+        return "binary"
+    return "none"
+
+
+PROFILES: dict[str, CollectionProfile] = {
+    # Valores por defecto de Qdrant: máxima precisión, todo en RAM
+    "default": CollectionProfile(name="default"),
+    # int8 en RAM (~4x menos), float32 en disco para el rescore: recall casi idéntico
+    "lean": CollectionProfile(name="lean", quantization="scalar", on_disk_vectors=True),
+    # 1 bit por dimensión en RAM (~32x menos); necesita más oversampling para mantener recall
+    "compact": CollectionProfile(name="compact", quantization="binary", oversampling=3.0, on_disk_vectors=True),
+}
@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_LITELLM_CONFIG = Path(__file__).resolve().parents[2] / "litellm_config.yaml"
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form used for cache keys: NFC unicode and collapsed whitespace.
+    Case is preserved because the embedding model is case-sensitive.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def resolve_model_fingerprint(model_name: str, config_path: str | Path | None = None) -> str:
+    """
+    Builds the identity of an embedding model as seen by the LiteLLM proxy.
+    The alias (e.g. 'text-embedding-004') is resolved against litellm_config.yaml
+    so that re-pointing the alias to a different upstream model changes the
+    fingerprint and, therefore, every cache key.
+    """
+    path = Path(config_path or os.getenv("LITELLM_CONFIG_PATH", _DEFAULT_LITELLM_CONFIG))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        logger.debug(f"LiteLLM config not readable at {path}, using bare model alias.")
+        return model_name
+
+    upstream = [
+        entry.get("litellm_params", {}).get("model", "")
+        for entry in config.get("model_list", [])
+        if entry.get("model_name") == model_name
+    ]
+    if not upstream:
+        return model_name
+    return f"{model_name}->{','.join(sorted(upstream))}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier, content-addressed cache for embedding vectors.
+    - Tier 1: bounded in-process LRU (OrderedDict).
+    - Tier 2: on-disk SQLite store that survives restarts.
+    Keys are sha256(model fingerprint + normalized text), so changing the
+    embedding model never serves stale vectors.
+    """
+
+    def __init__(self, model_fingerprint: str, max_entries: int = 1024, db_path: str | None = None):
+        self.model_fingerprint = model_fingerprint
+        self.max_entries = max_entries
+        self._lru: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: sqlite3.Connection | None = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._open_disk_store(db_path)
+
+    @classmethod
+    def from_env(cls, model_name: str) -> "EmbeddingCache":
+        """Builds the cache using EMBEDDING_CACHE_SIZE / EMBEDDING_CACHE_PATH."""
+        max_entries = int(os.getenv("EMBEDDING_CACHE_SIZE", 1024))
+        db_path = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite3")
+        return cls(
+            model_fingerprint=resolve_model_fingerprint(model_name),
+            max_entries=max_entries,
+            db_path=db_path or None,
+        )
+
+    def _open_disk_store(self, db_path: str):
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            # The disk tier is an optimization: degrade to memory-only.
+            logger.warning(f"Embedding disk cache unavailable at {db_path}: {e}")
+            self._db = None
+
+    def make_key(self, text: str) -> str:
+        raw = f"{self.model_fingerprint}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def has_disk(self) -> bool:
+        return self._db is not None
+
+    def get(self, text: str) -> list[float] | None:
+        vector = self.get_memory(text)
+        if vector is None:
+            vector = self.get_disk_many([text])[0]
+        return vector
+
+    def put(self, text: str, vector: list[float]):
+        self.put_memory(text, vector)
+        self.put_disk_many([(text, vector)])
+
+    def get_memory(self, text: str) -> list[float] | None:
+        """LRU tier only: cheap enough to call from the event loop."""
+        key = self.make_key(text)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+            return vector
+
+    def put_memory(self, text: str, vector: list[float]):
+        with self._lock:
+            self._remember(self.make_key(text), vector)
+
+    def get_disk_many(self, texts: list[str]) -> list[list[float] | None]:
+        """
+        SQLite tier, one query for the whole batch. Blocking: async callers run
+        it through asyncio.to_thread. Hits are promoted to the LRU.
+        """
+        keys = [self.make_key(text) for text in texts]
+        found: dict[str, list[float]] = {}
+        with self._lock:
+            if self._db is not None and keys:
+                placeholders = ",".join("?" * len(keys))
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", keys
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("d", blob).tolist()
+                    self._remember(key, found[key])
+            vectors = [found.get(key) for key in keys]
+            self.disk_hits += sum(vector is not None for vector in vectors)
+            self.misses += sum(vector is None for vector in vectors)
+        return vectors
+
+    def put_disk_many(self, items: list[tuple[str, list[float]]]):
+        """Persists a batch in a single transaction. Blocking, like get_disk_many."""
+        if self._db is None or not items:
+            return
+        rows = [
+            (self.make_key(text), self.model_fingerprint, array("d", vector).tobytes())
+            for text, vector in items
+        ]
+        with self._lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist embeddings to disk cache: {e}")
+
+    def _remember(self, key: str, vector: list[float]):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def invalidate(self, all_models: bool = False) -> int:
+        """
+        Drops cached vectors. By default only entries produced by a model other
+        than the current fingerprint are removed from disk (the LRU is always
+        cleared). Returns the number of disk rows deleted.
+        """
+        with self._lock:
+            self._lru.clear()
+            if self._db is None:
+                return 0
+            if all_models:
+                cursor = self._db.execute("DELETE FROM embeddings")
+            else:
+                cursor = self._db.execute(
+                    "DELETE FROM embeddings WHERE model != ?", (self.model_fingerprint,)
+                )
+            self._db.commit()
+            return cursor.rowcount
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+        }
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import threading
+
+import httpx
+
+from src.utils.embedding_cache import EmbeddingCache, normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncEmbeddingClient:
+    """
+    Asyncio-native client for the LiteLLM /v1/embeddings endpoint.
+    - One shared keep-alive connection pool (httpx.AsyncClient).
+    - A semaphore caps the number of concurrent upstream requests.
+    - Identical texts requested concurrently share a single upstream call
+      (in-flight coalescing), on top of the optional EmbeddingCache.
+    Worker threads (CrewAI tools) reach it through embed_blocking(), which
+    schedules the coroutine on the loop the client was bound to.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        max_concurrency: int = 4,
+        batch_size: int = 100,
+        timeout: float = 30.0,
+        cache: EmbeddingCache | None = None,
+    ):
+        if not base_url.startswith("http"):
+            base_url = f"http://{base_url}"
+        self.embedding_url = f"{base_url.rstrip('/')}/v1/embeddings"
+        self.model = model
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cache = cache
+
+        self._max_concurrency = max_concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._http: httpx.AsyncClient | None = None
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @classmethod
+    def from_env(cls, model: str, cache: EmbeddingCache | None = None) -> "AsyncEmbeddingClient":
+        return cls(
+            base_url=os.getenv("LITELLM_URL", "http://localhost:4000"),
+            model=model,
+            max_concurrency=int(os.getenv("EMBEDDING_MAX_CONCURRENCY", 4)),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 100)),
+            cache=cache,
+        )
+
+    # --- LIFECYCLE ---
+
+    def bind(self, loop: asyncio.AbstractEventLoop | None = None):
+        """Attaches the client to the event loop that owns its pool and primitives."""
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self._max_concurrency,
+                max_keepalive_connections=self._max_concurrency,
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._loop = None
+
+    @property
+    def is_bound(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    # --- PUBLIC API ---
+
+    async def embed(self, text: str) -> list[float]:
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: list[str]) -> list[list[float]]:
+        """Returns one vector per text, in order."""
+        if self._http is None:
+            self.bind()
+
+        vectors: list[list[float] | None] = [None] * len(texts)
+        waiting: dict[int, asyncio.Future] = {}
+        owned: dict[str, asyncio.Future] = {}
+        to_fetch: list[str] = []
+
+        pending = list(range(len(texts)))
+        if self.cache is not None:
+            # Only the LRU tier runs on the loop; SQLite goes to a thread, once per call.
+            for i in pending:
+                vectors[i] = self.cache.get_memory(texts[i])
+            pending = [i for i in pending if vectors[i] is None]
+            if pending:
+                missing = [texts[i] for i in pending]
+                if self.cache.has_disk:
+                    stored = await asyncio.to_thread(self.cache.get_disk_many, missing)
+                else:
+                    stored = self.cache.get_disk_many(missing)  # No disk tier: just counts misses
+                for i, vector in zip(pending, stored):
+                    vectors[i] = vector
+                pending = [i for i in pending if vectors[i] is None]
+
+        for i in pending:
+            text = texts[i]
+            key = normalize_text(text)
+            future = self._inflight.get(key) or owned.get(key)
+            if future is not None:
+                if key not in owned:
+                    self.coalesced += 1
+            else:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                owned[key] = future
+                to_fetch.append(text)
+            waiting[i] = future
+
+        if to_fetch:
+            await self._fetch_owned(to_fetch, owned)
+
+        for i, future in waiting.items():
+            vectors[i] = await future
+        return vectors
+
+    def embed_blocking(self, texts: list[str]) -> list[list[float]]:
+        """Thread-safe bridge for sync callers running outside the event loop."""
+        future = asyncio.run_coroutine_threadsafe(self.embed_many(texts), self._loop)
+        return future.result(timeout=self.timeout * 2)
+
+    def can_bridge(self) -> bool:
+        """True when a sync caller on another thread can use embed_blocking()."""
+        if not self.is_bound:
+            return False
+        return threading.get_ident() != self._loop_thread
+
+    def stats(self) -> dict[str, int]:
+        return {"upstream_calls": self.upstream_calls, "coalesced": self.coalesced}
+
+    # --- INTERNALS ---
+
+    async def _fetch_owned(self, texts: list[str], owned: dict[str, asyncio.Future]):
+        """Fetches the texts this call owns and resolves their shared futures."""
+        try:
+            for start in range(0, len(texts), self.batch_size):
+                chunk = texts[start:start + self.batch_size]
+                fresh = await self._request(chunk)
+                if self.cache is not None:
+                    for text, vector in zip(chunk, fresh):
+                        self.cache.put_memory(text, vector)
+                    if self.cache.has_disk:
+                        await asyncio.to_thread(self.cache.put_disk_many, list(zip(chunk, fresh)))
+                for text, vector in zip(chunk, fresh):
+                    future = owned[normalize_text(text)]
+                    if not future.done():
+                        future.set_result(vector)
+        except Exception as e:
+            for future in owned.values():
+                if not future.done():
+                    future.set_exception(e)
+            # Consumers re-raise through their futures; avoid "never retrieved" warnings.
+            for future in owned.values():
+                future.exception()
+        finally:
+            for key in owned:
+                self._inflight.pop(key, None)
+
+    async def _request(self, texts: list[str]) -> list[list[float]]:
+        async with self._semaphore:
+            self.upstream_calls += 1
+            try:
+                response = await self._http.post(
+                    self.embedding_url, json={"model": self.model, "input": texts}
+                )
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                logger.error(f"Error getting embedding from LiteLLM proxy at {self.embedding_url}: {e}", exc_info=True)
+                raise
+
+        embedding_data = response.json().get("data")
+        if not embedding_data or len(embedding_data) != len(texts):
+            raise ValueError("Invalid embedding response format from LiteLLM")
+        ordered = sorted(embedding_data, key=lambda entry: entry.get("index", 0))
+        return [entry.get("embedding") for entry in ordered]
@@ -0,0 +1,40 @@
+'''
+Contexto por petición (contextvars) en lugar de estado global en las tools.
+
+asyncio.to_thread y los hilos internos de CrewAI copian el contexto activo,
+así que el usuario fijado al empezar un turno llega intacto a las tools,
+aunque haya varios chats ejecutándose a la vez.
+'''
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from src.identity_manager import UserContext
+    from src.speculation import SpeculativeRun
+
+current_user: ContextVar["UserContext | None"] = ContextVar("current_user", default=None)
+# Ejecución especulativa en curso (None en una ejecución normal)
+current_speculation: ContextVar["SpeculativeRun | None"] = ContextVar("current_speculation", default=None)
+
+# Límite de espera de una tool con efectos a que el router confirme la especulación
+SIDE_EFFECT_WAIT_SECONDS = 60.0
+
+
+@contextmanager
+def bind_user(user: "UserContext | None"):
+    """Fija el usuario del turno actual mientras dure el bloque."""
+    token = current_user.set(user)
+    try:
+        yield user
+    finally:
+        current_user.reset(token)
+
+
+def side_effects_allowed() -> bool:
+    """
+    Las tools que modifican estado (guardar/borrar recuerdos) lo consultan antes
+    de actuar. En una ejecución especulativa esperan a que el router la confirme.
+    """
+    speculation = current_speculation.get()
+    return speculation is None or speculation.allow_side_effects(SIDE_EFFECT_WAIT_SECONDS)
@@ -0,0 +1,245 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Protocol
+
+from src.utils.backend_clients import BackendClients
+
+# (chat_id, id de documento, datos del mensaje) tal y como los encola SessionManager
+MessageRecord = tuple[str, str, dict[str, Any]]
+
+
+class SessionBackend(Protocol):
+    """
+    Almacenamiento del historial de chat. SessionManager se encarga del buffer
+    de escritura y de la caché; el backend solo persiste lotes y lee los últimos N.
+    """
+
+    def write_batch(self, records: list[MessageRecord]) -> None:
+        """Persiste un lote de mensajes (y la última actividad de cada sesión)."""
+        ...
+
+    def fetch_recent(self, chat_id: str, limit: int) -> list[dict[str, Any]]:
+        """Últimos `limit` mensajes del chat en orden cronológico (Oldest -> Newest)."""
+        ...
+
+    def get_summary(self, chat_id: str) -> dict[str, Any] | None:
+        """Resumen rodante del chat: {'summary': str, 'upto': message_id} o None."""
+        ...
+
+    def set_summary(self, chat_id: str, summary: str, upto: Any) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+def _session_type(chat_id: str) -> str:
+    return 'group' if chat_id.startswith('-') else 'private'
+
+
+class FirestoreSessionBackend:
+    """Estructura: sessions/{chat_id}/messages/{message_id}"""
+
+    # Firestore admite 500 operaciones por WriteBatch: 1 por mensaje + 1 por sesión padre
+    MAX_BATCH_MESSAGES = 400
+
+    def __init__(self, db=None):
+        from google.cloud import firestore
+
+        self._firestore = firestore
+        # Cliente compartido del proceso (mismo que IdentityManager)
+        self.db = db or BackendClients.firestore()
+
+    def write_batch(self, records: list[MessageRecord]) -> None:
+        for start in range(0, len(records), self.MAX_BATCH_MESSAGES):
+            chunk = records[start:start + self.MAX_BATCH_MESSAGES]
+            batch = self.db.batch()
+            for cid in {cid for cid, _, _ in chunk}:
+                # Metadatos de la sesión padre (Upsert, uno por chat y lote)
+                batch.set(self.db.collection('sessions').document(cid), {
+                    'last_activity': self._firestore.SERVER_TIMESTAMP,
+                    'type': _session_type(cid)
+                }, merge=True)
+            for cid, msg_id_str, doc_data in chunk:
+                messages = self.db.collection('sessions').document(cid).collection('messages')
+                # Usamos el ID de Telegram como ID del documento para idempotencia
+                # Fallback seguro si no hay ID (no debería ocurrir en Telegram)
+                doc_ref = messages.document(msg_id_str) if msg_id_str else messages.document()
+                batch.set(doc_ref, doc_data)
+            batch.commit()
+
+    def fetch_recent(self, chat_id: str, limit: int) -> list[dict[str, Any]]:
+        # Consulta: Los N más recientes (orden Descendente por tiempo)
+        docs = (
+            self.db.collection('sessions')
+            .document(chat_id)
+            .collection('messages')
+            .order_by('timestamp', direction=self._firestore.Query.DESCENDING)
+            .limit(limit)
+            .stream()
+        )
+        return [doc.to_dict() for doc in docs][::-1]
+
+    def get_summary(self, chat_id: str) -> dict[str, Any] | None:
+        data = self.db.collection('sessions').document(chat_id).get().to_dict() or {}
+        if not data.get('summary'):
+            return None
+        return {'summary': data['summary'], 'upto': data.get('summary_upto')}
+
+    def set_summary(self, chat_id: str, summary: str, upto: Any) -> None:
+        # En el documento padre sessions/{chat_id}, junto a last_activity
+        self.db.collection('sessions').document(chat_id).set({
+            'summary': summary,
+            'summary_upto': upto,
+            'summary_updated_at': self._firestore.SERVER_TIMESTAMP
+        }, merge=True)
+
+    def close(self) -> None:
+        # El cliente es del registro compartido: lo cierra BackendClients
+        pass
+
+
+class SQLiteSessionBackend:
+    """
+    Historial en un fichero SQLite local (ADR-005, despliegues de un solo nodo).
+    Modo WAL: las lecturas no bloquean al escritor. Cada hilo lector usa su propia
+    conexión; las escrituras van en una única transacción por lote.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            chat_id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            last_activity REAL NOT NULL,
+            summary TEXT,
+            summary_upto
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            chat_id TEXT NOT NULL,
+            doc_id TEXT NOT NULL,
+            message_id,
+            role TEXT,
+            content TEXT,
+            sender_id TEXT,
+            name TEXT,
+            timestamp REAL NOT NULL,
+            PRIMARY KEY (chat_id, doc_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages (chat_id, timestamp);
+    """
+    # SQL constante: sqlite3 reutiliza el statement preparado de su caché
+    _INSERT_MESSAGE = (
+        "INSERT OR REPLACE INTO messages (chat_id, doc_id, message_id, role, content, sender_id, name, timestamp) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    )
+    _UPSERT_SESSION = (
+        "INSERT INTO sessions (chat_id, type, last_activity) VALUES (?, ?, ?) "
+        "ON CONFLICT(chat_id) DO UPDATE SET last_activity = excluded.last_activity"
+    )
+    _SELECT_SUMMARY = "SELECT summary, summary_upto FROM sessions WHERE chat_id = ?"
+    _UPSERT_SUMMARY = (
+        "INSERT INTO sessions (chat_id, type, last_activity, summary, summary_upto) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(chat_id) DO UPDATE SET summary = excluded.summary, summary_upto = excluded.summary_upto"
+    )
+    _SELECT_RECENT = (
+        "SELECT message_id, role, content, sender_id, name, timestamp FROM messages "
+        "WHERE chat_id = ? ORDER BY timestamp DESC LIMIT ?"
+    )
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(self._SCHEMA)
+        self._migrate(conn)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Añade las columnas nuevas a ficheros creados por versiones anteriores."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        with conn:
+            if 'summary' not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN summary TEXT")
+            if 'summary_upto' not in columns:
+                conn.execute("ALTER TABLE sessions ADD COLUMN summary_upto")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=64)
+            # En WAL, NORMAL solo arriesga la última transacción ante un corte de luz
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def write_batch(self, records: list[MessageRecord]) -> None:
+        if not records:
+            return
+        now = datetime.now(timezone.utc).timestamp()
+        rows = [
+            (
+                cid, msg_id_str, doc_data.get('message_id'), doc_data.get('role'), doc_data.get('content'),
+                doc_data.get('sender_id'), doc_data.get('name'), doc_data['timestamp'].timestamp()
+            )
+            for cid, msg_id_str, doc_data in records
+        ]
+        sessions = [(cid, _session_type(cid), now) for cid in {cid for cid, _, _ in records}]
+
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.executemany(self._INSERT_MESSAGE, rows)
+            conn.executemany(self._UPSERT_SESSION, sessions)
+
+    def fetch_recent(self, chat_id: str, limit: int) -> list[dict[str, Any]]:
+        rows = self._connection().execute(self._SELECT_RECENT, (chat_id, limit)).fetchall()
+        return [
+            {
+                'message_id': message_id,
+                'role': role,
+                'content': content,
+                'sender_id': sender_id,
+                'name': name,
+                'timestamp': datetime.fromtimestamp(timestamp, timezone.utc),
+            }
+            for message_id, role, content, sender_id, name, timestamp in reversed(rows)
+        ]
+
+    def get_summary(self, chat_id: str) -> dict[str, Any] | None:
+        row = self._connection().execute(self._SELECT_SUMMARY, (chat_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        return {'summary': row[0], 'upto': row[1]}
+
+    def set_summary(self, chat_id: str, summary: str, upto: Any) -> None:
+        now = datetime.now(timezone.utc).timestamp()
+        conn = self._connection()
+        with self._write_lock, conn:
+            conn.execute(self._UPSERT_SUMMARY, (chat_id, _session_type(chat_id), now, summary, upto))
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def create_backend(kind: str) -> SessionBackend | None:
+    """Construye el backend indicado: firestore | sqlite | none."""
+    if kind == 'firestore':
+        return FirestoreSessionBackend()
+    if kind == 'sqlite':
+        return SQLiteSessionBackend(os.getenv('SESSION_DB_PATH', 'data/sessions.sqlite3'))
+    return None
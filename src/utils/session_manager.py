@@ -1,118 +1,363 @@
+import atexit
+import json
 import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from pathlib import Path
 from typing import Any
-from google.cloud import firestore
 from dotenv import load_dotenv
+from src.utils.session_backends import SessionBackend, create_backend
 
 load_dotenv()
 
 class SessionManager:
     """
-    Gestor de sesiones en Firestore (Python 3.12+).
-    Estructura: sessions/{chat_id}/messages/{message_id}
+    Gestor de sesiones (Python 3.12+) sobre un backend intercambiable:
+    Firestore (sessions/{chat_id}/messages/{message_id}) o SQLite local.
+
+    Escritura diferida (write-behind): add_message solo encola. Un hilo de fondo
+    escribe los mensajes por lotes cuando se alcanza el tamaño o el intervalo
+    configurado, y en el apagado. Si el backend no está disponible al apagar,
+    lo pendiente se vuelca a un spool local que se reenvía al arrancar.
+
+    Caché de historial: cada chat tiene un ring buffer (deque acotado) con sus
+    últimos mensajes ya formateados. Se rellena en add_message, se calienta desde el
+    backend la primera vez que se lee un chat y un LRU limita el número de chats.
     """
-    _firestore_client: firestore.Client | None = None
+    _backend: SessionBackend | None = None
     _USE_FIRESTORE: bool = os.getenv('USE_FIRESTORE', 'False').lower() == 'true'
-    _DB_NAME: str | None = os.getenv('FIRESTORE_DB_NAME')
+    # firestore | sqlite | none. Sin Firestore, el historial va a SQLite local (ADR-005)
+    _BACKEND_KIND: str = os.getenv('SESSION_BACKEND', 'firestore' if _USE_FIRESTORE else 'sqlite').lower()
+
+    # --- WRITE-BEHIND ---
+    _FLUSH_MAX_BATCH: int = int(os.getenv('SESSION_FLUSH_MAX_BATCH', '20'))
+    _FLUSH_INTERVAL: float = float(os.getenv('SESSION_FLUSH_INTERVAL', '2.0'))
+    _SPOOL_PATH: Path = Path(os.getenv('SESSION_SPOOL_PATH', 'data/session_spool.jsonl'))
+
+    _pending: list[tuple[str, str, dict[str, Any]]] = []
+    _buffer_lock = threading.Lock()
+    _flush_lock = threading.Lock()
+    _wakeup = threading.Event()
+    _flusher: threading.Thread | None = None
+    _closed: bool = False
+
+    # --- CACHÉ DE HISTORIAL ---
+    _CACHE_MESSAGES: int = int(os.getenv('SESSION_CACHE_MESSAGES', '30'))
+    _CACHE_CHATS: int = int(os.getenv('SESSION_CACHE_CHATS', '256'))
+    _history: OrderedDict[str, deque] = OrderedDict()
+    _summaries: OrderedDict[str, dict[str, Any] | None] = OrderedDict()
+    # Chats calentándose desde el backend: mensajes llegados durante la consulta
+    _warming: dict[str, list[dict[str, Any]]] = {}
+    _history_lock = threading.Lock()
 
     @classmethod
-    def _get_db(cls) -> firestore.Client | None:
-        """Inicialización Lazy del cliente Firestore."""
-        if cls._firestore_client is None and cls._USE_FIRESTORE:
+    def _get_backend(cls) -> SessionBackend | None:
+        """Inicialización Lazy del backend de sesiones."""
+        if cls._backend is None and cls._BACKEND_KIND != 'none':
             try:
-                # Soporte para bases de datos nombradas (no default)
-                if cls._DB_NAME:
-                    cls._firestore_client = firestore.Client(database=cls._DB_NAME)
-                else:
-                    cls._firestore_client = firestore.Client()
+                cls._backend = create_backend(cls._BACKEND_KIND)
+                cls._replay_spool()
             except Exception as e:
-                print(f"❌ SESSION ERROR: No se pudo conectar a Firestore: {e}")
-                cls._firestore_client = None
-        return cls._firestore_client
+                print(f"❌ SESSION ERROR: No se pudo iniciar el backend '{cls._BACKEND_KIND}': {e}")
+                cls._backend = None
+        return cls._backend
+
+    @classmethod
+    def connect(cls) -> bool:
+        """Abre el backend por adelantado (warm-up de arranque)."""
+        return cls._get_backend() is not None
 
     @classmethod
     def add_message(cls, chat_id: int | str, message_data: dict[str, Any]) -> None:
         """
-        Guarda un mensaje en la subcolección 'messages'.
-        
+        Encola un mensaje del chat (persistencia diferida).
+
         Args:
             chat_id: ID del chat (positivo=privado, negativo=grupo).
             message_data: Diccionario con 'role', 'content', 'user_id', 'name', 'message_id'.
         """
-        db = cls._get_db()
-        if not db:
+        if cls._BACKEND_KIND == 'none':
             return
 
         cid = str(chat_id)
-        
-        # 1. Actualizar metadatos de la sesión padre (Upsert)
-        # Se asume que 'sessions' es la colección raíz
-        session_ref = db.collection('sessions').document(cid)
-        session_ref.set({
-            'last_activity': firestore.SERVER_TIMESTAMP,
-            'type': 'group' if cid.startswith('-') else 'private' 
-        }, merge=True)
-
-        # 2. Preparar el payload del mensaje
+
         # Convertimos message_id a string para usarlo como ID de documento
         msg_id_raw = message_data.get('message_id', '')
         msg_id_str = str(msg_id_raw)
-        
+
         doc_data = {
             'message_id': msg_id_raw,  # Guardamos el valor original (int o str)
             'role': message_data.get('role', 'unknown'),
             'content': message_data.get('content', ''),
-            'timestamp': firestore.SERVER_TIMESTAMP,
+            # Hora de cliente al encolar: varios mensajes del mismo batch no pueden
+            # compartir SERVER_TIMESTAMP sin perder el orden de la conversación
+            'timestamp': datetime.now(timezone.utc),
             'sender_id': str(message_data.get('user_id', '')),
             'name': message_data.get('name', 'Unknown')
         }
 
+        with cls._buffer_lock:
+            cls._pending.append((cid, msg_id_str, doc_data))
+            full = len(cls._pending) >= cls._FLUSH_MAX_BATCH
+        cls._remember(cid, doc_data)
+        cls._ensure_flusher()
+        if full:
+            cls._wakeup.set()
+
+    @classmethod
+    def _ensure_flusher(cls):
+        if cls._flusher is None or not cls._flusher.is_alive():
+            with cls._buffer_lock:
+                if cls._flusher is None or not cls._flusher.is_alive():
+                    cls._closed = False
+                    cls._flusher = threading.Thread(target=cls._flush_loop, name="session-flusher", daemon=True)
+                    cls._flusher.start()
+
+    @classmethod
+    def _flush_loop(cls):
+        while not cls._closed:
+            cls._wakeup.wait(timeout=cls._FLUSH_INTERVAL)
+            cls._wakeup.clear()
+            cls.flush()
+
+    @classmethod
+    def flush(cls) -> bool:
+        """
+        Escribe todo lo pendiente en un único lote del backend.
+        El 'last_activity' de cada sesión padre se actualiza una sola vez por flush.
+        Devuelve False si no se pudo escribir (lo pendiente vuelve a la cola).
+        """
+        with cls._flush_lock:
+            with cls._buffer_lock:
+                pending, cls._pending = cls._pending, []
+            if not pending:
+                return True
+
+            backend = cls._get_backend()
+            if not backend:
+                cls._requeue(pending)
+                return False
+
+            try:
+                backend.write_batch(pending)
+                return True
+            except Exception as e:
+                print(f"⚠️ Error guardando mensajes de sesión: {e}")
+                # Un lote parcialmente escrito se reintenta entero: las escrituras son idempotentes
+                cls._requeue(pending)
+                return False
+
+    @classmethod
+    def _requeue(cls, pending: list[tuple[str, str, dict[str, Any]]]):
+        with cls._buffer_lock:
+            cls._pending = pending + cls._pending
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        Apagado ordenado: detiene el hilo y hace el último flush.
+        Si el backend no responde, lo pendiente se guarda en el spool local.
+        """
+        cls._closed = True
+        cls._wakeup.set()
+        if cls._flusher is not None:
+            cls._flusher.join(timeout=cls._FLUSH_INTERVAL + 5)
+        if not cls.flush():
+            cls._write_spool()
+        if cls._backend is not None:
+            cls._backend.close()
+            cls._backend = None
+
+    @classmethod
+    def _write_spool(cls):
+        with cls._buffer_lock:
+            pending, cls._pending = cls._pending, []
+        if not pending:
+            return
+        try:
+            cls._SPOOL_PATH.parent.mkdir(parents=True, exist_ok=True)
+            with open(cls._SPOOL_PATH, 'a', encoding='utf-8') as spool:
+                for cid, msg_id_str, doc_data in pending:
+                    record = {**doc_data, 'timestamp': doc_data['timestamp'].isoformat()}
+                    spool.write(json.dumps({'chat_id': cid, 'doc_id': msg_id_str, 'data': record}) + "\n")
+            print(f"💾 {len(pending)} mensajes pendientes guardados en {cls._SPOOL_PATH}")
+        except OSError as e:
+            print(f"❌ SESSION ERROR: Se pierden {len(pending)} mensajes, spool no disponible: {e}")
+
+    @classmethod
+    def _replay_spool(cls):
+        """Re-encola los mensajes que quedaron en el spool en el último apagado."""
+        if not cls._SPOOL_PATH.exists():
+            return
         try:
-            # Usamos el ID de Telegram como ID del documento para idempotencia
-            if msg_id_str:
-                session_ref.collection('messages').document(msg_id_str).set(doc_data)
+            replayed = []
+            with open(cls._SPOOL_PATH, 'r', encoding='utf-8') as spool:
+                for line in spool:
+                    record = json.loads(line)
+                    data = record['data']
+                    data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+                    replayed.append((record['chat_id'], record['doc_id'], data))
+            cls._SPOOL_PATH.unlink()
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Spool de sesiones ilegible ({cls._SPOOL_PATH}): {e}")
+            return
+        cls._requeue(replayed)
+        cls._ensure_flusher()
+        print(f"♻️ {len(replayed)} mensajes recuperados del spool de sesiones")
+
+    @classmethod
+    def _pending_for(cls, cid: str) -> list[dict[str, Any]]:
+        with cls._buffer_lock:
+            return [doc_data for pending_cid, _, doc_data in cls._pending if pending_cid == cid]
+
+    @staticmethod
+    def _format(data: dict[str, Any]) -> dict[str, Any]:
+        return {
+            "message_id": data.get("message_id"),
+            "role": data.get("role"),
+            "name": data.get("name"),
+            "content": data.get("content")
+        }
+
+    @staticmethod
+    def _merge(*sources: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Concatena listas de mensajes en orden, sin repetir message_id."""
+        seen = set()
+        merged = []
+        for source in sources:
+            for message in source:
+                message_id = message.get("message_id")
+                if message_id in seen:
+                    continue
+                seen.add(message_id)
+                merged.append(message)
+        return merged
+
+    @classmethod
+    def _remember(cls, cid: str, doc_data: dict[str, Any]):
+        """
+        Añade el mensaje al ring buffer del chat si ese chat ya está caliente
+        (o lo aparta si se está calentando, ver get_context).
+        """
+        with cls._history_lock:
+            history = cls._history.get(cid)
+            if history is not None:
+                history.append(cls._format(doc_data))
+                cls._history.move_to_end(cid)
+            elif cid in cls._warming:
+                cls._warming[cid].append(cls._format(doc_data))
+
+    @classmethod
+    def forget(cls, chat_id: int | str | None = None) -> None:
+        """Invalida el historial cacheado de un chat (o de todos)."""
+        with cls._history_lock:
+            if chat_id is None:
+                cls._history.clear()
+                cls._summaries.clear()
             else:
-                # Fallback seguro si no hay ID (no debería ocurrir en Telegram)
-                session_ref.collection('messages').add(doc_data)
+                cls._history.pop(str(chat_id), None)
+                cls._summaries.pop(str(chat_id), None)
+
+    @classmethod
+    def get_summary(cls, chat_id: int | str) -> dict[str, Any] | None:
+        """Resumen rodante de los turnos antiguos ({'summary', 'upto'}), cacheado en memoria."""
+        cid = str(chat_id)
+        with cls._history_lock:
+            if cid in cls._summaries:
+                cls._summaries.move_to_end(cid)
+                return cls._summaries[cid]
+
+        backend = cls._get_backend()
+        if not backend:
+            return None
+        try:
+            summary = backend.get_summary(cid)
         except Exception as e:
-            print(f"⚠️ Error guardando mensaje en Firestore: {e}")
+            print(f"⚠️ Error recuperando resumen: {e}")
+            return None
+        cls._cache_summary(cid, summary)
+        return summary
+
+    @classmethod
+    def set_summary(cls, chat_id: int | str, summary: str, upto: Any) -> None:
+        """Guarda el resumen (escritura directa: ocurre una vez cada varios turnos)."""
+        cid = str(chat_id)
+        backend = cls._get_backend()
+        if not backend:
+            return
+        try:
+            backend.set_summary(cid, summary, upto)
+        except Exception as e:
+            print(f"⚠️ Error guardando resumen: {e}")
+            return
+        cls._cache_summary(cid, {'summary': summary, 'upto': upto})
+
+    @classmethod
+    def _cache_summary(cls, cid: str, summary: dict[str, Any] | None):
+        with cls._history_lock:
+            cls._summaries[cid] = summary
+            cls._summaries.move_to_end(cid)
+            while len(cls._summaries) > cls._CACHE_CHATS:
+                cls._summaries.popitem(last=False)
 
     @classmethod
     def get_context(cls, chat_id: int | str, limit: int = 15) -> list[dict[str, Any]]:
         """
         Recupera el historial reciente formateado para el LLM.
         Devuelve lista en orden cronológico (Oldest -> Newest).
+        Se sirve del ring buffer en memoria; el backend solo se consulta en frío.
         """
-        db = cls._get_db()
-        if not db:
+        if not cls._get_backend():
             return []
 
         cid = str(chat_id)
-        messages: list[dict[str, Any]] = []
+        if limit > cls._CACHE_MESSAGES:
+            # Más de lo que cabe en el buffer: consulta directa sin cachear
+            return cls._fetch_context(cid, limit)
 
-        try:
-            # Consulta: Los N más recientes (orden Descendente por tiempo)
-            docs = (
-                db.collection('sessions')
-                .document(cid)
-                .collection('messages')
-                .order_by('timestamp', direction=firestore.Query.DESCENDING)
-                .limit(limit)
-                .stream()
-            )
-
-            # Iteramos y formateamos
-            for doc in docs:
-                data = doc.to_dict()
-                messages.append({
-                    "message_id": data.get("message_id"),
-                    "role": data.get("role"),
-                    "name": data.get("name"),
-                    "content": data.get("content")
-                })
-            
-            # Invertimos la lista para que el LLM lea la conversación en orden natural
-            return messages[::-1]
+        with cls._history_lock:
+            history = cls._history.get(cid)
+            if history is not None:
+                cls._history.move_to_end(cid)
+                return list(history)[-limit:]
+            # Desde aquí add_message aparta los mensajes del chat: si el flusher escribe
+            # uno después de la consulta ya no estaría ni en el backend ni en lo pendiente
+            cls._warming.setdefault(cid, [])
 
+        messages = cls._fetch_context(cid, cls._CACHE_MESSAGES)
+        with cls._history_lock:
+            arrived = cls._warming.pop(cid, [])
+            history = cls._history.get(cid)
+            if history is None:
+                history = deque(cls._merge(messages, arrived), maxlen=cls._CACHE_MESSAGES)
+                cls._history[cid] = history
+            cls._history.move_to_end(cid)
+            while len(cls._history) > cls._CACHE_CHATS:
+                cls._history.popitem(last=False)
+            return list(history)[-limit:]
+
+    @classmethod
+    def _fetch_context(cls, cid: str, limit: int) -> list[dict[str, Any]]:
+        """Consulta el backend e incluye lo aún no escrito (read-your-writes)."""
+        backend = cls._get_backend()
+        if not backend:
+            return []
+
+        # Lo pendiente se lee antes de consultar (lo que el flusher escriba mientras
+        # tanto no se pierde) y otra vez después (lo encolado durante la consulta)
+        pending_before = cls._pending_for(cid)
+        try:
+            stored = backend.fetch_recent(cid, limit)
         except Exception as e:
             print(f"⚠️ Error recuperando contexto: {e}")
-            return []
\ No newline at end of file
+            stored = []
+
+        # Lo pendiente es siempre posterior a lo ya escrito; evitamos duplicados por message_id
+        messages = cls._merge(stored, pending_before, cls._pending_for(cid))
+
+        # Ya está en orden natural para que el LLM lea la conversación
+        return [cls._format(data) for data in messages[-limit:]]
+
+# Último flush si el proceso termina sin pasar por el shutdown del bot
+atexit.register(SessionManager.close)
@@ -0,0 +1,69 @@
+'''
+Vectores dispersos BM25 calculados en local (sin modelo ni llamada de red).
+Complementan al embedding denso en lo que este pierde: nombres propios,
+cantidades, marcas... tokens que tienen que coincidir literalmente.
+
+El lado documento lleva la saturación de TF y la normalización por longitud de
+BM25; el IDF lo aplica Qdrant (Modifier.IDF) con las estadísticas de la colección,
+así que no hay vocabulario que mantener aquí. Los términos se indexan por hash.
+'''
+import os
+import zlib
+from collections import Counter
+
+from qdrant_client import models
+
+from src.fast_router import tokenize
+
+K1 = float(os.getenv("BM25_K1", 1.2))
+B = float(os.getenv("BM25_B", 0.75))
+# Los recuerdos son frases cortas: longitud media aproximada en tokens
+AVG_DOC_LENGTH = float(os.getenv("BM25_AVG_DOC_LENGTH", 20))
+
+_STOPWORDS = {
+    # es
+    "de", "la", "que", "el", "en", "y", "a", "los", "se", "del", "las", "un", "por", "con", "no",
+    "una", "su", "para", "es", "al", "lo", "como", "mas", "o", "pero", "sus", "le", "ha", "me",
+    "si", "sin", "sobre", "este", "ya", "entre", "cuando", "todo", "esta", "ser", "son",
+    "tambien", "fue", "habia", "era", "muy", "hasta", "desde", "mi", "porque", "cual",
+    "yo", "tu", "te", "nos", "les", "eso", "esto", "hay", "donde", "quien", "e", "u",
+    # en
+    "the", "of", "and", "to", "in", "is", "it", "that", "for", "on", "with", "as", "was", "be",
+    "at", "by", "an", "this", "are", "or", "from", "i", "you", "my", "we", "our",
+}
+
+
+def _terms(text: str) -> list[str]:
+    return [token for token in tokenize(text) if token not in _STOPWORDS]
+
+
+def _index(term: str) -> int:
+    # crc32 cabe en el uint32 de Qdrant; una colisión solo suma dos términos raros
+    return zlib.crc32(term.encode("utf-8"))
+
+
+def _sparse(weights: dict[int, float]) -> models.SparseVector:
+    indices = sorted(weights)
+    return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def encode_document(text: str) -> models.SparseVector:
+    """Pesos BM25 (sin IDF) de cada término del texto."""
+    counts = Counter(_terms(text))
+    length = sum(counts.values())
+    norm = K1 * (1 - B + B * length / AVG_DOC_LENGTH)
+    weights: dict[int, float] = {}
+    for term, tf in counts.items():
+        index = _index(term)
+        weights[index] = weights.get(index, 0.0) + tf * (K1 + 1) / (tf + norm)
+    return _sparse(weights)
+
+
+def encode_query(text: str) -> models.SparseVector:
+    """Cada término de la consulta cuenta una vez; Qdrant pondera por IDF."""
+    return _sparse({_index(term): 1.0 for term in set(_terms(text))})
+
+
+def is_empty(vector: models.SparseVector) -> bool:
+    return not vector.indices
+
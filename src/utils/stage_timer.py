@@ -0,0 +1,32 @@
+import time
+from collections.abc import Awaitable
+from typing import TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Duración de cada etapa de un turno, también de las que corren en paralelo.
+    `total` es el tiempo de reloj del turno: con etapas concurrentes es la ruta
+    crítica, no la suma de las etapas.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.durations: dict[str, float] = {}
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[stage] = time.perf_counter() - start
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self._start
+
+    def summary(self) -> str:
+        stages = " ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in self.durations.items())
+        return f"{stages} | total={self.total * 1000:.0f}ms (suma etapas={sum(self.durations.values()) * 1000:.0f}ms)"
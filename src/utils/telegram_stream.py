@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import threading
+
+from telegram import Bot, Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Límite de Telegram por mensaje
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TelegramStreamEditor:
+    """
+    Muestra la respuesta del agente mientras se genera:
+    envía un primer mensaje con los primeros tokens y lo va editando
+    como mucho una vez cada `min_interval` segundos (rate limit de ediciones).
+
+    `push()` es thread-safe: lo llama el Crew desde su hilo de trabajo.
+    El resto corre en el event loop del bot.
+    """
+
+    def __init__(self, bot: Bot, chat_id: int, header: str = "", min_interval: float = 1.5):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.header = header
+        self.min_interval = min_interval
+
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._chunks: list[str] = []
+        self._new_data = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._done = False
+        self._message: Message | None = None
+        self._last_rendered = ""
+        self._task = asyncio.create_task(self._run())
+
+    # --- LADO HILO (Crew) ---
+
+    def push(self, chunk: str):
+        if not chunk:
+            return
+        with self._lock:
+            self._chunks.append(chunk)
+        self._loop.call_soon_threadsafe(self._new_data.set)
+
+    # --- LADO EVENT LOOP ---
+
+    def _render(self) -> str:
+        with self._lock:
+            body = "".join(self._chunks)
+        text = f"{self.header}{body}"
+        if len(text) > MAX_MESSAGE_LENGTH:
+            text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+        return text
+
+    async def _run(self):
+        while not self._done:
+            await self._new_data.wait()
+            self._new_data.clear()
+            if self._done:
+                break
+            try:
+                await self._flush()
+            except Exception as e:
+                # Un fallo en un parcial no debe tumbar la respuesta final
+                logger.warning(f"Edición parcial fallida: {e}")
+            # Throttling: las ediciones intermedias no superan el rate limit
+            try:
+                await asyncio.wait_for(self._closing.wait(), timeout=self.min_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _flush(self, text: str | None = None, parse_mode: str | None = None):
+        text = text or self._render()
+        if not text.strip() or (text == self._last_rendered and parse_mode is None):
+            return
+        try:
+            if self._message is None:
+                self._message = await self.bot.send_message(
+                    chat_id=self.chat_id, text=text, parse_mode=parse_mode
+                )
+            else:
+                await self._message.edit_text(text=text, parse_mode=parse_mode)
+            self._last_rendered = text
+        except RetryAfter as e:
+            logger.warning(f"Telegram rate limit en streaming, esperando {e.retry_after}s")
+            await asyncio.sleep(float(e.retry_after))
+            await self._flush(text, parse_mode)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+
+    async def finish(self, final_text: str, parse_mode: str | None = 'Markdown') -> Message:
+        """
+        Cierra el stream y deja el mensaje con el texto definitivo (ya con formato).
+        Los parciales van en texto plano porque el Markdown a medias no es válido.
+        """
+        await self.abort()
+
+        try:
+            await self._flush(final_text, parse_mode=parse_mode)
+        except BadRequest as e:
+            logger.warning(f"Formato rechazado por Telegram, reenviando en texto plano: {e}")
+            await self._flush(final_text)
+
+        if self._message is None:
+            self._message = await self.bot.send_message(chat_id=self.chat_id, text=final_text)
+        return self._message
+
+    async def abort(self):
+        """Detiene las ediciones pendientes (p.ej. si el Crew falla)."""
+        self._done = True
+        self._closing.set()
+        self._new_data.set()
+        await self._task
@@ -0,0 +1,96 @@
+import asyncio
+import json
+import logging
+import signal
+
+import tornado.web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    """Estado del warm-up: el bot no acepta updates hasta que `ready` es True."""
+
+    def __init__(self):
+        self.ready = False
+        # Resultado de cada paso del warm-up, expuesto en /ready
+        self.checks: dict[str, str] = {}
+
+
+class _TelegramHandler(tornado.web.RequestHandler):
+    def initialize(self, bot_app: Application, readiness: Readiness, secret_token: str | None):
+        self.bot_app = bot_app
+        self.readiness = readiness
+        self.secret_token = secret_token
+
+    async def post(self):
+        if self.secret_token and self.request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret_token:
+            raise tornado.web.HTTPError(403)
+        if not self.readiness.ready:
+            # Telegram reintenta el update más tarde: no se pierde
+            raise tornado.web.HTTPError(503)
+        update = Update.de_json(json.loads(self.request.body), self.bot_app.bot)
+        await self.bot_app.update_queue.put(update)
+
+
+class _LivenessHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.write({"status": "alive"})
+
+
+class _ReadinessHandler(tornado.web.RequestHandler):
+    def initialize(self, readiness: Readiness):
+        self.readiness = readiness
+
+    def get(self):
+        self.set_status(200 if self.readiness.ready else 503)
+        self.write({"ready": self.readiness.ready, "checks": self.readiness.checks})
+
+
+async def _serve(application: Application, readiness: Readiness, listen: str, port: int,
+                 url_path: str, webhook_url: str, secret_token: str | None):
+    web_app = tornado.web.Application([
+        (rf"/{url_path}/?", _TelegramHandler,
+         {"bot_app": application, "readiness": readiness, "secret_token": secret_token}),
+        (r"/healthz", _LivenessHandler),
+        (r"/ready", _ReadinessHandler, {"readiness": readiness}),
+    ])
+    # Escuchamos antes del warm-up: Cloud Run ve el puerto abierto y /ready responde 503
+    server = web_app.listen(port, address=listen)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await application.initialize()
+        if application.post_init:
+            # El warm-up vive en post_init: igual que en modo polling
+            await application.post_init(application)
+        await application.start()
+        await application.bot.set_webhook(
+            url=webhook_url, allowed_updates=Update.ALL_TYPES, secret_token=secret_token
+        )
+        readiness.ready = True
+        logger.info("✅ Bot listo para recibir updates.")
+        await stop.wait()
+    finally:
+        readiness.ready = False
+        server.stop()
+        if application.running:
+            await application.stop()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
+
+
+def run_webhook(application: Application, readiness: Readiness, *, listen: str, port: int,
+                url_path: str, webhook_url: str, secret_token: str | None = None):
+    """
+    Equivalente a Application.run_webhook con dos rutas extra para Cloud Run:
+    /healthz (vivo) y /ready (warm-up completado, con el resultado de cada check).
+    """
+    asyncio.run(_serve(application, readiness, listen, port, url_path, webhook_url, secret_token))
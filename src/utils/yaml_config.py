@@ -0,0 +1,61 @@
+import logging
+import os
+import threading
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadableYamlConfig:
+    """
+    YAML de configuración que se recarga solo cuando cambia su mtime.
+    El parseo y el post-procesado (`build`) ocurren fuera del camino caliente y
+    el resultado se publica con una única asignación (swap atómico): los lectores
+    ven siempre la versión anterior completa o la nueva completa.
+    Si el YAML nuevo es inválido se mantiene la última versión buena.
+    """
+
+    def __init__(self, path: str, build=None):
+        self.path = path
+        self._build = build or (lambda data: data)
+        self._lock = threading.Lock()
+        self._signature: tuple[int, int] | None = None
+        self._value = None
+        self.generation = 0
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encuentra la configuración en {path}")
+        self.get()
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Fichero movido durante un deploy: servimos la última versión buena
+            return self._value
+
+        # mtime + tamaño: detecta también escrituras a medias dentro del mismo tick
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._reload(signature)
+        return self._value
+
+    def _reload(self, signature: tuple[int, int]):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                value = self._build(yaml.safe_load(file))
+        except Exception as e:
+            if self._value is None:
+                raise
+            logger.error(f"❌ Config inválida en {self.path}, se mantiene la anterior: {e}")
+            self._signature = signature
+            return
+
+        self._value = value
+        self._signature = signature
+        self.generation += 1
+        if self.generation > 1:
+            logger.info(f"🔄 Configuración recargada: {self.path} (v{self.generation})")
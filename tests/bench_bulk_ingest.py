@@ -0,0 +1,52 @@
+'''
+Benchmark de ingesta: bucle de add_memory vs add_memories (batch).
+Requiere Qdrant y LiteLLM levantados (docker-compose up).
+
+Uso: python -m tests.bench_bulk_ingest [N]
+'''
+import sys
+import time
+import uuid
+
+from src.memory_manager import VectorMemoryManager
+from src.schemas.memory import EpisodicMemoryItem, EpisodicMemoryMetadata
+
+BENCH_COLLECTION = "bench_bulk_ingest"
+
+
+def _make_items(n: int) -> list[EpisodicMemoryItem]:
+    # Textos únicos por ejecución para que el cache de embeddings no falsee la medida
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        EpisodicMemoryItem(
+            content=f"[{run_id}] Recuerdo de prueba número {i}: el usuario compró {i} kg de arroz.",
+            metadata=EpisodicMemoryMetadata(domain="finance", type="fact", source="document_import"),
+        )
+        for i in range(n)
+    ]
+
+
+def run_benchmark(n: int = 50):
+    manager = VectorMemoryManager(collection_name=BENCH_COLLECTION)
+    try:
+        items = _make_items(n)
+        start = time.perf_counter()
+        for item in items:
+            manager.add_memory(item)
+        loop_elapsed = time.perf_counter() - start
+
+        items = _make_items(n)
+        start = time.perf_counter()
+        manager.add_memories(items)
+        batch_elapsed = time.perf_counter() - start
+
+        print(f"\n📊 Ingesta de {n} recuerdos")
+        print(f"   - Bucle add_memory : {n / loop_elapsed:8.1f} items/s ({loop_elapsed:.2f}s)")
+        print(f"   - add_memories     : {n / batch_elapsed:8.1f} items/s ({batch_elapsed:.2f}s)")
+        print(f"   - Speedup          : x{loop_elapsed / batch_elapsed:.1f}")
+    finally:
+        manager._client.delete_collection(collection_name=BENCH_COLLECTION)
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,120 @@
+'''
+Benchmark de perfiles de la colección de memoria (HNSW / cuantización / disco).
+Por perfil: recall@k frente a la búsqueda exacta, latencia p50/p95 y RSS del
+proceso Qdrant (métrica memory_resident_bytes de /metrics).
+Requiere el Qdrant de docker-compose (QDRANT_HOST=localhost); no usa LiteLLM:
+los vectores son sintéticos (agrupados, como los embeddings reales).
+
+Uso: python -m tests.bench_collection_profiles [N] [perfil ...]
+'''
+import statistics
+import sys
+import time
+
+import numpy as np
+import requests
+from qdrant_client import QdrantClient, models
+
+from src.utils.backend_clients import BackendClients
+from src.utils.collection_profile import PROFILES
+
+BENCH_COLLECTION = "bench_collection_profiles"
+DIM = 768
+K = 10
+QUERIES = 200
+UPSERT_BATCH = 512
+INDEX_TIMEOUT = 300
+
+
+def _make_vectors(n: int, rng: np.random.Generator) -> np.ndarray:
+    centers = rng.normal(size=(max(n // 200, 1), DIM))
+    vectors = centers[rng.integers(len(centers), size=n)] + 0.6 * rng.normal(size=(n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _rss_mb() -> float | None:
+    kwargs = BackendClients.qdrant_connection_kwargs()
+    base = kwargs.get("url") or f"http://{kwargs['host']}:{kwargs['port']}"
+    try:
+        response = requests.get(f"{base}/metrics", timeout=5)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    for line in response.text.splitlines():
+        if line.startswith("memory_resident_bytes"):
+            return float(line.split()[-1]) / 1024 / 1024
+    return None
+
+
+def _wait_indexed(client: QdrantClient):
+    deadline = time.monotonic() + INDEX_TIMEOUT
+    while time.monotonic() < deadline:
+        if client.get_collection(BENCH_COLLECTION).status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(0.5)
+    print(f"   ⚠️ Índice sin terminar tras {INDEX_TIMEOUT}s: se mide igualmente")
+
+
+def _bench_profile(client: QdrantClient, name: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray) -> dict:
+    profile = PROFILES[name]
+    if client.collection_exists(BENCH_COLLECTION):
+        client.delete_collection(BENCH_COLLECTION)
+    rss_before = _rss_mb()
+
+    client.create_collection(BENCH_COLLECTION, **profile.collection_config(size=DIM, distance=models.Distance.COSINE))
+    starts = range(0, len(vectors), UPSERT_BATCH)
+    for start in starts:
+        client.upsert(
+            collection_name=BENCH_COLLECTION,
+            points=models.Batch(
+                ids=list(range(start, min(start + UPSERT_BATCH, len(vectors)))),
+                vectors=vectors[start:start + UPSERT_BATCH].tolist()
+            ),
+            wait=start == starts[-1]
+        )
+    _wait_indexed(client)
+
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = client.query_points(
+            collection_name=BENCH_COLLECTION,
+            query=query.tolist(),
+            limit=K,
+            search_params=profile.search_params()
+        )
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({point.id for point in result.points} & set(expected.tolist())) / K)
+
+    rss_after = _rss_mb()
+    client.delete_collection(BENCH_COLLECTION)
+    return {
+        "recall": statistics.mean(recalls),
+        "p50": statistics.median(latencies) * 1000,
+        "p95": statistics.quantiles(latencies, n=20)[-1] * 1000,
+        "rss": rss_after,
+        "rss_delta": rss_after - rss_before if rss_after is not None and rss_before is not None else None,
+    }
+
+
+def run_benchmark(n: int = 20000, names: list[str] | None = None):
+    names = names or list(PROFILES)
+    rng = np.random.default_rng(42)
+    vectors = _make_vectors(n, rng)
+    queries = _make_vectors(QUERIES, rng)
+    # Verdad de referencia: coseno exacto (vectores normalizados -> producto escalar)
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :K]
+
+    client = QdrantClient(**BackendClients.qdrant_connection_kwargs())
+    print(f"\n📊 {n} vectores de {DIM} dims, {QUERIES} consultas, recall@{K}")
+    print(f"   {'perfil':<10} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8} {'Δ RSS MB':>9}")
+    for name in names:
+        r = _bench_profile(client, name, vectors, queries, truth)
+        rss = f"{r['rss']:8.0f}" if r["rss"] is not None else f"{'n/d':>8}"
+        delta = f"{r['rss_delta']:9.0f}" if r["rss_delta"] is not None else f"{'n/d':>9}"
+        print(f"   {name:<10} {r['recall']:7.3f} {r['p50']:8.2f} {r['p95']:8.2f} {rss} {delta}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    run_benchmark(int(args[0]) if args else 20000, args[1:] or None)
@@ -0,0 +1,94 @@
+'''
+Benchmark de cold start: coste de imports (python -X importtime) y tiempo hasta
+poder responder al primer mensaje (imports + construcción de agentes, sin red).
+No necesita Telegram, Qdrant ni LiteLLM: usa un TELEGRAM_TOKEN ficticio.
+
+Uso: python -m tests.bench_import_time [RUNS] [--budget-ms N]
+     (--budget-ms hace fallar el script si "import main" supera N ms)
+'''
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+TOP_N = 15
+
+# Lo que hace el warm-up antes del primer mensaje, sin tocar la red
+FIRST_RESPONSE_SNIPPET = """
+import time
+start = time.perf_counter()
+import main
+ready = time.perf_counter()
+main.get_orchestrator()
+print(f"{(ready - start) * 1000:.1f} {(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("TELEGRAM_TOKEN", "0:bench")
+    env.setdefault("FAST_ROUTER_EMBEDDINGS", "false")
+    return env
+
+
+def _importtime(module: str) -> list[tuple[str, int, int, int]]:
+    """(módulo, self µs, acumulado µs, sangría) para cada import de un proceso nuevo."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent)))
+    return rows
+
+
+def _first_response() -> tuple[float, float]:
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_RESPONSE_SNIPPET],
+        capture_output=True, text=True, env=_env(), check=True
+    )
+    import_ms, ready_ms = result.stdout.strip().splitlines()[-1].split()
+    return float(import_ms), float(ready_ms)
+
+
+def run_benchmark(runs: int = 3, budget_ms: float | None = None) -> int:
+    totals = []
+    for _ in range(runs):
+        rows = _importtime("main")
+        totals.append(next(cumulative for name, _, cumulative, _ in rows if name == "main") / 1000)
+
+    # Sangría 3 = imports hechos directamente por `main` (sin duplicar sus hijos)
+    top_level = sorted(
+        ((name, cumulative) for name, _, cumulative, indent in rows if indent == 3),
+        key=lambda row: row[1], reverse=True
+    )
+
+    print(f"\n📦 import main (mediana de {runs}): {statistics.median(totals):8.1f} ms")
+    print(f"   Top {TOP_N} imports directos (acumulado):")
+    for name, cumulative in top_level[:TOP_N]:
+        print(f"   - {name:<40} {cumulative / 1000:8.1f} ms")
+
+    samples = [_first_response() for _ in range(runs)]
+    print(f"\n⏱️  Bot escuchando (import main)   : {statistics.median(s[0] for s in samples):8.1f} ms")
+    print(f"⏱️  Listo para responder (+agentes): {statistics.median(s[1] for s in samples):8.1f} ms")
+
+    if budget_ms is not None and statistics.median(totals) > budget_ms:
+        print(f"\n❌ import main supera el presupuesto de {budget_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    budget = None
+    if "--budget-ms" in args:
+        i = args.index("--budget-ms")
+        budget = float(args[i + 1])
+        del args[i:i + 2]
+    sys.exit(run_benchmark(int(args[0]) if args else 3, budget))
@@ -0,0 +1,78 @@
+'''
+Benchmark de backends de sesión: SQLite local vs Firestore.
+Firestore solo se mide si FIRESTORE_EMULATOR_HOST apunta al emulador
+(gcloud emulators firestore start --host-port=localhost:8080).
+
+Uso: python -m tests.bench_session_backends [N]
+'''
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.utils.session_backends import FirestoreSessionBackend, SQLiteSessionBackend
+
+BATCH_SIZE = 20
+CONTEXT_LIMIT = 15
+
+
+def _records(chat_id: str, n: int):
+    start = datetime.now(timezone.utc)
+    return [
+        (chat_id, str(i), {
+            'message_id': i,
+            'role': 'user' if i % 2 == 0 else 'assistant',
+            'content': f"Mensaje de prueba número {i} sobre la compra semanal.",
+            'timestamp': start + timedelta(milliseconds=i),
+            'sender_id': '1',
+            'name': 'Bench',
+        })
+        for i in range(n)
+    ]
+
+
+def _measure(name: str, backend, n: int):
+    chat_id = f"bench-{uuid.uuid4().hex[:8]}"
+    records = _records(chat_id, n)
+
+    start = time.perf_counter()
+    for i in range(0, n, BATCH_SIZE):
+        backend.write_batch(records[i:i + BATCH_SIZE])
+    write_elapsed = time.perf_counter() - start
+
+    reads = []
+    for _ in range(min(n, 200)):
+        start = time.perf_counter()
+        backend.fetch_recent(chat_id, CONTEXT_LIMIT)
+        reads.append(time.perf_counter() - start)
+    reads.sort()
+
+    print(f"\n📊 {name}")
+    print(f"   - Escritura     : {n / write_elapsed:9.1f} msgs/s (lotes de {BATCH_SIZE})")
+    print(f"   - Lectura p50   : {statistics.median(reads) * 1000:9.3f} ms (últimos {CONTEXT_LIMIT})")
+    print(f"   - Lectura p95   : {reads[int(len(reads) * 0.95) - 1] * 1000:9.3f} ms")
+
+
+def run_benchmark(n: int = 500):
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteSessionBackend(os.path.join(tmp, "sessions.sqlite3"))
+        try:
+            _measure("SQLite (WAL)", backend, n)
+        finally:
+            backend.close()
+
+    if os.getenv('FIRESTORE_EMULATOR_HOST'):
+        backend = FirestoreSessionBackend()
+        try:
+            _measure(f"Firestore (emulador {os.environ['FIRESTORE_EMULATOR_HOST']})", backend, n)
+        finally:
+            backend.close()
+    else:
+        print("\n⏭️  Firestore omitido: define FIRESTORE_EMULATOR_HOST para compararlo.")
+
+
+if __name__ == "__main__":
+    run_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,70 @@
+'''
+Fixtures compartidas de los tests de memoria episódica (sin Qdrant ni LiteLLM).
+Los managers guardan cliente, colecciones preparadas y contadores a nivel de clase:
+cada test parte de un estado limpio y Qdrant en memoria.
+'''
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from qdrant_client import QdrantClient
+
+from src.memory_manager import AsyncVectorMemoryManager, VectorMemoryManager
+from src.schemas.memory import EpisodicMemoryItem, EpisodicMemoryMetadata
+
+EMBEDDING_SIZE = 768
+
+
+@pytest.fixture
+def memory_manager(monkeypatch):
+    """
+    Fábrica de VectorMemoryManager aislado: memory_manager(collection, embed_fn).
+    `embed_fn(texts)` devuelve vectores cortos; se rellenan hasta EMBEDDING_SIZE.
+    """
+    monkeypatch.setattr(VectorMemoryManager, "_client", QdrantClient(":memory:"))
+    monkeypatch.setattr(VectorMemoryManager, "_ready_collections", set())
+    monkeypatch.setattr(VectorMemoryManager, "_hybrid_collections", set())
+    monkeypatch.setattr(VectorMemoryManager, "_dedup_stats", Counter())
+    monkeypatch.setattr(VectorMemoryManager, "_embedding_cache", None)
+    monkeypatch.setattr(VectorMemoryManager, "_embedding_client", None)
+    monkeypatch.setattr(VectorMemoryManager, "_initialize_embedding_cache", classmethod(lambda cls: None))
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_client", None)
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_ready_collections", set())
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_hybrid_collections", set())
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_collection_locks", {})
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_embedder", None)
+    monkeypatch.setattr(AsyncVectorMemoryManager, "_owns_embedder", False)
+
+    def build(collection: str, embed_fn=lambda texts: [[1.0] for _ in texts]) -> VectorMemoryManager:
+        def fake_embeddings(cls, texts):
+            return [vector + [0.0] * (EMBEDDING_SIZE - len(vector)) for vector in embed_fn(texts)]
+
+        monkeypatch.setattr(VectorMemoryManager, "_get_embeddings", classmethod(fake_embeddings))
+        return VectorMemoryManager(collection_name=collection)
+
+    return build
+
+
+def make_item(
+    content: str,
+    domain: str = "finance",
+    type: str = "fact",
+    tags: str | None = None,
+    created_by: str | None = None,
+    age_days: int | None = None,
+) -> EpisodicMemoryItem:
+    extra = {}
+    if age_days is not None:
+        extra["created_at"] = (datetime.now() - timedelta(days=age_days)).isoformat()
+    return EpisodicMemoryItem(
+        content=content,
+        metadata=EpisodicMemoryMetadata(domain=domain, type=type, source="user_chat", context_tags=tags),
+        created_by=created_by,
+        **extra
+    )
+
+
+@pytest.fixture
+def memory_item():
+    """Constructor de EpisodicMemoryItem con valores por defecto (ver make_item)."""
+    return make_item
@@ -0,0 +1,169 @@
+'''
+Test de AsyncVectorMemoryManager (Qdrant en memoria, sin LiteLLM): búsqueda con
+umbral y parámetros del perfil, cliente de embeddings resuelto una sola vez y
+prefetch de memoria del orquestador desde el event loop.
+'''
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+from qdrant_client import AsyncQdrantClient
+
+from src.crew_orchestrator import CrewOrchestrator, MemoryPrefetch
+from src.memory_manager import AsyncVectorMemoryManager, VectorMemoryManager
+from src.utils import embedding_client
+from tests.conftest import EMBEDDING_SIZE
+
+VECTORS = {
+    "café": [1.0, 0.0],
+    "el usuario toma café solo": [1.0, 0.0],
+    "el coche pasa la ITV en mayo": [0.0, 1.0],
+}
+
+
+class FakeEmbedder:
+    is_bound = True
+
+    def __init__(self):
+        self.closed = False
+
+    async def embed(self, text):
+        vector = VECTORS[text]
+        return vector + [0.0] * (EMBEDDING_SIZE - len(vector))
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def async_memory(memory_manager):
+    """AsyncVectorMemoryManager sobre Qdrant en memoria con embeddings de VECTORS."""
+    AsyncVectorMemoryManager._embedder = FakeEmbedder()
+
+    async def build(collection: str = "async_memory") -> AsyncVectorMemoryManager:
+        AsyncVectorMemoryManager._client = AsyncQdrantClient(":memory:")
+        return AsyncVectorMemoryManager(collection_name=collection)
+
+    return build
+
+
+def test_search_applies_threshold_and_profile(async_memory, memory_item):
+    async def scenario():
+        manager = await async_memory()
+        await manager.add_memory(memory_item("el usuario toma café solo", domain="health"))
+        await manager.add_memory(memory_item("el coche pasa la ITV en mayo"))
+
+        calls = []
+        query_points = manager._client.query_points
+
+        async def spy(**kwargs):
+            calls.append(kwargs)
+            return await query_points(**kwargs)
+
+        manager._client.query_points = spy
+        everything = await manager.search_memory("café", limit=5)
+        relevant = await manager.search_memory("café", limit=5, score_threshold=0.5)
+        return everything, relevant, calls
+
+    everything, relevant, calls = asyncio.run(scenario())
+    assert len(everything) == 2
+    assert [item.content for item in relevant] == ["el usuario toma café solo"]
+    # Colección híbrida: el umbral y el HNSW del perfil van en la rama densa
+    dense = calls[1]["prefetch"][0]
+    assert dense.score_threshold == 0.5
+    assert dense.params == VectorMemoryManager._profile.search_params()
+
+
+def test_search_errors_are_opt_in(async_memory):
+    class DownEmbedder(FakeEmbedder):
+        async def embed(self, text):
+            raise ConnectionError("LiteLLM caído")
+
+    async def scenario():
+        manager = await async_memory()
+        AsyncVectorMemoryManager._embedder = DownEmbedder()
+        assert await manager.search_memory("café") == []
+        with pytest.raises(ConnectionError):
+            await manager.search_memory("café", raise_errors=True)
+
+    asyncio.run(scenario())
+
+
+def test_embedding_client_is_created_once(async_memory, monkeypatch):
+    created = []
+
+    def from_env(model, cache=None):
+        created.append(FakeEmbedder())
+        created[-1].bind = lambda: None
+        return created[-1]
+
+    monkeypatch.setattr(embedding_client.AsyncEmbeddingClient, "from_env", staticmethod(from_env))
+
+    async def scenario():
+        AsyncVectorMemoryManager._embedder = None
+        manager = await async_memory()
+        await manager.search_memory("café")
+        await manager.search_memory("café")
+        await AsyncVectorMemoryManager.close()
+
+    asyncio.run(scenario())
+    assert len(created) == 1 and created[0].closed
+    assert AsyncVectorMemoryManager._embedder is None
+
+
+def test_bot_embedding_client_is_shared_not_closed(async_memory, monkeypatch):
+    shared = FakeEmbedder()
+    monkeypatch.setattr(VectorMemoryManager, "_embedding_client", shared)
+
+    async def scenario():
+        AsyncVectorMemoryManager._embedder = None
+        manager = await async_memory()
+        await manager.search_memory("café")
+        await AsyncVectorMemoryManager.close()
+
+    asyncio.run(scenario())
+    assert not shared.closed  # Lo cierra el bot (detach_embedding_client), no el manager
+
+
+def _prefetching_orchestrator() -> CrewOrchestrator:
+    orchestrator = CrewOrchestrator.__new__(CrewOrchestrator)
+    orchestrator.memory_prefetch_k = 3
+    orchestrator.memory_prefetch_min_score = 0.5
+    orchestrator.memory_prefetch_deadline = 0.8
+    orchestrator.memory_prefetch_backoff = 30
+    orchestrator._prefetch_paused_until = 0.0
+    orchestrator.prefetch_stats = Counter()
+    return orchestrator
+
+
+def test_prefetch_on_event_loop_uses_async_manager(async_memory, memory_item):
+    orchestrator = _prefetching_orchestrator()
+    # El camino síncrono (hilo + VectorMemoryManager) no debe usarse desde el loop
+    orchestrator._prefetch_pool = None
+
+    async def scenario():
+        manager = await async_memory("episodic_memory_v1")
+        await manager.add_memory(memory_item("el usuario toma café solo"))
+        prefetch = orchestrator.prefetch_memories("café")
+        return await asyncio.wrap_future(prefetch.future)
+
+    memories = asyncio.run(scenario())
+    assert [item.content for item in memories] == ["el usuario toma café solo"]
+
+
+def test_prefetch_is_collected_once_per_turn():
+    orchestrator = _prefetching_orchestrator()
+    failed = Future()
+    failed.set_exception(ConnectionError("Qdrant caído"))
+    prefetch = MemoryPrefetch(future=failed, started_at=time.monotonic())
+
+    # Especulación fallida + ejecución definitiva: ambas recogen el mismo prefetch
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(orchestrator.collect_memories, [prefetch, prefetch]))
+    assert results == [[], []]
+    assert orchestrator.prefetch_stats == Counter(error=1)
+    paused_until = orchestrator._prefetch_paused_until
+    assert orchestrator.collect_memories(prefetch) == []
+    assert orchestrator._prefetch_paused_until == paused_until  # La pausa no se alarga
@@ -0,0 +1,47 @@
+'''
+Test de los perfiles de la colección de memoria (sin Qdrant):
+presets + overrides por entorno y diferencias para la migración en caliente.
+'''
+import pytest
+from qdrant_client import models
+
+from src.utils.collection_profile import PROFILES, CollectionProfile
+
+
+def _info(quantization=None, on_disk=False, m=16) -> models.CollectionInfo:
+    return models.CollectionInfo.model_construct(config=models.CollectionConfig.model_construct(
+        hnsw_config=models.HnswConfig(m=m, ef_construct=100, full_scan_threshold=10000),
+        quantization_config=quantization,
+        params=models.CollectionParams.model_construct(
+            vectors=models.VectorParams(size=768, distance=models.Distance.COSINE, on_disk=on_disk),
+            on_disk_payload=True
+        )
+    ))
+
+
+def test_profile_from_env(monkeypatch):
+    monkeypatch.setenv("MEMORY_COLLECTION_PROFILE", "lean")
+    monkeypatch.setenv("QDRANT_HNSW_M", "32")
+    profile = CollectionProfile.from_env()
+    assert profile.quantization == "scalar" and profile.on_disk_vectors and profile.hnsw_m == 32
+    assert profile.search_params().quantization.rescore
+
+    monkeypatch.setenv("QDRANT_QUANTIZATION", "pq")
+    with pytest.raises(ValueError):
+        CollectionProfile.from_env()
+
+
+def test_migration_diff():
+    default_collection = _info()
+    assert PROFILES["default"].migration(default_collection) == {}
+    assert PROFILES["default"].search_params() is None
+
+    changes = PROFILES["compact"].migration(default_collection)
+    assert set(changes) == {"quantization_config", "vectors_config"}
+    assert isinstance(changes["quantization_config"], models.BinaryQuantization)
+
+    # Volver al perfil por defecto desactiva la cuantización y recupera la RAM
+    lean_collection = _info(quantization=PROFILES["lean"].quantization_config(), on_disk=True, m=32)
+    changes = PROFILES["default"].migration(lean_collection)
+    assert changes["quantization_config"] == models.Disabled.DISABLED
+    assert changes["hnsw_config"].m == 16
@@ -0,0 +1,65 @@
+'''
+Test del constructor de contexto (presupuesto de tokens + resumen rodante).
+No necesita LLM: trabaja con historiales sintéticos.
+'''
+from src.context_builder import ContextBuilder, estimate_tokens
+
+
+def _history(n: int) -> list[dict]:
+    return [
+        {"message_id": i, "role": "user" if i % 2 else "assistant",
+         "name": "David" if i % 2 else "LifeOS", "content": f"mensaje número {i} " * 5}
+        for i in range(1, n + 1)
+    ]
+
+
+def test_render_is_compact_and_within_budget():
+    builder = ContextBuilder(default_budget=100, max_message_tokens=50)
+    history = _history(15)
+    block = builder.render(history, None)
+
+    assert "message_id" not in block and "{" not in block
+    assert estimate_tokens(block) <= 100
+    # Se conservan los más recientes, en orden cronológico
+    assert block.splitlines()[-1].startswith("David: mensaje número 15")
+    assert "mensaje número 1 " not in block
+
+
+def test_summary_replaces_folded_turns():
+    builder = ContextBuilder(default_budget=1000, verbatim_messages=4, summary_batch=3)
+    history = _history(10)
+    summary = {"summary": "David habló de su presupuesto mensual.", "upto": 6}
+
+    block = builder.render(history, summary, current_message_id=history[-1]["message_id"])
+    assert block.startswith("Resumen de la conversación anterior: David habló")
+    # Lo resumido no se repite y el mensaje actual va aparte
+    assert "mensaje número 6 " not in block
+    assert "mensaje número 10" not in block
+    assert "mensaje número 9" in block
+
+
+def test_current_message_is_identified_by_id():
+    builder = ContextBuilder(default_budget=1000)
+    history = _history(3)
+    # El usuario repite su mensaje anterior y el actual aún no se ha persistido
+    repeated = history[-1]["content"]
+    block = builder.render(history, None, current_message_id=4)
+    assert block.count(" ".join(repeated.split())) == 1
+
+    # En un grupo el mensaje actual puede no ser el último del historial
+    history.append({"message_id": 4, "role": "user", "name": "Ana", "content": "¿qué hay de cena?"})
+    history.append({"message_id": 5, "role": "user", "name": "David", "content": "yo invito"})
+    block = builder.render(history, None, current_message_id="4")
+    assert "qué hay de cena" not in block
+    assert block.splitlines()[-1] == "David: yo invito"
+
+
+def test_pending_for_summary_waits_for_a_full_batch():
+    builder = ContextBuilder(verbatim_messages=4, summary_batch=3)
+    assert builder.pending_for_summary(_history(6), None) == []
+
+    pending = builder.pending_for_summary(_history(8), None)
+    assert [m["message_id"] for m in pending] == [1, 2, 3, 4]
+
+    # Tras resumir hasta el 4, no queda nada hasta el siguiente lote
+    assert builder.pending_for_summary(_history(8), {"summary": "x", "upto": 4}) == []
@@ -0,0 +1,157 @@
+'''
+Test del importador de documentos (sin Qdrant ni LiteLLM): troceado en
+streaming y reanudación desde el checkpoint tras un fallo a mitad de import.
+'''
+import asyncio
+import os
+import tempfile
+from collections.abc import Iterable
+
+import pytest
+from qdrant_client import AsyncQdrantClient
+
+from src.document_import import DocumentImporter, ImportCheckpoint, chunk_jsonl, chunk_text
+from src.memory_manager import AsyncVectorMemoryManager
+from src.schemas.memory import EpisodicMemoryMetadata
+from tests.conftest import EMBEDDING_SIZE
+
+
+class FakeEmbedder:
+    async def embed_many(self, texts):
+        await asyncio.sleep(0)
+        return [[float(len(text))] for text in texts]
+
+
+class FakeMemory:
+    def __init__(self, fail_on_call: int | None = None):
+        self.points: dict[str, str] = {}
+        self.calls = 0
+        self.fail_on_call = fail_on_call
+
+    async def add_embedded(self, items, vectors, wait=True, import_source=None):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise ConnectionError("Qdrant caído")
+        await asyncio.sleep(0)
+        self.points.update({item.id: item.content for item in items})
+        return [item.id for item in items]
+
+    async def prune_import(self, import_source, keep_ids):
+        stale = [point_id for point_id in self.points if point_id not in keep_ids]
+        for point_id in stale:
+            del self.points[point_id]
+        return len(stale)
+
+
+def test_chunk_text_respects_headings_and_size():
+    lines = [
+        "# Finanzas\n", "Primer párrafo corto.\n", "\n",
+        "Segundo párrafo. " * 10 + "\n", "\n",
+        "## Salud\n", "Dormir 8 horas.\n",
+    ]
+    chunks = list(chunk_text(lines, max_chars=80))
+    assert all(len(chunk) <= 80 for chunk in chunks)
+    assert chunks[0].startswith("Finanzas\nPrimer párrafo corto.")
+    assert chunks[-1] == "Salud\nDormir 8 horas."
+
+
+def test_chunk_jsonl_skips_invalid_lines():
+    lines = ['{"content": "uno"}\n', "no es json\n", '{"text": "dos"}\n', '{"otro": 1}\n']
+    assert list(chunk_jsonl(lines, max_chars=100)) == ["uno", "dos"]
+
+
+def _write_notes(path: str, numbers: Iterable[int]):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in numbers:
+            f.write(f"Nota número {i}: el usuario gastó {i * 10} euros.\n\n")
+
+
+def _importer(memory, checkpoint_path: str) -> DocumentImporter:
+    return DocumentImporter(
+        memory=memory, embedder=FakeEmbedder(), checkpoint=ImportCheckpoint(checkpoint_path),
+        metadata=EpisodicMemoryMetadata(domain="finance", type="fact", source="document_import"),
+        batch_size=5, concurrency=2, max_chars=60
+    )
+
+
+def test_resume_after_failure():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "notas.md")
+        _write_notes(source, range(50))
+        checkpoint_path = os.path.join(tmp, "checkpoint.json")
+
+        def importer(memory):
+            return _importer(memory, checkpoint_path)
+
+        # Se cae en el 4º lote: los lotes confirmados antes quedan en el checkpoint
+        crashed = FakeMemory(fail_on_call=4)
+        with pytest.raises(ConnectionError):
+            asyncio.run(importer(crashed).import_file(source))
+        done = ImportCheckpoint(checkpoint_path).resume_from(source)
+        assert 0 < done < 50 and done % 5 == 0
+
+        resumed = FakeMemory()
+        stats = asyncio.run(importer(resumed).import_file(source))
+        assert stats.skipped == done and stats.chunks == 50 - done
+
+        # IDs deterministas: entre los dos intentos están los 50 trozos, sin duplicados
+        assert len({**crashed.points, **resumed.points}) == 50
+        assert ImportCheckpoint(checkpoint_path).resume_from(source) == 50
+
+
+def test_reimport_of_edited_document_replaces_old_chunks():
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "notas.md")
+        checkpoint_path = os.path.join(tmp, "checkpoint.json")
+        memory = FakeMemory()
+
+        _write_notes(source, range(10))
+        asyncio.run(_importer(memory, checkpoint_path).import_file(source))
+        before = dict(memory.points)
+
+        # Se inserta una nota al principio (desplaza los índices) y se borra la última
+        _write_notes(source, [99, *range(9)])
+        stats = asyncio.run(_importer(memory, checkpoint_path).import_file(source))
+
+        assert stats.removed == 1  # Solo la nota 9, que ya no está en el documento
+        assert len(memory.points) == 10
+        assert len(before.keys() & memory.points.keys()) == 9  # Los trozos sin cambios conservan su ID
+
+
+class PaddedEmbedder:
+    async def embed_many(self, texts):
+        return [[1.0] + [0.0] * (EMBEDDING_SIZE - 1) for _ in texts]
+
+
+def test_concurrent_batches_bootstrap_fresh_collection_once(memory_manager):
+    async def scenario(source: str, checkpoint_path: str):
+        client = AsyncQdrantClient(":memory:")
+        exists = client.collection_exists
+        checks = []
+
+        async def slow_exists(**kwargs):
+            # Latencia de red: sin el lock todos los lotes verían la colección inexistente
+            checks.append(kwargs)
+            await asyncio.sleep(0.01)
+            return await exists(**kwargs)
+
+        client.collection_exists = slow_exists
+        AsyncVectorMemoryManager._client = client
+        memory = AsyncVectorMemoryManager(collection_name="fresh_import")
+        importer = DocumentImporter(
+            memory=memory, embedder=PaddedEmbedder(), checkpoint=ImportCheckpoint(checkpoint_path),
+            metadata=EpisodicMemoryMetadata(domain="finance", type="fact", source="document_import"),
+            batch_size=2, concurrency=4, max_chars=60
+        )
+        stats = await importer.import_file(source)
+        count = await client.count(collection_name="fresh_import")
+        await client.close()
+        return stats, count.count, len(checks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "notas.md")
+        _write_notes(source, range(12))
+        stats, stored, checks = asyncio.run(scenario(source, os.path.join(tmp, "checkpoint.json")))
+
+    assert stats.chunks == 12 and stored == 12
+    assert checks == 1
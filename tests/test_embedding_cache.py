@@ -0,0 +1,59 @@
+'''
+Test del cache de embeddings (LRU + disco).
+No necesita LiteLLM ni Qdrant: trabaja con vectores sintéticos.
+'''
+import os
+import tempfile
+
+from src.utils.embedding_cache import EmbeddingCache, normalize_text
+
+
+def test_two_tier_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        cache = EmbeddingCache("text-embedding-004->gemini/text-embedding-004", max_entries=2, db_path=db_path)
+
+        assert cache.get("qué dije sobre X") is None
+        cache.put("qué dije sobre X", [0.1, 0.2, 0.3])
+
+        # Misma clave tras normalizar espacios
+        assert normalize_text("  qué  dije sobre X ") == "qué dije sobre X"
+        assert cache.get("  qué  dije sobre X ") == [0.1, 0.2, 0.3]
+
+        # Un proceso nuevo recupera el vector desde disco
+        cold = EmbeddingCache("text-embedding-004->gemini/text-embedding-004", max_entries=2, db_path=db_path)
+        assert cold.get("qué dije sobre X") == [0.1, 0.2, 0.3]
+        assert cold.stats()["disk_hits"] == 1
+
+        # Cambiar de modelo invalida las entradas anteriores
+        other = EmbeddingCache("text-embedding-004->gemini/text-embedding-005", db_path=db_path)
+        assert other.get("qué dije sobre X") is None
+        assert other.invalidate() == 1
+
+        print(f"✅ Stats: {cache.stats()}")
+
+
+def test_lru_is_bounded():
+    cache = EmbeddingCache("model", max_entries=2)
+    for i in range(3):
+        cache.put(f"texto {i}", [float(i)])
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("texto 0") is None
+
+
+def test_disk_tier_in_batches():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        cache = EmbeddingCache("model", db_path=db_path)
+        cache.put_disk_many([("uno", [1.0]), ("dos", [2.0])])
+        assert cache.get_memory("uno") is None  # put_disk_many no toca el LRU
+
+        assert cache.get_disk_many(["dos", "tres", "uno"]) == [[2.0], None, [1.0]]
+        assert cache.get_memory("uno") == [1.0]  # Los aciertos de disco suben al LRU
+        assert cache.stats()["disk_hits"] == 2 and cache.stats()["misses"] == 1
+
+
+if __name__ == "__main__":
+    test_two_tier_cache()
+    test_lru_is_bounded()
+    test_disk_tier_in_batches()
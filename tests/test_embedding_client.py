@@ -0,0 +1,43 @@
+'''
+Test del cliente async de embeddings: coalescing de peticiones concurrentes.
+Usa un transporte simulado de httpx, no necesita LiteLLM.
+'''
+import asyncio
+import httpx
+
+from src.utils.embedding_client import AsyncEmbeddingClient
+
+
+async def _fake_litellm(request: httpx.Request) -> httpx.Response:
+    await asyncio.sleep(0.01)  # Latencia de red simulada
+    texts = __import__("json").loads(request.content)["input"]
+    return httpx.Response(200, json={
+        "data": [{"index": i, "embedding": [float(len(t))]} for i, t in enumerate(texts)]
+    })
+
+
+async def _run_concurrent_searches():
+    client = AsyncEmbeddingClient(base_url="http://litellm:4000", model="text-embedding-004")
+    client.bind()
+    client._http = httpx.AsyncClient(transport=httpx.MockTransport(_fake_litellm))
+
+    # RecallTool y ForgetTool buscando lo mismo a la vez
+    results = await asyncio.gather(
+        client.embed("reuniones de 15 minutos"),
+        client.embed("reuniones  de 15 minutos"),
+        client.embed_many(["reuniones de 15 minutos", "otra cosa"]),
+    )
+    await client.aclose()
+    return client, results
+
+
+def test_concurrent_requests_are_coalesced():
+    client, results = asyncio.run(_run_concurrent_searches())
+    assert results[0] == results[1] == results[2][0]
+    assert client.stats()["upstream_calls"] == 2
+    assert client.stats()["coalesced"] == 2
+    print(f"✅ Stats: {client.stats()}")
+
+
+if __name__ == "__main__":
+    test_concurrent_requests_are_coalesced()
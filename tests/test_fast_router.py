@@ -0,0 +1,96 @@
+'''
+Test del fast-path router (sin LLM ni LiteLLM).
+Usa agents.yaml real para las keywords y un embedding falso para la 2ª etapa.
+'''
+import os
+import time
+import yaml
+
+from src.fast_router import FastRouter, RoutingCache, parse_agent_key
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'src', 'config', 'agents.yaml')
+
+
+def _load_config():
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        return yaml.safe_load(f)
+
+
+def test_keyword_stage():
+    router = FastRouter(_load_config(), threshold=0.75)
+    scenarios = [
+        ("Me quiero fumar un paquete entero", "PADRINO"),
+        ("¿Qué puedo cenar que sea sano?", "KITCHEN"),
+        ("Apúntame la reunión del jueves en la agenda", "JANE"),
+    ]
+    for message, expected in scenarios:
+        decision = router.classify(message)
+        assert decision is not None and decision.agent == expected, message
+        assert decision.stage == "keyword"
+
+    # Sin keywords y sin embeddings: decide el LLM
+    assert router.classify("Hola, buenos días") is None
+
+
+def test_keyword_stage_ignores_incidental_matches():
+    router = FastRouter(_load_config(), threshold=0.75)
+    negatives = [
+        # Una sola keyword perdida en una frase larga
+        "Ayer en la reunión con el jefe hablamos del presupuesto del trimestre y de los objetivos",
+        # Keyword corta dentro de otra palabra ('menu' en 'menudo')
+        "¡Menudo día llevo hoy!",
+        # Términos del goal ('optimizar', 'energía') ya no son keywords
+        "Tengo que optimizar el consumo de energía del servidor",
+    ]
+    for message in negatives:
+        assert router.classify_keywords(message) is None, message
+
+
+def test_embedding_stage_and_fallback():
+    def fake_embed(texts):
+        # Eje 0 = "tabaco" (cigarro/pitillo), eje 1 = resto
+        return [[1.0 if ("cigarro" in t.lower() or "pitillo" in t.lower()) else 0.0, 1.0] for t in texts]
+
+    router = FastRouter(_load_config(), embed_fn=fake_embed, threshold=0.75)
+    decision = router.classify("un pitillo y ya")
+    assert decision is not None and decision.agent == "PADRINO" and decision.stage == "embedding"
+
+    # Empate entre agentes: confianza baja -> None (fallback al Dispatcher)
+    assert router.classify("Hola, buenos días") is None
+
+
+def test_parse_dispatcher_reply():
+    keys = {"JANE", "PADRINO", "KITCHEN"}
+    assert parse_agent_key("PADRINO", keys) == "PADRINO"
+    assert parse_agent_key("**Kitchen**.", keys) == "KITCHEN"
+    assert parse_agent_key("El agente adecuado es JANE", keys) == "JANE"
+    # Nada que cachear ni fijar como agente del chat
+    assert parse_agent_key("No estoy seguro", keys) is None
+    assert parse_agent_key("JANE o PADRINO", keys) is None
+
+
+def test_routing_cache_key_and_ttl():
+    cache = RoutingCache(ttl_seconds=0.05, max_entries=2)
+    cache.put("¿Qué ceno HOY?", "admin", "KITCHEN")
+    # Misma clave tras normalizar (mayúsculas, tildes, signos); el rol forma parte de ella
+    assert cache.get("que ceno hoy", "admin") == "KITCHEN"
+    assert cache.get("que ceno hoy", "guest") is None
+    assert cache.get("que ceno mañana", "admin") is None
+
+    # LRU: la entrada menos usada sale al superar max_entries
+    cache.put("uno", None, "JANE")
+    cache.get("que ceno hoy", "admin")
+    cache.put("dos", None, "JANE")
+    assert cache.get("uno", None) is None and cache.get("que ceno hoy", "admin") == "KITCHEN"
+
+    time.sleep(0.1)
+    assert cache.get("que ceno hoy", "admin") is None
+
+
+if __name__ == "__main__":
+    test_keyword_stage()
+    test_keyword_stage_ignores_incidental_matches()
+    test_embedding_stage_and_fallback()
+    test_parse_dispatcher_reply()
+    test_routing_cache_key_and_ttl()
+    print("✅ Fast router OK")
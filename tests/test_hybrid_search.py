@@ -0,0 +1,47 @@
+'''
+Test de la búsqueda híbrida (denso + BM25 con RRF) sin Qdrant ni LiteLLM:
+Qdrant en memoria y embeddings falsos donde el denso prefiere el recuerdo equivocado.
+'''
+from src.memory_manager import VectorMemoryManager
+from src.utils import sparse_encoder
+
+COLLECTION = "test_hybrid_search"
+TARGET = "Compré 3 bricks de leche Pascual en el Mercadona"
+DISTRACTOR = "Hay que hacer la compra para el desayuno"
+
+
+def _fake_embeddings(texts):
+    # El denso confunde la consulta con el recuerdo genérico sobre la compra
+    return [[0.8, 0.6] if text == TARGET else [1.0, 0.0] for text in texts]
+
+
+def test_sparse_encoder():
+    document = sparse_encoder.encode_document("La leche Pascual, leche entera")
+    query = sparse_encoder.encode_query("¿leche pascual?")
+    assert len(document.indices) == 3  # 'la' es stopword; tildes y mayúsculas no cuentan
+    assert set(query.indices) <= set(document.indices)
+    assert sparse_encoder.is_empty(sparse_encoder.encode_query("¿de la?"))
+
+
+def test_exact_tokens_win_with_fusion(memory_manager, memory_item, monkeypatch):
+    manager = memory_manager(COLLECTION, _fake_embeddings)
+    manager.add_memories([memory_item(DISTRACTOR), memory_item(TARGET)])
+
+    monkeypatch.setattr(VectorMemoryManager, "_hybrid_search", False)
+    assert manager.search_memory("leche Pascual", limit=1)[0].content == DISTRACTOR
+
+    monkeypatch.setattr(VectorMemoryManager, "_hybrid_search", True)
+    assert manager.search_memory("leche Pascual", limit=1)[0].content == TARGET
+
+
+def test_score_threshold_applies_to_fused_results(memory_manager, memory_item):
+    manager = memory_manager(COLLECTION, _fake_embeddings)
+    manager.add_memories([memory_item(DISTRACTOR), memory_item(TARGET)])
+
+    # TARGET coincide en BM25 pero su coseno con la consulta es 0.8: no pasa el umbral
+    strict = manager.search_memory("leche Pascual", limit=2, score_threshold=0.9)
+    assert [m.content for m in strict] == [DISTRACTOR]
+
+    # Con un umbral que ambos superan, la parte léxica sigue decidiendo el orden
+    loose = manager.search_memory("leche Pascual", limit=1, score_threshold=0.5)
+    assert loose[0].content == TARGET
@@ -0,0 +1,158 @@
+'''
+Test de la caché de identidades de IdentityManager con un Firestore falso:
+caducidad por TTL, caché negativa de desconocidos, invalidate y el listener
+de cambios de la colección 'users'.
+'''
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from src.identity_manager import IdentityManager, UserRole
+
+
+class FakeDocument:
+    def __init__(self, doc_id: str, data: dict | None):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeFirestore:
+    """Colección 'users' en un dict; cuenta las lecturas y guarda el listener."""
+
+    def __init__(self):
+        self.users: dict[str, dict] = {}
+        self.reads = 0
+        self.down = False
+        self.listener = None
+        self.unsubscribed = False
+
+    def collection(self, name):
+        assert name == "users"
+        return self
+
+    def document(self, doc_id):
+        return SimpleNamespace(path=f"users/{doc_id}", get=lambda: self._get(doc_id))
+
+    def _get(self, doc_id):
+        self.reads += 1
+        if self.down:
+            raise ConnectionError("Firestore caído")
+        return FakeDocument(doc_id, self.users.get(doc_id))
+
+    def on_snapshot(self, callback):
+        self.listener = callback
+        return SimpleNamespace(unsubscribe=lambda: setattr(self, "unsubscribed", True))
+
+    def change(self, kind: str, doc_id: str):
+        """Notifica un cambio como lo haría el watch de Firestore."""
+        change = SimpleNamespace(type=SimpleNamespace(name=kind), document=FakeDocument(doc_id, self.users.get(doc_id)))
+        self.listener([], [change], None)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def firestore(monkeypatch):
+    db = FakeFirestore()
+    monkeypatch.setattr(IdentityManager, "_USE_FIRESTORE", True)
+    monkeypatch.setattr(IdentityManager, "_firestore_client", db)
+    monkeypatch.setattr(IdentityManager, "_cache", OrderedDict())
+    monkeypatch.setattr(IdentityManager, "_CACHE_TTL", 300.0)
+    monkeypatch.setattr(IdentityManager, "_NEGATIVE_TTL", 30.0)
+    # Sin users.json: solo cuenta Firestore
+    monkeypatch.setattr(IdentityManager, "_users_db", {})
+    monkeypatch.setattr(IdentityManager, "_loaded_local", True)
+    monkeypatch.setattr(IdentityManager, "_watch", None)
+    return db
+
+
+def test_known_user_is_cached_until_ttl(firestore, clock):
+    firestore.users["1"] = {"name": "David", "role": "admin"}
+    assert IdentityManager.get_user(1).is_admin
+    assert IdentityManager.get_user("1").is_admin
+    assert firestore.reads == 1
+
+    firestore.users["1"]["role"] = "user"
+    clock.now += 299
+    assert IdentityManager.get_user(1).is_admin  # Aún dentro del TTL
+    clock.now += 2
+    assert IdentityManager.get_user(1).role == UserRole.USER
+    assert firestore.reads == 2
+
+
+def test_unknown_user_uses_short_negative_ttl(firestore, clock):
+    assert IdentityManager.get_user(2).name == "Stranger"
+    assert IdentityManager.get_user(2).name == "Stranger"
+    assert firestore.reads == 1
+
+    # Un alta nueva se ve en cuanto caduca la caché negativa, no tras el TTL largo
+    firestore.users["2"] = {"name": "Ana", "role": "user"}
+    clock.now += 31
+    assert IdentityManager.get_user(2).name == "Ana"
+    assert firestore.reads == 2
+
+
+def test_firestore_errors_are_not_cached(firestore, clock):
+    firestore.down = True
+    assert IdentityManager.get_user(3).role == UserRole.GUEST
+    firestore.down = False
+    firestore.users["3"] = {"name": "Eva", "role": "user"}
+    assert IdentityManager.get_user(3).name == "Eva"
+    assert firestore.reads == 2
+
+
+def test_invalidate_forces_a_fresh_read(firestore, clock):
+    firestore.users["1"] = {"name": "David", "role": "admin"}
+    firestore.users["2"] = {"name": "Ana", "role": "user"}
+    IdentityManager.get_user(1)
+    IdentityManager.get_user(2)
+    firestore.users["1"]["role"] = "guest"
+
+    IdentityManager.invalidate(1)
+    assert IdentityManager.get_user(1).role == UserRole.GUEST
+    assert IdentityManager.get_user(2).name == "Ana"  # El resto sigue cacheado
+    assert firestore.reads == 3
+
+    IdentityManager.invalidate()
+    IdentityManager.get_user(2)
+    assert firestore.reads == 4
+
+
+def test_snapshot_updates_and_removes_cached_users(firestore, clock):
+    firestore.users["1"] = {"name": "David", "role": "user"}
+    assert IdentityManager.watch_users()
+    IdentityManager.get_user(1)
+
+    # Cambio de rol: la caché se actualiza sin volver a leer
+    firestore.users["1"]["role"] = "admin"
+    firestore.change("MODIFIED", "1")
+    assert IdentityManager.get_user(1).is_admin
+    assert firestore.reads == 1
+
+    # Baja: la siguiente petición consulta Firestore y ya no lo encuentra
+    del firestore.users["1"]
+    firestore.change("REMOVED", "1")
+    assert IdentityManager.get_user(1).name == "Stranger"
+    assert firestore.reads == 2
+
+    IdentityManager.stop_watching()
+    assert firestore.unsubscribed and IdentityManager._watch is None
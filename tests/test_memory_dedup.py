@@ -0,0 +1,79 @@
+'''
+Test de la deduplicación semántica al escribir (sin Qdrant ni LiteLLM):
+Qdrant en memoria y embeddings fijos por texto.
+'''
+from functools import partial
+
+import pytest
+
+from src.memory_manager import VectorMemoryManager
+
+COLLECTION = "test_memory_dedup"
+VECTORS = {
+    "Prefiere reuniones de 15 minutos": [1.0, 0.0],
+    "Prefiere que las reuniones duren 15 minutos": [0.995, 0.1],  # coseno ~0.995
+    "Prefiere que las reuniones duren 20 minutos": [0.99, 0.14],  # coseno ~0.99, otra cifra
+    "Tiene reunión con el banco el lunes": [0.0, 1.0],
+}
+
+
+@pytest.fixture
+def manager(memory_manager, monkeypatch) -> VectorMemoryManager:
+    monkeypatch.setattr(VectorMemoryManager, "_dedup_threshold", 0.95)
+    return memory_manager(COLLECTION, lambda texts: [VECTORS[text] for text in texts])
+
+
+@pytest.fixture
+def item(memory_item):
+    return partial(memory_item, domain="professional", type="preference", created_by="David")
+
+
+def test_near_duplicate_is_merged(manager, item):
+    first = item("Prefiere reuniones de 15 minutos", tags="trabajo")
+    assert manager.add_memory(first) == first.id
+
+    merged_id = manager.add_memory(item("Prefiere que las reuniones duren 15 minutos", tags="agenda"))
+    assert merged_id == first.id
+
+    stored = manager._client.retrieve(collection_name=COLLECTION, ids=[first.id])[0].payload
+    assert stored["content"] == "Prefiere que las reuniones duren 15 minutos"  # Gana la versión nueva
+    assert stored["created_by"] == "David"
+    assert stored["created_at"] == first.created_at
+    assert stored["context_tags"] == "trabajo, agenda"
+    assert stored["merge_count"] == 1
+    assert VectorMemoryManager.dedup_stats() == {"inserted": 1, "merged": 1}
+
+
+def test_different_type_or_content_is_inserted(manager, item):
+    manager.add_memory(item("Prefiere reuniones de 15 minutos"))
+
+    # Mismo texto casi, pero otro tipo de recuerdo: no se mezcla
+    fact = item("Prefiere que las reuniones duren 15 minutos", type="fact")
+    assert manager.add_memory(fact) == fact.id
+
+    other = item("Tiene reunión con el banco el lunes")
+    assert manager.add_memory(other) == other.id
+    assert VectorMemoryManager.dedup_stats() == {"inserted": 3}
+
+
+def test_different_numbers_are_not_merged(manager, item):
+    manager.add_memory(item("Prefiere reuniones de 15 minutos"))
+    # Casi idénticos para el embedding, pero es otro dato: no debe sobrescribir al anterior
+    changed = item("Prefiere que las reuniones duren 20 minutos")
+    assert manager.add_memory(changed) == changed.id
+    assert VectorMemoryManager.dedup_stats() == {"inserted": 2}
+
+
+def test_memories_of_different_users_are_not_merged(manager, item):
+    david = item("Prefiere reuniones de 15 minutos")
+    manager.add_memory(david)
+
+    ana = item("Prefiere que las reuniones duren 15 minutos", created_by="Ana")
+    assert manager.add_memory(ana) == ana.id
+    stored = manager._client.retrieve(collection_name=COLLECTION, ids=[david.id])[0].payload
+    assert stored["content"] == "Prefiere reuniones de 15 minutos" and stored["created_by"] == "David"
+
+    # Sin autor solo se fusiona con recuerdos sin autor
+    anonymous = item("Prefiere que las reuniones duren 15 minutos", created_by=None)
+    assert manager.add_memory(anonymous) == anonymous.id
+    assert VectorMemoryManager.dedup_stats() == {"inserted": 3}
@@ -0,0 +1,78 @@
+'''
+Test de filtros de payload y rango temporal de la memoria episódica.
+No necesita Qdrant ni LiteLLM: Qdrant en memoria (modo local) y embeddings fijos
+(fixtures en conftest.py).
+'''
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.memory_manager import VectorMemoryManager
+
+COLLECTION = "test_memory_filters"
+
+
+def test_domain_and_time_range(memory_manager, memory_item):
+    manager = memory_manager(COLLECTION)
+    manager.add_memories([
+        memory_item("reciente salud", domain="health", age_days=2),
+        memory_item("antiguo salud", domain="health", age_days=90),
+        memory_item("reciente dinero", domain="finance", age_days=5),
+    ])
+
+    last_month = datetime.now() - timedelta(days=30)
+    recent = manager.search_memory("x", created_after=last_month)
+    assert {m.content for m in recent} == {"reciente salud", "reciente dinero"}
+
+    recent_health = manager.search_memory("x", filters={"domain": "health"}, created_after=last_month)
+    assert [m.content for m in recent_health] == ["reciente salud"]
+
+    older = manager.search_memory("x", created_before=last_month)
+    assert [m.content for m in older] == ["antiguo salud"]
+
+
+def test_backfill_of_legacy_points(memory_manager, memory_item):
+    manager = memory_manager(COLLECTION)
+    legacy = memory_item("sin timestamp numérico", domain="meta", age_days=3)
+    point = VectorMemoryManager._build_point(legacy, [1.0] * 768)
+    del point.payload["created_ts"]
+    manager._client.upsert(collection_name=COLLECTION, points=[point])
+
+    manager._backfill_timestamps()
+
+    stored = manager._client.retrieve(collection_name=COLLECTION, ids=[legacy.id])[0]
+    assert stored.payload["created_ts"] == datetime.fromisoformat(legacy.created_at).timestamp()
+    assert manager.search_memory("x", created_after=datetime.now() - timedelta(days=7))[0].id == legacy.id
+
+
+def test_backfill_pages_past_points_without_created_at(memory_manager, memory_item, monkeypatch):
+    monkeypatch.setattr("src.memory_manager._BACKFILL_BATCH", 2)
+    manager = memory_manager(COLLECTION)
+    points = []
+    for i, content in enumerate(["roto 1", "roto 2", "viejo 1", "viejo 2", "viejo 3"]):
+        point = VectorMemoryManager._build_point(memory_item(content, age_days=3), [1.0] * 768)
+        # IDs ordenados: la primera página solo tiene puntos sin created_at que no se pueden migrar
+        point.id = f"00000000-0000-0000-0000-00000000000{i}"
+        del point.payload["created_ts"]
+        if content.startswith("roto"):
+            del point.payload["created_at"]
+        points.append(point)
+    manager._client.upsert(collection_name=COLLECTION, points=points)
+
+    manager._backfill_timestamps()
+
+    stored = manager._client.retrieve(collection_name=COLLECTION, ids=[point.id for point in points])
+    migrated = {point.payload["content"] for point in stored if "created_ts" in point.payload}
+    assert migrated == {"viejo 1", "viejo 2", "viejo 3"}
+
+
+def test_search_errors_are_opt_in(memory_manager, monkeypatch):
+    manager = memory_manager(COLLECTION)
+
+    def qdrant_down(*args, **kwargs):
+        raise ConnectionError("Qdrant caído")
+
+    monkeypatch.setattr(manager._client, "query_points", qdrant_down)
+    assert manager.search_memory("x") == []  # Las tools siguen recibiendo una lista vacía
+    with pytest.raises(ConnectionError):
+        manager.search_memory("x", raise_errors=True)  # El prefetch distingue caída de vacío
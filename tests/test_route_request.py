@@ -0,0 +1,90 @@
+'''
+Test de las etapas de enrutamiento del orquestador (sin LLM): cache de
+decisiones, agente "pegajoso" por chat y fallback del Dispatcher.
+'''
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import pytest
+
+from src.crew_orchestrator import CrewOrchestrator
+from src.fast_router import RoutingCache
+
+AGENTS = {"jane": {}, "padrino": {}, "kitchen": {}}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = Clock()
+    monkeypatch.setattr(time, "monotonic", fake)
+    return fake
+
+
+def _orchestrator(replies: list[str | None]) -> CrewOrchestrator:
+    """Orquestador mínimo: sin fast-path; el Dispatcher responde `replies` en orden."""
+    orchestrator = CrewOrchestrator.__new__(CrewOrchestrator)
+    orchestrator.agents = SimpleNamespace(config=AGENTS, generation=0)
+    orchestrator._router_generation = 0
+    orchestrator.fast_router = None
+    orchestrator.routing_stats = Counter()
+    orchestrator.route_cache = RoutingCache(ttl_seconds=600)
+    orchestrator.sticky_seconds = 120
+    orchestrator.sticky_max_words = 6
+    orchestrator._last_agent = {}
+    orchestrator._routing_lock = threading.Lock()
+    orchestrator._agent_prior = Counter()
+    orchestrator.speculative_default_agent = "JANE"
+    orchestrator.llm_calls = []
+
+    def route_with_llm(user_message, user=None):
+        orchestrator.llm_calls.append(user_message)
+        return replies.pop(0)
+
+    orchestrator._route_with_llm = route_with_llm
+    return orchestrator
+
+
+def test_llm_decision_is_cached_by_normalised_message(clock):
+    orchestrator = _orchestrator(["KITCHEN"])
+    message = "Necesito ideas para la cena del sábado con mis suegros que vienen a casa"
+    assert orchestrator.route_request(message) == "KITCHEN"
+    assert orchestrator.route_request(message.upper() + "!!") == "KITCHEN"
+    assert orchestrator.llm_calls == [message]
+    assert orchestrator.routing_stats == Counter(llm=1, cache=1)
+
+
+def test_sticky_agent_expires(clock):
+    orchestrator = _orchestrator(["PADRINO", "JANE", "KITCHEN"])
+    assert orchestrator.route_request("Llevo tres días sin fumar y hoy me cuesta", chat_id=7) == "PADRINO"
+    assert orchestrator.route_request("¿y mañana?", chat_id=7) == "PADRINO"
+    assert orchestrator.route_request("¿y mañana?", chat_id=8) == "JANE"  # Otro chat: decide el LLM
+    assert orchestrator.routing_stats["sticky"] == 1
+
+    # Pasada la ventana sticky el follow-up vuelve a pasar por el Dispatcher
+    clock.now += 121
+    assert orchestrator.route_request("¿y el lunes?", chat_id=7) == "KITCHEN"
+    assert orchestrator.routing_stats["sticky"] == 1 and len(orchestrator.llm_calls) == 3
+
+
+def test_fallback_is_never_cached_nor_sticky(clock):
+    # None: respuesta del Dispatcher sin un agente reconocible (ver parse_agent_key)
+    orchestrator = _orchestrator([None, "BORRADO", "PADRINO"])
+    message = "Tengo una duda sobre algo que me pasó ayer por la tarde"
+    assert orchestrator.route_request(message, chat_id=7) == "JANE"
+    assert orchestrator.route_request(message, chat_id=7) == "JANE"  # Agente fuera de agents.yaml
+    assert orchestrator.routing_stats["fallback"] == 2
+    assert orchestrator._last_agent == {} and not orchestrator._agent_prior
+
+    # Ni la cache ni el chat recuerdan el fallback: el Dispatcher vuelve a decidir
+    assert orchestrator.route_request(message, chat_id=7) == "PADRINO"
+    assert len(orchestrator.llm_calls) == 3
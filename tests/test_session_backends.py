@@ -0,0 +1,60 @@
+'''
+Test del backend SQLite de sesiones.
+No necesita Firestore: trabaja sobre un fichero temporal.
+'''
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from src.utils.session_backends import SQLiteSessionBackend
+
+
+def _record(chat_id: str, message_id: int, content: str, when: datetime):
+    return (chat_id, str(message_id), {
+        'message_id': message_id,
+        'role': 'user',
+        'content': content,
+        'timestamp': when,
+        'sender_id': '42',
+        'name': 'David',
+    })
+
+
+def test_recent_messages_in_order():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteSessionBackend(os.path.join(tmp, "sessions.sqlite3"))
+        start = datetime.now(timezone.utc)
+        backend.write_batch([_record("1", i, f"mensaje {i}", start + timedelta(seconds=i)) for i in range(20)])
+        backend.write_batch([_record("-7", 1, "en el grupo", start)])
+
+        recent = backend.fetch_recent("1", 5)
+        assert [m['content'] for m in recent] == [f"mensaje {i}" for i in range(15, 20)]
+        # El message_id conserva su tipo original (int de Telegram)
+        assert recent[-1]['message_id'] == 19
+        assert backend.fetch_recent("-7", 5)[0]['content'] == "en el grupo"
+
+        # Reescribir el mismo mensaje es idempotente
+        backend.write_batch([_record("1", 19, "editado", start + timedelta(seconds=19))])
+        assert backend.fetch_recent("1", 1)[0]['content'] == "editado"
+        assert len(backend.fetch_recent("1", 100)) == 20
+        backend.close()
+
+        # Persistencia entre procesos
+        reopened = SQLiteSessionBackend(os.path.join(tmp, "sessions.sqlite3"))
+        assert len(reopened.fetch_recent("1", 100)) == 20
+        reopened.close()
+
+
+def test_rolling_summary_on_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = SQLiteSessionBackend(os.path.join(tmp, "sessions.sqlite3"))
+        assert backend.get_summary("1") is None
+
+        backend.set_summary("1", "Hablamos del presupuesto.", upto=12)
+        assert backend.get_summary("1") == {"summary": "Hablamos del presupuesto.", "upto": 12}
+
+        # Escribir mensajes no pisa el resumen de la sesión
+        backend.write_batch([_record("1", 13, "hola", datetime.now(timezone.utc))])
+        assert backend.get_summary("1")["upto"] == 12
+        backend.close()
+
@@ -0,0 +1,119 @@
+'''
+Test de la escritura diferida de SessionManager sobre el backend SQLite
+(sin Firestore): flush por tamaño de lote y por intervalo, spool en el
+apagado que se reenvía al siguiente arranque y lectura en frío del historial.
+'''
+import threading
+import time
+from collections import OrderedDict
+
+import pytest
+
+from src.utils.session_manager import SessionManager
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+def _message(message_id: int, content: str = "hola") -> dict:
+    return {"role": "user", "content": content, "user_id": 42, "name": "David", "message_id": message_id}
+
+
+@pytest.fixture
+def sessions(monkeypatch, tmp_path):
+    """SessionManager limpio sobre un SQLite temporal; se cierra al acabar el test."""
+    monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "sessions.sqlite3"))
+    monkeypatch.setattr(SessionManager, "_BACKEND_KIND", "sqlite")
+    monkeypatch.setattr(SessionManager, "_SPOOL_PATH", tmp_path / "spool.jsonl")
+    monkeypatch.setattr(SessionManager, "_backend", None)
+    monkeypatch.setattr(SessionManager, "_pending", [])
+    monkeypatch.setattr(SessionManager, "_wakeup", threading.Event())
+    monkeypatch.setattr(SessionManager, "_flusher", None)
+    monkeypatch.setattr(SessionManager, "_closed", False)
+    monkeypatch.setattr(SessionManager, "_history", OrderedDict())
+    monkeypatch.setattr(SessionManager, "_summaries", OrderedDict())
+    monkeypatch.setattr(SessionManager, "_warming", {})
+    yield SessionManager
+    SessionManager.close()
+
+
+def _stored(manager, chat_id: str) -> list[str]:
+    return [m["content"] for m in manager._get_backend().fetch_recent(chat_id, 100)]
+
+
+def test_flush_when_batch_is_full(sessions, monkeypatch):
+    monkeypatch.setattr(SessionManager, "_FLUSH_MAX_BATCH", 3)
+    monkeypatch.setattr(SessionManager, "_FLUSH_INTERVAL", 60.0)
+
+    sessions.add_message(1, _message(1, "uno"))
+    sessions.add_message(1, _message(2, "dos"))
+    time.sleep(0.1)
+    assert _stored(sessions, "1") == []  # Por debajo del lote: sigue en memoria
+
+    sessions.add_message(1, _message(3, "tres"))
+    assert _wait_for(lambda: _stored(sessions, "1") == ["uno", "dos", "tres"])
+    assert sessions._pending == []
+
+
+def test_flush_on_interval(sessions, monkeypatch):
+    monkeypatch.setattr(SessionManager, "_FLUSH_MAX_BATCH", 100)
+    monkeypatch.setattr(SessionManager, "_FLUSH_INTERVAL", 0.05)
+
+    sessions.add_message(1, _message(1, "uno"))
+    assert _wait_for(lambda: _stored(sessions, "1") == ["uno"])
+
+
+class DownBackend:
+    def write_batch(self, records):
+        raise ConnectionError("backend caído")
+
+    def close(self):
+        pass
+
+
+def test_close_spools_pending_and_next_start_replays_it(sessions, monkeypatch):
+    monkeypatch.setattr(SessionManager, "_FLUSH_MAX_BATCH", 100)
+    monkeypatch.setattr(SessionManager, "_FLUSH_INTERVAL", 60.0)
+    monkeypatch.setattr(SessionManager, "_backend", DownBackend())
+
+    sessions.add_message(1, _message(1, "uno"))
+    sessions.add_message(-7, _message(2, "en el grupo"))
+    sessions.close()
+    assert sessions._SPOOL_PATH.exists() and sessions._pending == []
+    assert len(sessions._SPOOL_PATH.read_text(encoding="utf-8").splitlines()) == 2
+
+    # Siguiente arranque: el backend vuelve y el spool se re-encola y se escribe
+    assert sessions.connect()
+    assert not sessions._SPOOL_PATH.exists()
+    assert sessions.flush()
+    assert _stored(sessions, "1") == ["uno"]
+    assert _stored(sessions, "-7") == ["en el grupo"]
+
+
+def test_cold_read_keeps_messages_flushed_during_the_query(sessions, monkeypatch):
+    monkeypatch.setattr(SessionManager, "_FLUSH_MAX_BATCH", 100)
+    monkeypatch.setattr(SessionManager, "_FLUSH_INTERVAL", 60.0)
+    sessions.add_message(1, _message(1, "uno"))
+
+    backend = sessions._get_backend()
+    fetch_recent = backend.fetch_recent
+
+    def racing_fetch(chat_id, limit):
+        stored = fetch_recent(chat_id, limit)
+        # Mientras se consulta llega otro mensaje y el flusher escribe ambos
+        sessions.add_message(1, _message(2, "dos"))
+        sessions.flush()
+        return stored
+
+    monkeypatch.setattr(backend, "fetch_recent", racing_fetch)
+    assert [m["content"] for m in sessions.get_context(1)] == ["uno", "dos"]
+
+    # Ya caliente: se sirve del ring buffer, que sigue recibiendo mensajes
+    sessions.add_message(1, _message(3, "tres"))
+    assert [m["content"] for m in sessions.get_context(1)] == ["uno", "dos", "tres"]
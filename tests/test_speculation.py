@@ -0,0 +1,90 @@
+'''
+Test de la ejecución especulativa (sin LLM): commit reenvía lo generado en
+orden, cancel aborta el stream y el Crew, y las tools con efectos esperan a la decisión.
+'''
+import threading
+
+import pytest
+from crewai import Agent, Crew, Task
+from crewai.hooks.dispatch import InterceptionPoint, scoped_hooks
+from crewai.llms.base_llm import BaseLLM
+
+from src.speculation import SpeculationCancelled, SpeculativeRun
+from src.utils.request_context import current_speculation, side_effects_allowed
+
+
+def test_commit_replays_buffer_then_streams():
+    run = SpeculativeRun(agent="JANE", started_at=0.0)
+    run.push("Hola")
+    run.push(", ")
+
+    received = []
+    run.commit(received.append)
+    run.push("mundo")
+
+    assert received == ["Hola", ", ", "mundo"]
+    assert run.committed and run.streamed_tokens > 0
+
+
+def test_cancel_aborts_stream():
+    run = SpeculativeRun(agent="JANE", started_at=0.0)
+    run.push("Hola")
+    run.cancel()
+
+    with pytest.raises(SpeculationCancelled):
+        run.push("mundo")
+    assert not run.committed
+
+
+def test_side_effects_wait_for_router():
+    assert side_effects_allowed()  # Ejecución normal: sin espera
+
+    run = SpeculativeRun(agent="JANE", started_at=0.0)
+    results = []
+
+    def tool():
+        current_speculation.set(run)
+        results.append(side_effects_allowed())
+
+    worker = threading.Thread(target=tool)
+    worker.start()
+    worker.join(timeout=0.1)
+    assert worker.is_alive() and not results  # Bloqueada hasta la decisión
+
+    run.cancel()
+    worker.join(timeout=1)
+    assert results == [False]
+
+
+class RouterDecidesMidTask(BaseLLM):
+    """LLM falso: el router descarta la especulación mientras corre la primera tarea."""
+    calls: int = 0
+    run: SpeculativeRun | None = None
+
+    def call(self, messages, *args, **kwargs):
+        self.calls += 1
+        self.run.cancel()
+        return "Final Answer: hecho"
+
+
+def test_cancel_stops_crew_before_next_llm_call():
+    run = SpeculativeRun(agent="JANE", started_at=0.0)
+    llm = RouterDecidesMidTask(model="fake", run=run)
+    agent = Agent(role="Jane", goal="Ayudar", backstory="Test", llm=llm)
+    tasks = [Task(description=step, expected_output="Texto", agent=agent) for step in ("Analiza", "Responde")]
+    crew = Crew(agents=[agent], tasks=tasks, stream=True)
+
+    with scoped_hooks({InterceptionPoint.PRE_MODEL_CALL: [run.check]}):
+        with pytest.raises(SpeculationCancelled):
+            streaming = crew.kickoff()
+            for _ in streaming:
+                pass
+            streaming.result
+    assert llm.calls == 1  # La tarea de respuesta no llega a llamar al LLM
+
+
+def test_usage_after_cancel_is_wasted():
+    run = SpeculativeRun(agent="JANE", started_at=0.0)
+    assert run.record_usage(120) is False
+    assert run.cancel() == 120  # Lo gastado antes del descarte
+    assert run.record_usage(30) is True  # Y lo que termine después